@@ -0,0 +1,107 @@
+# scripts/bench/api_load.py
+"""Closed-loop HTTP load generator for the API's public read endpoints.
+
+    python scripts/bench/api_load.py --base http://localhost:8000 --clients 200 --seconds 20
+
+Each client issues requests back to back, round-robin over --paths, and the
+run reports requests/second, latency percentiles and errors per path. To
+compare the old sync handlers with the async ones, run it against each
+build with the same flags (and RESPONSE_CACHE_TTL_SEC=0 on the API so the
+numbers measure the database path rather than the response cache):
+
+    git stash / checkout the old build  ->  api_load.py ... --label sync  --json sync.json
+    the current build                   ->  api_load.py ... --label async --json async.json
+
+Needs only httpx.
+"""
+import argparse, asyncio, json, time
+from collections import defaultdict
+
+import httpx
+
+DEFAULT_PATHS = (
+    "/public/summary?window=24h",
+    "/public/monitors",
+    "/public/incidents/active",
+)
+
+
+def percentile(sorted_vals, p: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    return sorted_vals[min(len(sorted_vals) - 1, int(round(p / 100 * (len(sorted_vals) - 1))))]
+
+
+async def client_loop(client, paths, deadline: float, offset: int, lat, errors):
+    i = offset
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            resp = await client.get(path)
+            if resp.status_code >= 400:
+                errors[path] += 1
+                continue
+        except httpx.HTTPError:
+            errors[path] += 1
+            continue
+        lat[path].append((time.perf_counter() - start) * 1000)
+
+
+async def run(base: str, paths, clients: int, seconds: float, warmup: float):
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=30) as client:
+        if warmup:
+            await asyncio.gather(*(client_loop(client, paths, time.perf_counter() + warmup, i,
+                                               defaultdict(list), defaultdict(int)) for i in range(clients)))
+        lat, errors = defaultdict(list), defaultdict(int)
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(client, paths, start + seconds, i, lat, errors) for i in range(clients)))
+        return time.perf_counter() - start, lat, errors
+
+
+def summarize(elapsed: float, lat, errors) -> dict:
+    out = {}
+    everything = []
+    for path in sorted(set(lat) | set(errors)):
+        vals = sorted(lat[path])
+        everything.extend(vals)
+        out[path] = _row(vals, errors[path], elapsed)
+    out["total"] = _row(sorted(everything), sum(errors.values()), elapsed)
+    return out
+
+
+def _row(vals, errors: int, elapsed: float) -> dict:
+    return {
+        "requests": len(vals),
+        "errors": errors,
+        "rps": round(len(vals) / elapsed, 1),
+        "p50_ms": round(percentile(vals, 50), 2),
+        "p95_ms": round(percentile(vals, 95), 2),
+        "p99_ms": round(percentile(vals, 99), 2),
+    }
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--base", default="http://localhost:8000")
+    ap.add_argument("--path", dest="paths", action="append", help="repeatable; defaults to the public read endpoints")
+    ap.add_argument("--clients", type=int, default=100, help="concurrent connections")
+    ap.add_argument("--seconds", type=float, default=20)
+    ap.add_argument("--warmup", type=float, default=2)
+    ap.add_argument("--label", default="run")
+    ap.add_argument("--json", help="also write the results to this file")
+    args = ap.parse_args()
+
+    paths = args.paths or list(DEFAULT_PATHS)
+    elapsed, lat, errors = asyncio.run(run(args.base, paths, args.clients, args.seconds, args.warmup))
+    stats = summarize(elapsed, lat, errors)
+
+    print(f"[{args.label}] {args.clients} clients, {elapsed:.1f}s")
+    for path, s in stats.items():
+        print(f"  {path:<32} {s['rps']:>9.1f} req/s  p50 {s['p50_ms']:>7.2f}ms  "
+              f"p95 {s['p95_ms']:>7.2f}ms  p99 {s['p99_ms']:>7.2f}ms  errors {s['errors']}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"label": args.label, "clients": args.clients, "seconds": elapsed, "stats": stats}, f, indent=2)
@@ -0,0 +1,84 @@
+# scripts/bench/dispatch_bench.py
+"""Notification dispatch throughput/latency against the stub's fake Telegram API.
+
+    python scripts/bench/dispatch_bench.py --alerts 500 --rate 1000
+    python scripts/bench/dispatch_bench.py --alerts 500 --rate 30 --tg-rate 20 --digest 5
+
+The serial run mirrors the old notifier (one blocking POST on a fresh
+connection per alert); the async run goes through services/notifier's
+Dispatcher and TelegramChannel, with the pooled client, token bucket and
+429/retry_after handling. --digest coalesces bursts the way the notifier does
+when the stream backs up (0 disables it, so every alert is its own message).
+Needs httpx and prometheus_client (the notifier instruments its channels).
+"""
+import argparse, asyncio, os, sys, time
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, "..", "..", "services", "notifier"))
+
+from stub_server import start_background  # noqa: E402
+from dispatch import Dispatcher, format_alert  # noqa: E402
+from channels import TelegramChannel  # noqa: E402
+
+
+def build_batch(n: int):
+    return [(f"{i}-0", {"type": "incident", "monitor_id": i, "incident_id": i, "reason": "HTTP 500"})
+            for i in range(1, n + 1)]
+
+
+def run_serial(base: str, batch):
+    url = f"{base}/botTOKEN/sendMessage"
+    lat, ok = [], 0
+    start = time.perf_counter()
+    for _, alert in batch:
+        t0 = time.perf_counter()
+        try:
+            res = httpx.post(url, data={"chat_id": "1", "text": format_alert(alert)}, timeout=10)
+            ok += res.status_code < 300
+        except httpx.HTTPError:
+            pass
+        lat.append((time.perf_counter() - t0) * 1000)
+    return time.perf_counter() - start, len(batch), ok, lat
+
+
+async def run_async(base: str, batch, rate: float, burst: int, digest: int, concurrency: int):
+    channel = TelegramChannel("TOKEN", "1", base_url=base, rate=rate, burst=burst, concurrency=concurrency)
+    try:
+        start = time.perf_counter()
+        outcomes = await Dispatcher(channel).dispatch(batch, threshold=digest if digest else len(batch) + 1)
+        elapsed = time.perf_counter() - start
+    finally:
+        await channel.aclose()
+    alerts_ok = sum(len(o.message.entries) for o in outcomes if o.delivered)
+    return elapsed, len(outcomes), alerts_ok, [o.latency_ms for o in outcomes]
+
+
+def report(label: str, n_alerts: int, elapsed: float, messages: int, alerts_ok: int, lat):
+    lat = sorted(lat)
+    pct = lambda p: lat[min(len(lat) - 1, int(p / 100 * len(lat)))] if lat else 0
+    print(f"{label:<8} {n_alerts:>6} alerts  {messages:>6} msgs  {elapsed:8.2f}s  "
+          f"{n_alerts / elapsed:9.1f} alerts/s  delivered={alerts_ok}  "
+          f"p50 {pct(50):.0f}ms  p99 {pct(99):.0f}ms")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--alerts", type=int, default=500)
+    ap.add_argument("--serial-alerts", type=int, default=200, help="sample size for the serial baseline")
+    ap.add_argument("--rate", type=float, default=1000, help="client token bucket, messages/second")
+    ap.add_argument("--burst", type=int, default=50)
+    ap.add_argument("--concurrency", type=int, default=10)
+    ap.add_argument("--tg-rate", type=float, default=0, help="stub-side limit before 429s (0 = none)")
+    ap.add_argument("--digest", type=int, default=0, help="coalesce more than N alerts per kind into one message")
+    ap.add_argument("--port", type=int, default=8098)
+    args = ap.parse_args()
+
+    base = start_background(port=args.port, tg_rate=args.tg_rate)
+    batch = build_batch(args.alerts)
+    if args.serial_alerts:
+        sample = batch[: args.serial_alerts]
+        report("serial", len(sample), *run_serial(base, sample))
+    report("async", len(batch), *asyncio.run(run_async(base, batch, args.rate, args.burst, args.digest, args.concurrency)))
@@ -0,0 +1,117 @@
+# scripts/bench/probe_bench.py
+"""Serial vs. asyncio probe throughput against the local stub server.
+
+    python scripts/bench/probe_bench.py --monitors 2000 --slow 0.05 --fail 0.05
+
+The serial run mirrors the old `tick_once` loop (one blocking `httpx.request`
+per monitor); the async run goes through services/monitor/probe.py.
+--procs 1,2,4 also runs the multi-process pool (procpool.py) with each child
+count and prints per-child throughput; give the stub as many --stub-procs,
+or it becomes the bottleneck. Needs httpx and prometheus_client; no
+Postgres or Redis.
+"""
+import argparse, asyncio, os, random, sys, time
+from types import SimpleNamespace
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, "..", "..", "services", "monitor"))
+
+from stub_server import start_background  # noqa: E402
+from probe import make_client, probe_many  # noqa: E402
+from procpool import ProbePool  # noqa: E402
+
+
+def build_monitors(base: str, n: int, slow: float, fail: float, hang: float, slow_ms: int, mode: str = "warm"):
+    rnd = random.Random(42)
+    mons = []
+    for i in range(1, n + 1):
+        x = rnd.random()
+        if x < hang:
+            path = "/hang"
+        elif x < hang + slow:
+            path = f"/slow?ms={slow_ms}"
+        elif x < hang + slow + fail:
+            path = "/fail"
+        else:
+            path = "/ok"
+        mons.append(SimpleNamespace(id=i, url=base + path, method="GET", expected_statuses=[200], latency_mode=mode))
+    return mons
+
+
+def run_serial(mons, timeout_s: float):
+    ok = 0
+    start = time.perf_counter()
+    for m in mons:
+        try:
+            resp = httpx.request(m.method, m.url, timeout=timeout_s)
+            ok += resp.status_code in m.expected_statuses
+        except Exception:
+            pass
+    return time.perf_counter() - start, ok
+
+
+async def run_async(mons, concurrency: int, rounds: int = 1):
+    """Probe `mons` `rounds` times on one client; later rounds run on warm connections (unless cold mode)."""
+    async with make_client(concurrency) as client:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            results = await probe_many(client, mons)
+        lat = [r.latency_ms for r in results if r.latency_ms is not None]
+        return (time.perf_counter() - start) / rounds, sum(r.ok for r in results), sum(lat) / len(lat) if lat else None
+
+
+async def run_pool(pool: ProbePool, mons, rounds: int = 1):
+    """Like run_async, through a started ProbePool."""
+    async with pool:
+        start = time.perf_counter()
+        pool.child_stats()
+        for _ in range(rounds):
+            results = await pool.probe_many(mons)
+        elapsed = (time.perf_counter() - start) / rounds
+        children = pool.child_stats()
+    lat = [r.latency_ms for r in results if r.latency_ms is not None]
+    return elapsed, sum(r.ok for r in results), sum(lat) / len(lat) if lat else None, children
+
+
+def report(label: str, n: int, elapsed: float, ok: int, avg_latency=None):
+    extra = f"  avg latency {avg_latency:.1f}ms" if avg_latency is not None else ""
+    print(f"{label:<10} {n:>6} checks  {elapsed:8.2f}s  {n / elapsed:10.1f} checks/s  ok={ok}{extra}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--monitors", type=int, default=1000)
+    ap.add_argument("--serial-monitors", type=int, default=200,
+                    help="the serial loop is slow; run it on a smaller sample")
+    ap.add_argument("--concurrency", type=int, default=200)
+    ap.add_argument("--slow", type=float, default=0.05, help="fraction of slow endpoints")
+    ap.add_argument("--slow-ms", type=int, default=1500)
+    ap.add_argument("--fail", type=float, default=0.05, help="fraction of HTTP 500 endpoints")
+    ap.add_argument("--hang", type=float, default=0.0, help="fraction of endpoints that never answer")
+    ap.add_argument("--port", type=int, default=8099)
+    ap.add_argument("--latency-mode", choices=("warm", "cold", "both"), default="warm",
+                    help="connection reuse per monitor; 'both' runs the async engine once per mode")
+    ap.add_argument("--rounds", type=int, default=1, help="probe every monitor this many times (shows reuse)")
+    ap.add_argument("--procs", default="", help="comma-separated probe child counts to run through procpool, e.g. 1,2,4")
+    ap.add_argument("--stub-procs", type=int, default=1, help="stub server processes sharing the port")
+    args = ap.parse_args()
+
+    timeout_ms = int(os.getenv("CHECK_TIMEOUT_MS", 5000))
+    base = start_background(port=args.port, procs=args.stub_procs)
+    modes = ("warm", "cold") if args.latency_mode == "both" else (args.latency_mode,)
+
+    if args.serial_monitors:
+        sample = build_monitors(base, args.serial_monitors, args.slow, args.fail, args.hang, args.slow_ms)
+        report("serial", len(sample), *run_serial(sample, timeout_ms / 1000))
+    for mode in modes:
+        mons = build_monitors(base, args.monitors, args.slow, args.fail, args.hang, args.slow_ms, mode)
+        report(f"async/{mode}", len(mons), *asyncio.run(run_async(mons, args.concurrency, args.rounds)))
+    for k in (int(x) for x in args.procs.split(",") if x.strip()):
+        mons = build_monitors(base, args.monitors, args.slow, args.fail, args.hang, args.slow_ms, modes[0])
+        elapsed, ok, avg, children = asyncio.run(run_pool(ProbePool(k, args.concurrency).start(), mons, args.rounds))
+        report(f"procs/{k}", len(mons), elapsed, ok, avg)
+        for c in children:
+            print(f"{'':<10} child #{c['child']}: {c['checks']} checks, cpu {c['cpu_percent']}%")
@@ -0,0 +1,108 @@
+# scripts/bench/stub_server.py
+"""Tiny asyncio HTTP/1.1 target server for benchmarks.
+
+Paths:
+  /ok            -> 200
+  /fail          -> 500
+  /slow?ms=N     -> 200 after N ms
+  /hang          -> never answers (exercises client timeouts)
+  /bot<token>/sendMessage
+                 -> Telegram-style {"ok": true}; with a --tg-rate limit, excess
+                    requests get 429 and parameters.retry_after like the real API
+
+Run standalone with `python stub_server.py --port 8099`, or start it in a
+child process from another script with `start_background()`.
+"""
+import argparse, asyncio, json, multiprocessing, socket, time
+from urllib.parse import urlsplit, parse_qs
+
+TG_RATE = 0.0  # messages/second accepted on sendMessage; 0 = unlimited
+_tg_window = [0.0, 0]  # [window start, messages in window]
+
+
+def _telegram():
+    if TG_RATE:
+        now = time.monotonic()
+        if now - _tg_window[0] >= 1:
+            _tg_window[:] = [now, 0]
+        if _tg_window[1] >= TG_RATE:
+            retry = max(1, round(1 - (now - _tg_window[0])))
+            return 429, json.dumps({"ok": False, "error_code": 429, "parameters": {"retry_after": retry}}).encode()
+        _tg_window[1] += 1
+    return 200, b'{"ok":true,"result":{}}'
+
+
+async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            request_line, *header_lines = head.decode("latin-1").split("\r\n")
+            _, target, _ = request_line.split(" ", 2)
+            headers = {k.strip().lower(): v.strip() for k, _, v in (h.partition(":") for h in header_lines if h)}
+            if int(headers.get("content-length", 0)):
+                await reader.readexactly(int(headers["content-length"]))
+
+            parts = urlsplit(target)
+            qs = parse_qs(parts.query)
+            status, body = 200, b"ok"
+            if parts.path == "/fail":
+                status, body = 500, b"fail"
+            elif parts.path == "/slow":
+                await asyncio.sleep(int(qs.get("ms", ["1000"])[0]) / 1000)
+            elif parts.path == "/hang":
+                await asyncio.sleep(3600)
+            elif parts.path.endswith("/sendMessage"):
+                status, body = _telegram()
+
+            writer.write(
+                f"HTTP/1.1 {status} X\r\nContent-Length: {len(body)}\r\nContent-Type: text/plain\r\n\r\n".encode()
+                + body
+            )
+            await writer.drain()
+            if headers.get("connection", "").lower() == "close":
+                break
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host: str = "127.0.0.1", port: int = 8099, tg_rate: float = 0.0, reuse_port: bool = False):
+    global TG_RATE
+    TG_RATE = tg_rate
+    server = await asyncio.start_server(_handle, host, port, backlog=4096, reuse_port=reuse_port or None)
+    async with server:
+        await server.serve_forever()
+
+
+def _run(host: str, port: int, tg_rate: float, reuse_port: bool = False):
+    asyncio.run(serve(host, port, tg_rate, reuse_port))
+
+
+def start_background(host: str = "127.0.0.1", port: int = 8099, tg_rate: float = 0.0, procs: int = 1) -> str:
+    """Start the stub in a child process and return its base URL.
+
+    A separate process keeps the stub from competing with the code under test
+    for the GIL, which would otherwise dominate the numbers. With `procs` > 1
+    several processes share the port (SO_REUSEPORT), so the stub keeps up
+    with a multi-process prober; --tg-rate is then enforced per process.
+    """
+    for _ in range(procs):
+        multiprocessing.Process(target=_run, args=(host, port, tg_rate, procs > 1), daemon=True).start()
+    for _ in range(100):
+        try:
+            socket.create_connection((host, port), timeout=0.1).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+    return f"http://{host}:{port}"
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8099)
+    ap.add_argument("--tg-rate", type=float, default=0.0, help="sendMessage calls/second before 429s")
+    args = ap.parse_args()
+    print(f"stub target listening on http://{args.host}:{args.port}")
+    asyncio.run(serve(args.host, args.port, args.tg_rate))
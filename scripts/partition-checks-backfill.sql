@@ -0,0 +1,20 @@
+-- scripts/partition-checks-backfill.sql
+-- Second step of scripts/partition-checks.sql: copy the checks still inside
+-- the retention window (CHECK_RETENTION_DAYS, 30 by default; keep the two in
+-- sync) from checks_legacy into the partitioned checks table. Run it once the
+-- worker has recreated checks; it is safe to run while the worker is up.
+-- Days without a daily partition land in checks_default; the worker's
+-- maintenance deletes them from there once they expire and are rolled up. Older history is
+-- not copied and goes away with checks_legacy. Copied rows get new ids from
+-- the new table's sequence (nothing refers to check ids), so they can't
+-- collide with checks the worker wrote before the backfill ran.
+BEGIN;
+INSERT INTO checks (monitor_id, ts, status_code, latency_ms, ok, error_reason,
+                    dns_ms, connect_ms, tls_ms, ttfb_ms, transfer_ms)
+SELECT monitor_id, ts, status_code, latency_ms, ok, error_reason,
+       dns_ms, connect_ms, tls_ms, ttfb_ms, transfer_ms
+FROM checks_legacy
+WHERE ts >= now() - interval '30 days';
+COMMIT;
+-- Once the copy has been checked:
+-- DROP TABLE checks_legacy;
@@ -0,0 +1,18 @@
+-- scripts/partition-checks.sql
+-- One-off migration for databases created before checks was partitioned.
+-- Stop the monitor worker first. On its next start it recreates "checks" as a
+-- partitioned table and creates the daily partitions. The old rows are kept
+-- in checks_legacy; to carry recent history over, run
+-- scripts/partition-checks-backfill.sql once the worker is up, then drop
+-- checks_legacy. Without the backfill the raw check history is dropped with
+-- checks_legacy (the rollups keep their aggregates).
+BEGIN;
+ALTER TABLE checks RENAME TO checks_legacy;
+ALTER INDEX IF EXISTS checks_pkey RENAME TO checks_legacy_pkey;
+ALTER INDEX IF EXISTS ix_checks_monitor_id RENAME TO ix_checks_legacy_monitor_id;
+ALTER INDEX IF EXISTS ix_checks_ts RENAME TO ix_checks_legacy_ts;
+ALTER INDEX IF EXISTS ix_checks_ok RENAME TO ix_checks_legacy_ok;
+-- The id sequence stays with the legacy table (DROP TABLE checks_legacy
+-- drops it too); renaming it frees checks_id_seq for the new table.
+ALTER SEQUENCE IF EXISTS checks_id_seq RENAME TO checks_legacy_id_seq;
+COMMIT;
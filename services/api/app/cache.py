@@ -0,0 +1,161 @@
+# services/api/app/cache.py
+import os, json, time, asyncio, hashlib
+from collections import OrderedDict
+
+import redis
+import redis.asyncio as aioredis
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from .metrics import CACHE
+
+CACHE_TTL_SEC = float(os.getenv("RESPONSE_CACHE_TTL_SEC", 5))
+CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 1024))
+CACHE_SHARED = os.getenv("RESPONSE_CACHE_SHARED", "1") == "1"
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
+
+# Shared with the monitor worker, which bumps the generation on incident
+# open/resolve; keys in the shared tier embed the generation, so a bump
+# orphans every stale entry at once.
+KEY_GEN = "respcache:gen"
+KEY_PREFIX = "respcache:"
+INVALIDATE_CHANNEL = "cache:invalidate"
+
+
+class ResponseCache:
+    """Two-tier cache for public JSON responses.
+
+    Tier 1 is an in-process LRU with a TTL; tier 2 (optional) is Redis,
+    shared by all API replicas. Concurrent misses for the same key are
+    coalesced: one request computes the body while the others wait for it,
+    so a stampede on the status page costs at most one DB query per key per
+    TTL per process. All state lives on the event loop, so no locking.
+    """
+
+    def __init__(self, ttl: float = CACHE_TTL_SEC, max_entries: int = CACHE_MAX_ENTRIES, r=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.r = r
+        self.generation = 0
+        self._entries = OrderedDict()  # key -> (expires_at, body, etag)
+        self._inflight = {}            # key -> Event set when the leader finishes
+
+    def _local_get(self, key: str):
+        hit = self._entries.get(key)
+        if hit is None:
+            return None
+        if hit[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return hit[1], hit[2]
+
+    def _local_set(self, key: str, body: bytes, etag: str):
+        self._entries[key] = (time.monotonic() + self.ttl, body, etag)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _shared_key(self, key: str) -> str:
+        return f"{KEY_PREFIX}{self.generation}:{key}"
+
+    async def _shared_get(self, key: str):
+        if self.r is None:
+            return None
+        try:
+            body = await self.r.get(self._shared_key(key))
+        except redis.RedisError:
+            return None
+        return None if body is None else (body, _etag(body))
+
+    async def _shared_set(self, key: str, body: bytes):
+        if self.r is None:
+            return
+        try:
+            await self.r.set(self._shared_key(key), body, px=int(self.ttl * 1000))
+        except redis.RedisError:
+            pass
+
+    async def get_or_compute(self, key: str, producer) -> tuple[bytes, str]:
+        """Return (body, etag) for `key`, awaiting `producer()` at most once across concurrent callers."""
+        while True:
+            hit = self._local_get(key)
+            if hit is not None:
+                CACHE.labels("hit").inc()
+                return hit
+            waiter = self._inflight.get(key)
+            if waiter is None:
+                self._inflight[key] = asyncio.Event()
+                break
+            await waiter.wait()
+            # the leader may have failed or the entry may already be gone; loop and re-check
+
+        try:
+            hit = await self._shared_get(key)
+            CACHE.labels("shared" if hit is not None else "miss").inc()
+            if hit is None:
+                body = json.dumps(jsonable_encoder(await producer()), separators=(",", ":")).encode()
+                hit = body, _etag(body)
+                await self._shared_set(key, body)
+            self._local_set(key, *hit)
+            return hit
+        finally:
+            self._inflight.pop(key).set()
+
+    async def respond(self, request: Request, producer) -> Response:
+        """Serve the JSON returned by the coroutine function `producer` through the cache.
+
+        A matching If-None-Match is answered with 304.
+        """
+        key = request.url.path + "?" + "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+        body, etag = await self.get_or_compute(key, producer)
+        headers = {"ETag": etag, "Cache-Control": f"public, max-age={int(self.ttl)}"}
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def invalidate(self, generation: int = None):
+        self._entries.clear()
+        if generation is not None:
+            self.generation = generation
+
+    async def bump(self):
+        """Invalidate everywhere: this process, other replicas and the shared tier."""
+        self.invalidate()
+        if self.r is None:
+            return
+        try:
+            pipe = self.r.pipeline()
+            pipe.incr(KEY_GEN)
+            pipe.publish(INVALIDATE_CHANNEL, "1")
+            self.invalidate((await pipe.execute())[0])
+        except redis.RedisError:
+            pass
+
+    async def sync_generation(self):
+        """Adopt the current shared generation, dropping local entries.
+
+        Called by the event hub (events.py) on every invalidation message and
+        after (re)subscribing, since bumps may have been missed meanwhile.
+        """
+        if self.r is None:
+            self.invalidate()
+            return
+        try:
+            self.invalidate(int(await self.r.get(KEY_GEN) or 0))
+        except redis.RedisError:
+            self.invalidate()
+
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def _etag_matches(header, etag: str) -> bool:
+    if not header:
+        return False
+    tags = [t.strip() for t in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+cache = ResponseCache(r=aioredis.from_url(REDIS_URL) if CACHE_SHARED else None)
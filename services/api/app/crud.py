@@ -1,32 +1,256 @@
-from sqlalchemy.orm import Session
+import csv
+import io
+import json
+import math
+import os
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import BigInteger, and_, cast, func, literal_column, select, true, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from . import models, schemas
+from .db import SessionLocal
 
-def create_monitor(db: Session, payload: schemas.MonitorCreate) -> models.Monitor:
-    m = models.Monitor(
-        name=payload.name,
-        url=str(payload.url),
-        method=payload.method,
-        interval_sec=payload.interval_sec,
-        timeout_ms=payload.timeout_ms,
-        expected_statuses=list(payload.expected_statuses or [200]),
-        is_enabled=payload.is_enabled,
-    )
+WINDOWS = {
+    "1h": timedelta(hours=1),
+    "24h": timedelta(hours=24),
+    "7d": timedelta(days=7),
+    "30d": timedelta(days=30),
+    "90d": timedelta(days=90),
+}
+PERCENTILES = (50, 95, 99)
+
+# Rows fetched per round trip from the export's server-side cursor; one chunk of output each.
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", 5000))
+EXPORT_COLUMNS = ("ts", "ok", "status_code", "latency_ms", *(f"{p}_ms" for p in models.PHASES), "error_reason")
+
+# Monitor settings a bulk upsert may change; (name, url) is the key it matches on.
+MONITOR_SETTINGS = ("method", "interval_sec", "timeout_ms", "expected_statuses", "is_enabled", "latency_mode")
+
+def _monitor_values(payload: schemas.MonitorCreate) -> dict:
+    return {
+        "name": payload.name,
+        "url": str(payload.url),
+        "method": payload.method,
+        "interval_sec": payload.interval_sec,
+        "timeout_ms": payload.timeout_ms,
+        "expected_statuses": list(payload.expected_statuses or [200]),
+        "is_enabled": payload.is_enabled,
+        "latency_mode": payload.latency_mode,
+    }
+
+async def create_monitor(db: AsyncSession, payload: schemas.MonitorCreate) -> models.Monitor:
+    m = models.Monitor(**_monitor_values(payload))
     db.add(m)
-    db.commit()
-    db.refresh(m)
+    await db.commit()
+    await db.refresh(m)
     return m
 
-def list_monitors(db: Session) -> list[models.Monitor]:
-    return db.query(models.Monitor).order_by(models.Monitor.id.desc()).all()
+async def upsert_monitors(db: AsyncSession, payloads: list[schemas.MonitorCreate]) -> dict[tuple, tuple[int, str]]:
+    """Create or update monitors matched on (name, url), in one INSERT ... ON CONFLICT.
+
+    Rows whose settings already match are left alone (no new row version,
+    nothing for the workers to reload). Returns {(name, url): (id, status)}
+    with status "created", "updated" or "unchanged". `payloads` must not
+    repeat a (name, url) pair.
+    """
+    M = models.Monitor
+    stmt = pg_insert(M).values([_monitor_values(p) for p in payloads])
+    ours = tuple_(*(getattr(M, c) for c in MONITOR_SETTINGS))
+    theirs = tuple_(*(getattr(stmt.excluded, c) for c in MONITOR_SETTINGS))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[M.name, M.url],
+        set_={c: getattr(stmt.excluded, c) for c in MONITOR_SETTINGS},
+        where=ours.is_distinct_from(theirs),
+    ).returning(M.id, M.name, M.url, literal_column("xmax = 0"))  # xmax is 0 on freshly inserted rows
+    out = {(name, url): (mid, "created" if inserted else "updated")
+           for mid, name, url, inserted in (await db.execute(stmt)).all()}
+    unchanged = [(p.name, str(p.url)) for p in payloads if (p.name, str(p.url)) not in out]
+    if unchanged:
+        for mid, name, url in (await db.execute(
+            select(M.id, M.name, M.url).where(tuple_(M.name, M.url).in_(unchanged))
+        )).all():
+            out[(name, url)] = (mid, "unchanged")
+    await db.commit()
+    return out
+
+async def list_monitors(db: AsyncSession) -> list[models.Monitor]:
+    return (await db.scalars(select(models.Monitor).order_by(models.Monitor.id.desc()))).all()
+
+def _rollup_since(window: str):
+    """Rollup table and first bucket covering `window`: minutes up to a day, hours beyond."""
+    delta = WINDOWS[window]
+    since = datetime.now(timezone.utc) - delta
+    if delta <= timedelta(hours=24):
+        return models.CheckRollupMinute, since.replace(second=0, microsecond=0)
+    return models.CheckRollupHour, since.replace(minute=0, second=0, microsecond=0)
+
+def _aggregates(R):
+    return (
+        func.coalesce(func.sum(R.total), 0),
+        func.coalesce(func.sum(R.ok), 0),
+        func.coalesce(func.sum(R.latency_n), 0),
+        func.coalesce(func.sum(R.latency_sum), 0),
+        func.min(R.latency_min),
+        func.max(R.latency_max),
+    )
+
+def _percentiles(buckets, lat_min, lat_max) -> dict:
+    """p50/p95/p99 from merged sketch buckets ((index, count) pairs), clamped to the observed min/max."""
+    buckets = sorted((int(i), int(n)) for i, n in buckets)
+    total = sum(n for _, n in buckets)
+    out = {}
+    seen, it = 0, iter(buckets)
+    for p in PERCENTILES:
+        value = None
+        if total:
+            rank = max(1, math.ceil(total * p / 100))
+            while seen < rank:
+                i, n = next(it)
+                seen += n
+            # bucket midpoint in relative terms: within SKETCH_ALPHA of any value in it
+            value = 2 * models.SKETCH_GAMMA ** i / (models.SKETCH_GAMMA + 1)
+            if lat_min is not None:
+                value = min(max(value, lat_min), lat_max)
+            value = round(value, 1)
+        out[f"p{p}_ms"] = value
+    out["samples"] = total
+    return out
+
+def _summary(total, ok, lat_n, lat_sum, lat_min, lat_max) -> dict:
+    return {
+        "uptime_percent": round(ok / total * 100.0, 2) if total else 0.0,
+        "avg_latency_ms": int(lat_sum / lat_n) if lat_n else 0,
+        "min_latency_ms": lat_min,
+        "max_latency_ms": lat_max,
+        "checks": int(total),
+    }
+
+async def get_summary(db: AsyncSession, monitor_id: int, window: str) -> dict:
+    """Uptime and latency for one monitor over `window`, summed from the worker's rollups.
+
+    Cost depends on the number of buckets in the window, not on how many raw
+    checks the monitor has accumulated.
+    """
+    R, since = _rollup_since(window)
+    in_window = (R.monitor_id == monitor_id, R.bucket >= since)
+    summary = _summary(*(await db.execute(select(*_aggregates(R)).where(*in_window))).one())
 
-def get_summary(db: Session, monitor_id: int, window: str):
-    # stub summary; you can extend with real time windows later
-    from sqlalchemy import func
-    avg_latency = db.query(func.avg(models.Check.latency_ms)).filter(models.Check.monitor_id == monitor_id).scalar()
-    total = db.query(models.Check).filter(models.Check.monitor_id == monitor_id).count()
-    ok = db.query(models.Check).filter(models.Check.monitor_id == monitor_id, models.Check.ok == True).count()
-    uptime = (ok / total * 100.0) if total else 0.0
-    return round(uptime, 2), int(avg_latency or 0)
+    hist = func.unnest(R.latency_hist).table_valued("n", with_ordinality="i").render_derived()
+    counts = dict((await db.execute(
+        select(hist.c.i, func.sum(hist.c.n)).select_from(R).join(hist, true()).where(*in_window).group_by(hist.c.i)
+    )).all())
+    bounds = list(models.LATENCY_BUCKETS_MS) + [None]
+    summary["latency_histogram"] = [{"le": le, "count": int(counts.get(i, 0))} for i, le in enumerate(bounds, start=1)]
 
-def active_incidents(db: Session):
-    return db.query(models.Incident).filter(models.Incident.state == "open").all()
+    # merge the buckets' sketches; rollups written before sketches existed count towards nothing here
+    sk = func.jsonb_each_text(R.latency_sketch).table_valued("key", "value").render_derived()
+    merged = (await db.execute(
+        select(sk.c.key, func.sum(cast(sk.c.value, BigInteger))).select_from(R).join(sk, true()).where(*in_window).group_by(sk.c.key)
+    )).all()
+    summary["latency_percentiles"] = _percentiles(merged, summary["min_latency_ms"], summary["max_latency_ms"])
+
+    # average per phase over the checks that measured it (dns/connect/tls only on new connections)
+    ph = func.unnest(R.phase_sum, R.phase_n).table_valued("s", "n", with_ordinality="i").render_derived()
+    sums = {i: (s, n) for i, s, n in (await db.execute(
+        select(ph.c.i, func.sum(ph.c.s), func.sum(ph.c.n)).select_from(R).join(ph, true()).where(*in_window).group_by(ph.c.i)
+    )).all()}
+    summary["phases"] = {}
+    for i, phase in enumerate(models.PHASES, start=1):
+        s, n = sums.get(i, (0, 0))
+        summary["phases"][f"{phase}_ms"] = round(float(s) / n, 2) if n else None
+        summary["phases"][f"{phase}_samples"] = int(n or 0)
+    return summary
+
+async def get_summaries(db: AsyncSession, window: str, monitor_ids: list[int] | None = None) -> list[dict]:
+    """Summaries for every monitor (or just `monitor_ids`) in one grouped query.
+
+    Monitors with no checks in the window are included with zero counts.
+    """
+    R, since = _rollup_since(window)
+    M = models.Monitor
+    q = (
+        select(M.id, *_aggregates(R))
+        .outerjoin(R, and_(R.monitor_id == M.id, R.bucket >= since))
+        .group_by(M.id)
+        .order_by(M.id.desc())
+    )
+    if monitor_ids is not None:
+        q = q.where(M.id.in_(monitor_ids))
+    return [{"monitor_id": mid, **_summary(*agg)} for mid, *agg in (await db.execute(q)).all()]
+
+async def active_incidents(db: AsyncSession):
+    # Reads only the partial unique index on open incidents; the literal (not a
+    # bind parameter) lets prepared statements use it too.
+    I = models.Incident
+    return (await db.scalars(select(I).where(I.state == literal_column("'open'")).order_by(I.id.desc()))).all()
+
+async def incident_history(db: AsyncSession, monitor_ids: list[int] | None = None, state: str | None = None,
+                           before: int | None = None, limit: int = 50) -> tuple[list[models.Incident], int | None]:
+    """One page of incidents, newest first, and the cursor for the next page (None on the last).
+
+    Keyset pagination on the id (ids increase with opened_at), so page N
+    costs the same as page 1 however much history there is.
+    """
+    I = models.Incident
+    q = select(I).order_by(I.id.desc()).limit(limit + 1)
+    if monitor_ids is not None:
+        q = q.where(I.monitor_id.in_(monitor_ids))
+    if state is not None:
+        q = q.where(I.state == state)
+    if before is not None:
+        q = q.where(I.id < before)
+    rows = (await db.scalars(q)).all()
+    return rows[:limit], (rows[limit - 1].id if len(rows) > limit else None)
+
+async def incident_stats(db: AsyncSession, monitor_ids: list[int] | None = None) -> list[dict]:
+    """Incident counts and MTTR per monitor from the worker-maintained incident_stats table."""
+    S = models.IncidentStats
+    q = select(S).order_by(S.monitor_id.desc())
+    if monitor_ids is not None:
+        q = q.where(S.monitor_id.in_(monitor_ids))
+    return [
+        {
+            "monitor_id": st.monitor_id,
+            "incidents": st.opened,
+            "resolved": st.resolved,
+            "mttr_sec": round(st.downtime_ms / st.resolved / 1000, 1) if st.resolved else None,
+            "downtime_sec": round(st.downtime_ms / 1000, 1),
+            "last_opened_at": st.last_opened_at,
+            "last_resolved_at": st.last_resolved_at,
+        }
+        for st in (await db.scalars(q)).all()
+    ]
+
+def _csv_chunk(rows) -> str:
+    buf = io.StringIO()
+    csv.writer(buf).writerows((r[0].isoformat(), *r[1:]) for r in rows)
+    return buf.getvalue()
+
+def _ndjson_chunk(rows) -> str:
+    return "".join(
+        json.dumps({"ts": r[0].isoformat(), **dict(zip(EXPORT_COLUMNS[1:], r[1:]))}, separators=(",", ":")) + "\n"
+        for r in rows
+    )
+
+async def export_checks(monitor_id: int, since: datetime, until: datetime, fmt: str = "csv"):
+    """Raw checks for one monitor in [since, until), oldest first, as CSV or NDJSON text chunks.
+
+    Rows come off a server-side cursor EXPORT_BATCH_ROWS at a time and are
+    never turned into ORM objects, so memory stays flat however long the
+    range. Uses its own session: a StreamingResponse outlives the request's
+    dependencies.
+    """
+    C = models.Check
+    q = (
+        select(*(getattr(C, c) for c in EXPORT_COLUMNS))
+        .where(C.monitor_id == monitor_id, C.ts >= since, C.ts < until)  # ts bounds prune partitions
+        .order_by(C.ts)
+        .execution_options(yield_per=EXPORT_BATCH_ROWS)
+    )
+    encode = _csv_chunk if fmt == "csv" else _ndjson_chunk
+    if fmt == "csv":
+        yield ",".join(EXPORT_COLUMNS) + "\r\n"
+    async with SessionLocal() as db:
+        result = await db.stream(q)
+        async for rows in result.partitions():
+            yield encode(rows)
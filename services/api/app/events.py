@@ -0,0 +1,133 @@
+# services/api/app/events.py
+import os, json, asyncio
+
+import redis
+import redis.asyncio as aioredis
+
+from .cache import cache, REDIS_URL, INVALIDATE_CHANNEL
+from .metrics import SSE_SUBSCRIBERS
+
+# Published by the monitor worker: batched check results and incident transitions.
+EVENTS_CHANNEL = os.getenv("EVENTS_CHANNEL", "events")
+# Consumed by the monitor workers, which reload just the listed monitors (services/monitor/worker.py).
+MONITORS_CHANNEL = os.getenv("MONITORS_CHANNEL", "monitors:changed")
+SSE_QUEUE_MAX = int(os.getenv("SSE_QUEUE_MAX", 256))
+SSE_HEARTBEAT_SEC = float(os.getenv("SSE_HEARTBEAT_SEC", 15))
+SSE_RETRY_MS = int(os.getenv("SSE_RETRY_MS", 3000))
+
+
+def sse_frame(event: dict) -> bytes:
+    return f"event: {event['type']}\ndata: {json.dumps(event, separators=(',', ':'))}\n\n".encode()
+
+
+class Subscriber:
+    """One SSE client: a bounded queue of ready-to-send frames, optionally limited to some monitors."""
+
+    def __init__(self, monitor_ids: set | None = None):
+        self.monitor_ids = monitor_ids
+        self.queue = asyncio.Queue(maxsize=SSE_QUEUE_MAX)
+        self.lagged = False
+
+    def frame_for(self, event: dict, frame: bytes):
+        if self.monitor_ids is None:
+            return frame
+        if event["type"] == "checks":
+            subset = [c for c in event["checks"] if c["monitor_id"] in self.monitor_ids]
+            return sse_frame({**event, "checks": subset}) if subset else None
+        return frame if event.get("monitor_id") in self.monitor_ids else None
+
+    def offer(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # A client that can't keep up is cut off (and reconnects, re-reading
+            # current state) rather than buffering without bound.
+            self.lagged = True
+
+
+class EventHub:
+    """Single Redis pub/sub subscription per API process, fanned out to SSE clients.
+
+    Each message is decoded and framed once, however many clients are
+    connected. The same subscription carries the response cache's
+    invalidation channel, so a process holds one pub/sub connection in total.
+    """
+
+    def __init__(self, url: str = REDIS_URL):
+        self.r = aioredis.from_url(url)
+        self.subscribers = set()
+
+    def subscribe(self, monitor_ids: set | None = None) -> Subscriber:
+        sub = Subscriber(monitor_ids)
+        self.subscribers.add(sub)
+        SSE_SUBSCRIBERS.set(len(self.subscribers))
+        return sub
+
+    def unsubscribe(self, sub: Subscriber):
+        self.subscribers.discard(sub)
+        SSE_SUBSCRIBERS.set(len(self.subscribers))
+
+    def publish_local(self, event: dict):
+        frame = sse_frame(event)
+        for sub in list(self.subscribers):
+            item = sub.frame_for(event, frame)
+            if item is not None:
+                sub.offer(item)
+
+    async def notify_monitors_changed(self, ids: list[int]):
+        """Tell the monitor workers to reload `ids`; if this is lost, their periodic refresh catches up."""
+        if not ids:
+            return
+        try:
+            await self.r.publish(MONITORS_CHANNEL, json.dumps({"ids": ids}))
+        except redis.RedisError as e:
+            print(f"[api] Could not notify workers of monitor changes ({e}).")
+
+    async def handle(self, msg: dict):
+        channel = msg["channel"].decode()
+        if channel == INVALIDATE_CHANNEL:
+            await cache.sync_generation()
+            return
+        self.publish_local(json.loads(msg["data"]))
+
+    async def run(self):
+        while True:
+            try:
+                async with self.r.pubsub(ignore_subscribe_messages=True) as ps:
+                    await ps.subscribe(EVENTS_CHANNEL, INVALIDATE_CHANNEL)
+                    await cache.sync_generation()
+                    async for msg in ps.listen():
+                        try:
+                            await self.handle(msg)
+                        except redis.RedisError:
+                            raise
+                        except Exception as e:
+                            # one bad message (undecodable, missing fields) must not end the fan-out
+                            print(f"[api] Dropping event on {msg.get('channel')!r}: {e!r}")
+            except redis.RedisError as e:
+                print(f"[api] Event subscription error ({e}); reconnecting...")
+                # clients may have missed events; tell them to refetch
+                self.publish_local({"type": "resync"})
+                await asyncio.sleep(2)
+
+    async def stream(self, monitor_ids: set | None = None):
+        """Yield SSE frames until the client disconnects or falls behind.
+
+        The subscription is made here rather than by the caller, so a client
+        that goes away before the response starts never leaves one behind.
+        """
+        sub = self.subscribe(monitor_ids)
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n".encode()
+            yield sse_frame({"type": "hello"})
+            while not sub.lagged:
+                try:
+                    yield await asyncio.wait_for(sub.queue.get(), SSE_HEARTBEAT_SEC)
+                except asyncio.TimeoutError:
+                    # keeps idle connections open through proxies and load balancers
+                    yield b": ping\n\n"
+        finally:
+            self.unsubscribe(sub)
+
+
+hub = EventHub()
@@ -1,57 +1,217 @@
 # services/api/app/main.py
 import os
-import time
-from fastapi import FastAPI, Depends
+import asyncio
+from datetime import datetime, timedelta, timezone
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Body, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError
+from pydantic import ValidationError
 from app import models
 
 from .db import Base, engine, get_db
 from . import schemas, crud
+from .cache import cache
+from .events import hub
+from .metrics import MetricsMiddleware, instrument_engine, metrics_response
 
-# --- Create tables with retry so we don't die if Postgres is still booting ---
-max_tries = 20
-for i in range(max_tries):
-    try:
-        Base.metadata.create_all(bind=engine)
-        break
-    except OperationalError:
-        print(f"[api] DB not ready, retrying ({i+1}/{max_tries})...")
-        time.sleep(1.5)
+# Items per POST /monitors:batch; the upsert binds 8 parameters per monitor
+# and Postgres allows 65535 per statement.
+MONITORS_BATCH_MAX = int(os.getenv("MONITORS_BATCH_MAX", 5000))
+
+async def create_tables(max_tries: int = 20):
+    """Create tables with retry so we don't die if Postgres is still booting.
+
+    Upgrades of existing tables (new columns, indexes, backfills) are owned
+    by the monitor worker; see ensure_tables_once in services/monitor/worker.py.
+    """
+    for i in range(max_tries):
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+            return
+        except (OperationalError, OSError):
+            print(f"[api] DB not ready, retrying ({i+1}/{max_tries})...")
+            await asyncio.sleep(1.5)
 
-app = FastAPI(title="Uptime API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await create_tables()
+    listener = asyncio.create_task(hub.run())
+    yield
+    listener.cancel()
+    await engine.dispose()
+
+app = FastAPI(title="Uptime API", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
+instrument_engine(engine)
 
 @app.get("/healthz")
-def healthz():
+async def healthz():
     return {"ok": True}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return metrics_response()
+
+def parse_ids(ids: str | None) -> list[int] | None:
+    if not ids:
+        return None
+    try:
+        return [int(i) for i in ids.split(",") if i.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be a comma-separated list of integers")
+
+def as_utc(ts: datetime | None) -> datetime | None:
+    return ts.replace(tzinfo=timezone.utc) if ts is not None and ts.tzinfo is None else ts
+
 # Admin CRUD
 @app.post("/monitors", response_model=schemas.MonitorOut)
-def create_monitor(payload: schemas.MonitorCreate, db: Session = Depends(get_db)):
-    return crud.create_monitor(db, payload)
+async def create_monitor(payload: schemas.MonitorCreate, db: AsyncSession = Depends(get_db)):
+    try:
+        m = await crud.create_monitor(db, payload)
+    except IntegrityError:
+        raise HTTPException(status_code=409, detail="a monitor with this name and url already exists")
+    await cache.bump()
+    await hub.notify_monitors_changed([m.id])
+    return m
+
+@app.post("/monitors:batch")
+async def upsert_monitors(items: list[dict] = Body(...), db: AsyncSession = Depends(get_db)):
+    """Create or update many monitors at once, matched on (name, url).
+
+    Each item is validated on its own: invalid ones are reported and
+    skipped, the rest are written as one upsert. Results are in input order.
+    """
+    if len(items) > MONITORS_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"at most {MONITORS_BATCH_MAX} monitors per batch")
+    results = [None] * len(items)
+    valid = {}  # (name, url) -> (index, payload)
+    for i, item in enumerate(items):
+        try:
+            p = schemas.MonitorCreate.model_validate(item)
+        except ValidationError as e:
+            results[i] = {"index": i, "status": "invalid", "errors": e.errors(include_url=False, include_context=False)}
+            continue
+        key = (p.name, str(p.url))
+        if key in valid:
+            results[i] = {"index": i, "status": "invalid",
+                          "errors": [{"msg": f"same name and url as item {valid[key][0]}"}]}
+            continue
+        valid[key] = (i, p)
+
+    written = {}
+    if valid:
+        try:
+            written = await crud.upsert_monitors(db, [p for _, p in valid.values()])
+        except ProgrammingError:
+            # no unique index to match on; see UPGRADE_MONITORS in services/monitor/worker.py
+            raise HTTPException(status_code=409, detail="monitors has duplicate (name, url) pairs; "
+                                                        "remove them so uq_monitors_name_url can be created")
+    for key, (i, _) in valid.items():
+        mid, status = written[key]
+        results[i] = {"index": i, "status": status, "id": mid}
+
+    changed = [r["id"] for r in results if r["status"] in ("created", "updated")]
+    if changed:
+        await cache.bump()
+        await hub.notify_monitors_changed(changed)
+    counts = {status: 0 for status in ("created", "updated", "unchanged", "invalid")}
+    for r in results:
+        counts[r["status"]] += 1
+    return {**counts, "results": results}
 
 @app.get("/monitors", response_model=list[schemas.MonitorOut])
-def list_monitors(db: Session = Depends(get_db)):
-    return crud.list_monitors(db)
+async def list_monitors(db: AsyncSession = Depends(get_db)):
+    return await crud.list_monitors(db)
+
+EXPORT_MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+@app.get("/monitors/{monitor_id}/checks/export")
+async def export_checks(monitor_id: int, format: schemas.ExportFormat = "csv", since: datetime | None = None,
+                        until: datetime | None = None, db: AsyncSession = Depends(get_db)):
+    """Raw check history in [since, until) (default: the last 24h), streamed as CSV or NDJSON.
+
+    Timestamps without an offset are taken as UTC.
+    """
+    until = as_utc(until) or datetime.now(timezone.utc)
+    since = as_utc(since) or until - timedelta(hours=24)
+    if since >= until:
+        raise HTTPException(status_code=400, detail="since must be before until")
+    if await db.get(models.Monitor, monitor_id) is None:
+        raise HTTPException(status_code=404, detail="monitor not found")
+    await db.close()  # the export streams on its own session; don't hold this connection for its duration
+    filename = f"monitor-{monitor_id}-checks-{since:%Y%m%dT%H%M%S}-{until:%Y%m%dT%H%M%S}.{format}"
+    return StreamingResponse(
+        crud.export_checks(monitor_id, since, until, format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
-# Public endpoints
-@app.get("/public/monitors")
-def public_monitors(db: Session = Depends(get_db)):
-    return crud.list_monitors(db)
+# Public endpoints (cached; see cache.py)
+@app.get("/public/monitors", response_model=list[schemas.MonitorOut])
+async def public_monitors(request: Request, db: AsyncSession = Depends(get_db)):
+    async def produce():
+        return [schemas.MonitorOut.model_validate(m).model_dump(mode="json") for m in await crud.list_monitors(db)]
+    return await cache.respond(request, produce)
 
 @app.get("/public/monitors/{monitor_id}/summary")
-def public_summary(monitor_id: int, window: str = "24h", db: Session = Depends(get_db)):
-    up, avg = crud.get_summary(db, monitor_id, window)
-    return {"uptime_percent": up, "avg_latency_ms": avg, "window": window}
+async def public_summary(monitor_id: int, request: Request, window: schemas.Window = "24h", db: AsyncSession = Depends(get_db)):
+    async def produce():
+        return {**await crud.get_summary(db, monitor_id, window), "window": window}
+    return await cache.respond(request, produce)
+
+@app.get("/public/summary")
+async def public_summaries(request: Request, window: schemas.Window = "24h", ids: str | None = None, db: AsyncSession = Depends(get_db)):
+    """Summaries for all monitors, or the comma-separated `ids`, in one query."""
+    monitor_ids = parse_ids(ids)
+    async def produce():
+        return {"window": window, "summaries": await crud.get_summaries(db, window, monitor_ids)}
+    return await cache.respond(request, produce)
+
+def incident_out(i: models.Incident) -> dict:
+    return {"id": i.id, "monitor_id": i.monitor_id, "opened_at": i.opened_at, "closed_at": i.closed_at,
+            "reason": i.reason, "state": i.state}
 
 @app.get("/public/incidents/active")
-def public_incidents(db: Session = Depends(get_db)):
-    inc = crud.active_incidents(db)
-    return [{"id": i.id, "monitor_id": i.monitor_id, "opened_at": i.opened_at, "reason": i.reason, "state": i.state} for i in inc]
+async def public_incidents(request: Request, db: AsyncSession = Depends(get_db)):
+    async def produce():
+        return [incident_out(i) for i in await crud.active_incidents(db)]
+    return await cache.respond(request, produce)
+
+@app.get("/public/incidents")
+async def public_incident_history(request: Request, ids: str | None = None, state: schemas.IncidentState | None = None,
+                                  before: int | None = None, limit: int = Query(50, ge=1, le=500),
+                                  db: AsyncSession = Depends(get_db)):
+    """Incident history, newest first; pass the returned `next` as `before` for the following page."""
+    monitor_ids = parse_ids(ids)
+    async def produce():
+        rows, next_before = await crud.incident_history(db, monitor_ids, state, before, limit)
+        return {"incidents": [incident_out(i) for i in rows], "next": next_before}
+    return await cache.respond(request, produce)
+
+@app.get("/public/incidents/stats")
+async def public_incident_stats(request: Request, ids: str | None = None, db: AsyncSession = Depends(get_db)):
+    """Incident count, MTTR and total downtime per monitor (all time)."""
+    monitor_ids = parse_ids(ids)
+    async def produce():
+        return {"stats": await crud.incident_stats(db, monitor_ids)}
+    return await cache.respond(request, produce)
+
+@app.get("/public/stream")
+async def public_stream(ids: str | None = None):
+    """Server-sent events: batched check results and incident open/resolve, optionally for `ids` only."""
+    monitor_ids = parse_ids(ids)
+    return StreamingResponse(
+        hub.stream(set(monitor_ids) if monitor_ids is not None else None),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,73 @@
+# services/api/app/metrics.py
+import time
+
+from fastapi import Response
+from prometheus_client import Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+REQUESTS = Counter("api_requests_total", "HTTP requests", ["method", "route", "status"])
+REQUEST_SECONDS = Histogram("api_request_seconds", "HTTP request latency by route template",
+                            ["method", "route"], buckets=LATENCY_BUCKETS)
+DB_QUERY_SECONDS = Histogram("api_db_query_seconds", "Time spent executing SQL statements", buckets=LATENCY_BUCKETS)
+CACHE = Counter("api_cache_total", "Response cache lookups by outcome (local hit, shared hit, miss)", ["result"])
+SSE_SUBSCRIBERS = Gauge("api_sse_subscribers", "Connected /public/stream clients")
+
+# Long-lived responses would swamp the latency histogram; they're still counted.
+UNTIMED_ROUTES = {"/public/stream", "/metrics", "/monitors/{monitor_id}/checks/export"}
+
+
+class MetricsMiddleware:
+    """Plain ASGI middleware (BaseHTTPMiddleware would buffer the SSE stream).
+
+    Requests are labelled with the matched route template, e.g.
+    /public/monitors/{monitor_id}/summary, so ids don't blow up cardinality;
+    anything no route matched is "unmatched".
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUESTS.labels(scope["method"], route, status).inc()
+            if route not in UNTIMED_ROUTES:
+                REQUEST_SECONDS.labels(scope["method"], route).observe(time.perf_counter() - start)
+
+
+def instrument_engine(engine):
+    """Time every statement on `engine` (an AsyncEngine's events live on its sync_engine)."""
+    target = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(target, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(target, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        DB_QUERY_SECONDS.observe(time.perf_counter() - conn.info["query_start"].pop())
+
+    @event.listens_for(target, "handle_error")
+    def _error(ctx):
+        # a failed statement never reaches after_cursor_execute
+        if ctx.connection is not None and ctx.connection.info.get("query_start"):
+            DB_QUERY_SECONDS.observe(time.perf_counter() - ctx.connection.info["query_start"].pop())
+
+
+def metrics_response() -> Response:
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
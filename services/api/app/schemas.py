@@ -1,6 +1,10 @@
 from typing import Literal, List
 from pydantic import BaseModel, HttpUrl, Field
 
+Window = Literal["1h", "24h", "7d", "30d", "90d"]
+IncidentState = Literal["open", "resolved"]
+ExportFormat = Literal["csv", "ndjson"]
+
 class MonitorBase(BaseModel):
     name: str = Field(min_length=1)
     url: HttpUrl
@@ -9,6 +13,8 @@ class MonitorBase(BaseModel):
     timeout_ms: int = Field(5000, ge=500, le=30000)
     expected_statuses: List[int] = [200]
     is_enabled: bool = True
+    # "warm" reuses pooled keep-alive connections; "cold" opens a fresh one per check
+    latency_mode: Literal["warm", "cold"] = "warm"
 
 class MonitorCreate(MonitorBase):
     pass
@@ -0,0 +1,104 @@
+# services/api/tests/test_cache.py
+import asyncio
+
+import fakeredis
+import httpx
+from fastapi import FastAPI, Request
+
+from app.cache import ResponseCache
+
+
+class Producer:
+    def __init__(self, value=None, delay=0.05, fail=False):
+        self.calls = 0
+        self.value, self.delay, self.fail = value, delay, fail
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("db down")
+        return self.value if self.value is not None else {"n": self.calls}
+
+
+def test_concurrent_misses_compute_once():
+    async def go():
+        cache, produce = ResponseCache(), Producer()
+        results = await asyncio.gather(*(cache.get_or_compute("k", produce) for _ in range(20)))
+        return produce.calls, results
+
+    calls, results = asyncio.run(go())
+    assert calls == 1
+    assert len(set(results)) == 1 and results[0][0] == b'{"n":1}'
+
+
+def test_a_failed_leader_hands_over_to_a_waiter():
+    async def go():
+        cache = ResponseCache()
+        failing, working = Producer(fail=True), Producer({"ok": True})
+        leader = asyncio.create_task(cache.get_or_compute("k", failing))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(cache.get_or_compute("k", working))
+        done = await asyncio.gather(leader, follower, return_exceptions=True)
+        return done, working.calls
+
+    (leader, follower), calls = asyncio.run(go())
+    assert isinstance(leader, RuntimeError)
+    assert follower[0] == b'{"ok":true}' and calls == 1
+
+
+def test_entries_expire_after_the_ttl_and_on_invalidate():
+    async def go():
+        cache, produce = ResponseCache(ttl=0.05), Producer(delay=0)
+        await cache.get_or_compute("k", produce)
+        await cache.get_or_compute("k", produce)
+        await asyncio.sleep(0.06)
+        await cache.get_or_compute("k", produce)
+        cache.invalidate()
+        await cache.get_or_compute("k", produce)
+        return produce.calls
+
+    assert asyncio.run(go()) == 3
+
+
+def test_etag_and_conditional_get():
+    cache, produce = ResponseCache(), Producer({"status": "up"}, delay=0)
+    app = FastAPI()
+
+    @app.get("/status")
+    async def status(request: Request):
+        return await cache.respond(request, produce)
+
+    async def go():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://api") as client:
+            first = await client.get("/status?b=2&a=1")
+            etag = first.headers["etag"]
+            return (first, etag,
+                    await client.get("/status?a=1&b=2", headers={"If-None-Match": etag}),
+                    await client.get("/status?a=1&b=2", headers={"If-None-Match": f'"other", W/{etag}'}),
+                    await client.get("/status?a=1&b=2", headers={"If-None-Match": '"other"'}))
+
+    first, etag, same, weak, other = asyncio.run(go())
+    assert first.status_code == 200 and first.json() == {"status": "up"}
+    assert "max-age" in first.headers["cache-control"]
+    assert same.status_code == 304 and same.content == b"" and same.headers["etag"] == etag
+    assert weak.status_code == 304
+    assert other.status_code == 200
+    assert produce.calls == 1  # query parameter order doesn't split the cache
+
+
+def test_shared_tier_serves_other_replicas_until_a_bump():
+    async def go():
+        r = fakeredis.aioredis.FakeRedis()
+        a, b = ResponseCache(r=r), ResponseCache(r=r)
+        produce = Producer(delay=0)
+        await a.get_or_compute("k", produce)
+        from_b = await b.get_or_compute("k", produce)  # filled by replica a
+        await a.bump()
+        await b.sync_generation()  # what the event hub does on the invalidation message
+        after_bump = await b.get_or_compute("k", produce)
+        return produce.calls, from_b, after_bump
+
+    calls, from_b, after_bump = asyncio.run(go())
+    assert from_b[0] == b'{"n":1}'
+    assert after_bump[0] == b'{"n":2}' and calls == 2
@@ -0,0 +1,63 @@
+# services/api/tests/test_events.py
+import asyncio, json
+
+import fakeredis
+
+from app.events import EventHub, EVENTS_CHANNEL
+
+
+async def next_frame(gen):
+    return await asyncio.wait_for(gen.__anext__(), 2)
+
+
+def test_stream_subscribes_when_started_and_unsubscribes_on_close():
+    async def go():
+        hub = EventHub()
+        gen = hub.stream({1})
+        assert not hub.subscribers  # a client that disconnects before the response starts leaves nothing behind
+        assert (await next_frame(gen)).startswith(b"retry:")
+        assert len(hub.subscribers) == 1
+        assert (await next_frame(gen)).startswith(b"event: hello")
+        hub.publish_local({"type": "incident_opened", "monitor_id": 2})
+        hub.publish_local({"type": "incident_opened", "monitor_id": 1})
+        assert b'"monitor_id":1' in await next_frame(gen)
+        await gen.aclose()
+        assert not hub.subscribers
+
+    asyncio.run(go())
+
+
+def test_stream_filters_check_batches_to_the_requested_monitors():
+    async def go():
+        hub = EventHub()
+        gen = hub.stream({1})
+        await next_frame(gen), await next_frame(gen)
+        hub.publish_local({"type": "checks", "checks": [{"monitor_id": 2}]})
+        hub.publish_local({"type": "checks", "checks": [{"monitor_id": 1}, {"monitor_id": 2}]})
+        frame = await next_frame(gen)
+        assert json.loads(frame.split(b"data: ")[1]) == {"type": "checks", "checks": [{"monitor_id": 1}]}
+        await gen.aclose()
+
+    asyncio.run(go())
+
+
+def test_run_drops_bad_messages_and_keeps_fanning_out(capsys):
+    async def go():
+        hub = EventHub()
+        hub.r = fakeredis.aioredis.FakeRedis()
+        gen = hub.stream()
+        await next_frame(gen), await next_frame(gen)
+        task = asyncio.create_task(hub.run())
+        while (await hub.r.pubsub_numsub(EVENTS_CHANNEL))[0][1] == 0:
+            await asyncio.sleep(0.01)
+        await hub.r.publish(EVENTS_CHANNEL, b"not json")
+        await hub.r.publish(EVENTS_CHANNEL, json.dumps({"monitor_id": 1}))  # no type
+        await hub.r.publish(EVENTS_CHANNEL, json.dumps([1]))
+        await hub.r.publish(EVENTS_CHANNEL, json.dumps({"type": "incident_resolved", "monitor_id": 1}))
+        frame = await next_frame(gen)
+        task.cancel()
+        await gen.aclose()
+        return frame
+
+    assert asyncio.run(go()).startswith(b"event: incident_resolved")
+    assert capsys.readouterr().out.count("Dropping event") == 3
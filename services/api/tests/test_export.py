@@ -0,0 +1,77 @@
+# services/api/tests/test_export.py
+# Runs against a real Postgres (see the api fixture); skipped otherwise.
+import csv, io, json, asyncio
+from datetime import datetime, timedelta, timezone
+
+T0 = datetime(2024, 5, 1, 12, tzinfo=timezone.utc)
+
+
+def seed(sql, n=5):
+    for i in (1, 2):
+        sql("INSERT INTO monitors (id, name, url) VALUES (:i, :n, 'http://x.test/')", i=i, n=f"m{i}")
+    # monitor 1: one check a minute from T0, inserted newest first; every third one failed
+    for k in reversed(range(n)):
+        sql("INSERT INTO checks (monitor_id, ts, ok, status_code, latency_ms, ttfb_ms, error_reason) "
+            "VALUES (1, :ts, :ok, :s, :l, :l, :e)",
+            ts=T0 + timedelta(minutes=k), ok=k % 3 != 0, s=200 if k % 3 else 503, l=10 + k,
+            e=None if k % 3 else "HTTP 503")
+    sql("INSERT INTO checks (monitor_id, ts, ok) VALUES (2, :ts, true)", ts=T0)
+
+
+def export_url(monitor_id=1, fmt="csv", since=T0, until=T0 + timedelta(hours=1)):
+    return f"/monitors/{monitor_id}/checks/export?format={fmt}&since={since:%Y-%m-%dT%H:%M:%S}&until={until:%Y-%m-%dT%H:%M:%S}"
+
+
+def test_csv_export_has_a_header_and_the_range_oldest_first(api, sql):
+    seed(sql)
+    res = api(lambda client: client.get(export_url(since=T0 + timedelta(minutes=1), until=T0 + timedelta(minutes=4))))
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/csv")
+    assert 'filename="monitor-1-checks-20240501T120100-20240501T120400.csv"' in res.headers["content-disposition"]
+    header, *rows = list(csv.reader(io.StringIO(res.text)))
+    assert header == ["ts", "ok", "status_code", "latency_ms", "dns_ms", "connect_ms", "tls_ms", "ttfb_ms",
+                      "transfer_ms", "error_reason"]
+    # [since, until): minutes 1, 2 and 3
+    assert [datetime.fromisoformat(r[0]) for r in rows] == [T0 + timedelta(minutes=k) for k in (1, 2, 3)]
+    assert rows[2] == [rows[2][0], "False", "503", "13", "", "", "", "13", "", "HTTP 503"]
+
+
+def test_ndjson_export_has_one_object_per_check(api, sql):
+    seed(sql)
+    res = api(lambda client: client.get(export_url(fmt="ndjson")))
+    assert res.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in res.text.splitlines()]
+    assert [r["latency_ms"] for r in rows] == [10, 11, 12, 13, 14]
+    assert rows[0] == {"ts": T0.isoformat(), "ok": False, "status_code": 503, "latency_ms": 10, "dns_ms": None,
+                       "connect_ms": None, "tls_ms": None, "ttfb_ms": 10, "transfer_ms": None,
+                       "error_reason": "HTTP 503"}
+
+
+def test_bad_ranges_and_unknown_monitors_are_rejected(api, sql):
+    seed(sql)
+
+    async def body(client):
+        return [(await client.get(url)).status_code for url in (
+            export_url(until=T0), export_url(until=T0 - timedelta(minutes=1)), export_url(monitor_id=99),
+            export_url(fmt="xml"),
+        )]
+
+    assert api(body) == [400, 400, 404, 422]
+
+
+def test_export_streams_in_batches(api, sql, monkeypatch):
+    from app import crud
+    from app.db import engine
+    seed(sql)
+    monkeypatch.setattr(crud, "EXPORT_BATCH_ROWS", 2)
+
+    async def collect(fmt):
+        try:
+            return [chunk async for chunk in crud.export_checks(1, T0, T0 + timedelta(hours=1), fmt)]
+        finally:
+            await engine.dispose()
+
+    chunks = asyncio.run(collect("csv"))
+    assert len(chunks) == 4  # the header, then 2 + 2 + 1 rows
+    assert [c.count("\r\n") for c in chunks] == [1, 2, 2, 1]
+    assert [c.count("\n") for c in asyncio.run(collect("ndjson"))] == [2, 2, 1]
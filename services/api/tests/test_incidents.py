@@ -0,0 +1,47 @@
+# services/api/tests/test_incidents.py
+# Runs against a real Postgres (see the api fixture); skipped otherwise.
+
+
+def seed(sql):
+    for i in (1, 2):
+        sql("INSERT INTO monitors (id, name, url) VALUES (:i, :n, 'http://x.test/')", i=i, n=f"m{i}")
+    # ids 1..6, alternating monitors; the newest of each monitor is still open
+    for n in range(6):
+        sql("INSERT INTO incidents (monitor_id, reason, state, opened_at, closed_at) VALUES "
+            "(:m, :r, :s, now() - make_interval(hours => :h), "
+            "CASE WHEN :closed THEN now() - make_interval(hours => :h) + interval '10 minutes' END)",
+            m=n % 2 + 1, r=f"r{n}", s="open" if n >= 4 else "resolved", closed=n < 4, h=10 - n)
+
+
+def test_active_incidents_lists_only_open_ones_newest_first(api, sql):
+    seed(sql)
+    body = api(lambda client: client.get("/public/incidents/active")).json()
+    assert [(i["id"], i["monitor_id"], i["state"]) for i in body] == [(6, 2, "open"), (5, 1, "open")]
+
+
+def test_history_pages_with_a_cursor_and_filters(api, sql):
+    seed(sql)
+
+    async def body(client):
+        pages, before = [], None
+        while True:
+            url = "/public/incidents?limit=2" + (f"&before={before}" if before else "")
+            page = (await client.get(url)).json()
+            pages.append([i["id"] for i in page["incidents"]])
+            before = page["next"]
+            if before is None:
+                return pages, (
+                    await client.get("/public/incidents?ids=1&state=resolved")).json()
+
+    pages, filtered = api(body)
+    assert pages == [[6, 5], [4, 3], [2, 1]]
+    assert [i["id"] for i in filtered["incidents"]] == [3, 1] and filtered["next"] is None
+
+
+def test_incident_stats_report_mttr_from_the_worker_counters(api, sql):
+    seed(sql)
+    sql("INSERT INTO incident_stats (monitor_id, opened, resolved, downtime_ms) VALUES (1, 3, 2, 1200000)")
+    body = api(lambda client: client.get("/public/incidents/stats?ids=1,2")).json()
+    (st,) = body["stats"]
+    assert (st["monitor_id"], st["incidents"], st["resolved"], st["mttr_sec"], st["downtime_sec"]) == \
+        (1, 3, 2, 600.0, 1200.0)
@@ -0,0 +1,44 @@
+# services/api/tests/test_monitors.py
+# Runs against a real Postgres (see the api fixture); skipped otherwise.
+import asyncio
+
+M = {"name": "site", "url": "http://site.test/", "interval_sec": 30, "expected_statuses": [200, 204]}
+
+
+def test_create_list_and_reject_duplicates(api):
+    async def body(client):
+        created = await client.post("/monitors", json=M)
+        dup = await client.post("/monitors", json=M)
+        bad = await client.post("/monitors", json={**M, "interval_sec": 1})
+        listed = await client.get("/monitors")
+        return created, dup, bad, listed
+
+    created, dup, bad, listed = api(body)
+    assert created.status_code == 200
+    out = created.json()
+    assert out["id"] and {k: out[k] for k in M} == M
+    assert out["latency_mode"] == "warm"
+    assert dup.status_code == 409
+    assert bad.status_code == 422
+    assert listed.json() == [out]
+
+
+def test_creating_a_monitor_invalidates_the_public_list(api):
+    async def body(client):
+        before = (await client.get("/public/monitors")).json()
+        await client.post("/monitors", json=M)
+        after = (await client.get("/public/monitors")).json()
+        return before, after
+
+    before, after = api(body)
+    assert before == [] and [m["name"] for m in after] == ["site"]
+
+
+def test_concurrent_requests_share_the_pool(api):
+    api(lambda client: client.post("/monitors", json=M))
+
+    async def body(client):
+        return await asyncio.gather(*(client.get("/monitors") for _ in range(50)))
+
+    responses = api(body)
+    assert all(r.status_code == 200 and len(r.json()) == 1 for r in responses)
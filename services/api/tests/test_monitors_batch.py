@@ -0,0 +1,44 @@
+# services/api/tests/test_monitors_batch.py
+# Runs against a real Postgres (see the api fixture); skipped otherwise.
+
+A = {"name": "a", "url": "http://a.test/"}
+B = {"name": "b", "url": "http://b.test/", "interval_sec": 30}
+
+
+def test_batch_counts_created_updated_unchanged_and_invalid(api, sql):
+    async def body(client):
+        first = await client.post("/monitors:batch", json=[A, B])
+        second = await client.post("/monitors:batch", json=[
+            {**A, "interval_sec": 120},   # updated
+            B,                            # unchanged
+            {"name": "c"},                # invalid: no url
+            {**B, "method": "HEAD"},      # invalid: repeats item 1's key
+            {"name": "d", "url": "http://d.test/"},
+        ])
+        return first.json(), second.json()
+
+    first, second = api(body)
+    assert {k: first[k] for k in ("created", "updated", "unchanged", "invalid")} == \
+        {"created": 2, "updated": 0, "unchanged": 0, "invalid": 0}
+    assert {k: second[k] for k in ("created", "updated", "unchanged", "invalid")} == \
+        {"created": 1, "updated": 1, "unchanged": 1, "invalid": 2}
+    assert [r["status"] for r in second["results"]] == ["updated", "unchanged", "invalid", "invalid", "created"]
+    assert [r["index"] for r in second["results"]] == [0, 1, 2, 3, 4]
+    ids = {r["id"] for r in first["results"]}
+    assert {second["results"][0]["id"], second["results"][1]["id"]} == ids  # matched on (name, url), not re-inserted
+    assert sql("SELECT name, interval_sec FROM monitors ORDER BY name") == [("a", 120), ("b", 30), ("d", 60)]
+
+
+def test_unchanged_rows_are_not_rewritten(api, sql):
+    api(lambda client: client.post("/monitors:batch", json=[A]))
+    (xmin,) = sql("SELECT xmin::text FROM monitors")[0]
+    body = api(lambda client: client.post("/monitors:batch", json=[A])).json()
+    assert body["unchanged"] == 1
+    assert sql("SELECT xmin::text FROM monitors")[0][0] == xmin  # no new row version for the workers to reload
+
+
+def test_oversized_batches_are_refused(api, monkeypatch):
+    from app import main
+    monkeypatch.setattr(main, "MONITORS_BATCH_MAX", 2)
+    res = api(lambda client: client.post("/monitors:batch", json=[A, B, {"name": "x", "url": "http://x.test/"}]))
+    assert res.status_code == 413
@@ -0,0 +1,37 @@
+# services/api/tests/test_percentiles.py
+import math, random
+from collections import Counter
+
+from app import crud, models
+
+
+def sketch(latencies) -> Counter:
+    # the worker's rollups.sketch_index
+    log_gamma = math.log(models.SKETCH_GAMMA)
+    return Counter(math.ceil(math.log(v) / log_gamma) if v > 1 else 0 for v in latencies)
+
+
+def exact(latencies, p):
+    ordered = sorted(latencies)
+    return ordered[max(1, math.ceil(len(ordered) * p / 100)) - 1]
+
+
+def test_merged_sketches_give_percentiles_within_alpha():
+    rng = random.Random(7)
+    latencies = [max(1, int(rng.lognormvariate(5, 1))) for _ in range(20000)]
+    merged = Counter()
+    for i in range(0, len(latencies), 500):  # one sketch per rollup bucket, merged like the summary query
+        merged += sketch(latencies[i:i + 500])
+
+    out = crud._percentiles(merged.items(), min(latencies), max(latencies))
+    assert out["samples"] == len(latencies)
+    for p in crud.PERCENTILES:
+        truth = exact(latencies, p)
+        assert abs(out[f"p{p}_ms"] - truth) <= models.SKETCH_ALPHA * truth + 0.05  # + rounding to 0.1 ms
+
+
+def test_percentiles_are_clamped_to_the_observed_range_and_empty_without_samples():
+    out = crud._percentiles(sketch([100] * 10).items(), 100, 100)
+    assert [out[f"p{p}_ms"] for p in crud.PERCENTILES] == [100, 100, 100]
+    empty = crud._percentiles([], None, None)
+    assert empty["samples"] == 0 and all(empty[f"p{p}_ms"] is None for p in crud.PERCENTILES)
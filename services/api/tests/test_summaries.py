@@ -0,0 +1,54 @@
+# services/api/tests/test_summaries.py
+# Runs against a real Postgres (see the api fixture); skipped otherwise.
+from sqlalchemy import event
+
+
+def add_rollup(sql, monitor_id, minutes_ago, total, ok, latency_sum, lat_min, lat_max, table="check_rollups_1m"):
+    sql(f"INSERT INTO {table} (monitor_id, bucket, total, ok, latency_n, latency_sum, latency_min, latency_max, "
+        "latency_hist) VALUES (:m, date_trunc('minute', now()) - make_interval(mins => :ago), :t, :ok, :t, :s, "
+        ":lo, :hi, '{}')", m=monitor_id, ago=minutes_ago, t=total, ok=ok, s=latency_sum, lo=lat_min, hi=lat_max)
+
+
+def test_summaries_for_every_monitor_in_one_query(api, sql):
+    from app.db import engine
+    for i in (1, 2, 3):
+        sql("INSERT INTO monitors (id, name, url) VALUES (:i, :n, 'http://x.test/')", i=i, n=f"m{i}")
+    add_rollup(sql, 1, 5, total=10, ok=9, latency_sum=1000, lat_min=50, lat_max=300)
+    add_rollup(sql, 1, 30, total=10, ok=10, latency_sum=3000, lat_min=20, lat_max=900)
+    add_rollup(sql, 1, 60 * 30, total=10, ok=0, latency_sum=0, lat_min=1, lat_max=1)  # outside 24h
+    add_rollup(sql, 2, 1, total=4, ok=2, latency_sum=400, lat_min=100, lat_max=100)
+
+    statements = []
+    listener = lambda conn, cursor, stmt, *a: statements.append(stmt)
+    event.listen(engine.sync_engine, "before_cursor_execute", listener)
+    try:
+        body = api(lambda client: client.get("/public/summary?window=24h")).json()
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", listener)
+
+    assert len([s for s in statements if s.lstrip().upper().startswith("SELECT")]) == 1
+    by_id = {s["monitor_id"]: s for s in body["summaries"]}
+    assert [s["monitor_id"] for s in body["summaries"]] == [3, 2, 1]
+    assert by_id[1] == {"monitor_id": 1, "uptime_percent": 95.0, "avg_latency_ms": 200,
+                        "min_latency_ms": 20, "max_latency_ms": 900, "checks": 20}
+    assert by_id[2]["uptime_percent"] == 50.0
+    assert by_id[3] == {"monitor_id": 3, "uptime_percent": 0.0, "avg_latency_ms": 0,
+                        "min_latency_ms": None, "max_latency_ms": None, "checks": 0}
+
+
+def test_summaries_can_be_limited_to_ids_and_match_the_single_monitor_summary(api, sql):
+    for i in (1, 2):
+        sql("INSERT INTO monitors (id, name, url) VALUES (:i, :n, 'http://x.test/')", i=i, n=f"m{i}")
+    add_rollup(sql, 2, 5, total=8, ok=6, latency_sum=800, lat_min=10, lat_max=500)
+
+    async def body(client):
+        bulk = (await client.get("/public/summary?ids=2&window=1h")).json()
+        one = (await client.get("/public/monitors/2/summary?window=1h")).json()
+        bad = await client.get("/public/summary?ids=x")
+        return bulk, one, bad.status_code
+
+    bulk, one, bad = api(body)
+    assert [s["monitor_id"] for s in bulk["summaries"]] == [2]
+    (s,) = bulk["summaries"]
+    assert {k: one[k] for k in s if k != "monitor_id"} == {k: v for k, v in s.items() if k != "monitor_id"}
+    assert bad == 400
@@ -0,0 +1,135 @@
+# services/monitor/incidents.py
+from sqlalchemy import select, update, or_, func, text, literal_column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from models import Incident, IncidentStats
+from sharding import NUM_SHARDS
+from state import KEY_INCIDENT_OPEN, PENDING
+
+RECONCILE_CHUNK = 1000
+
+# Rendered inline rather than bound, so the planner can match the partial
+# index (WHERE state = 'open') even for prepared statements.
+IS_OPEN = Incident.state == literal_column("'open'")
+
+# Statements bringing an existing incidents table up to date (create_all only creates missing tables).
+UPGRADE_INCIDENTS = (
+    # Older releases could leave several incidents open for one monitor; keep the newest
+    # so the unique index below can be built.
+    "UPDATE incidents i SET state = 'resolved', closed_at = now() WHERE i.state = 'open' AND EXISTS "
+    "(SELECT 1 FROM incidents j WHERE j.monitor_id = i.monitor_id AND j.state = 'open' AND j.id > i.id)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_incidents_open_monitor ON incidents (monitor_id) WHERE state = 'open'",
+    "CREATE INDEX IF NOT EXISTS ix_incidents_monitor_id_id ON incidents (monitor_id, id)",
+    # one-time backfill; afterwards the worker keeps incident_stats current
+    "INSERT INTO incident_stats (monitor_id, opened, resolved, downtime_ms, last_opened_at, last_resolved_at) "
+    "SELECT monitor_id, count(*), count(closed_at), "
+    "coalesce(sum(extract(epoch FROM closed_at - opened_at) * 1000), 0)::bigint, max(opened_at), max(closed_at) "
+    "FROM incidents WHERE monitor_id IS NOT NULL AND NOT EXISTS (SELECT 1 FROM incident_stats) "
+    "GROUP BY monitor_id ON CONFLICT DO NOTHING",
+)
+
+
+def open_many(s, rows: list) -> tuple[list, list]:
+    """Insert incidents for `rows` ({monitor_id, reason}); returns (created, adopted).
+
+    The partial unique index allows one open incident per monitor. A
+    monitor that already has one (Redis lost its incident_open key, e.g.
+    after a flush) adopts the existing incident instead of opening a
+    duplicate; no alert goes out for those.
+    """
+    if not rows:
+        return [], []
+    created = s.execute(
+        pg_insert(Incident).values(rows)
+        .on_conflict_do_nothing(index_elements=["monitor_id"], index_where=text("state = 'open'"))
+        .returning(Incident.id, Incident.monitor_id, Incident.reason, Incident.opened_at)
+    ).all()
+    missing = {row["monitor_id"] for row in rows} - {row.monitor_id for row in created}
+    adopted = []
+    if missing:
+        adopted = s.execute(
+            select(Incident.id, Incident.monitor_id)
+            .where(IS_OPEN, Incident.monitor_id.in_(missing))
+        ).all()
+    return created, adopted
+
+
+def resolve_many(s, ids: list, monitor_ids: list, closed_at) -> list:
+    """Resolve open incidents by id, or by monitor when only the monitor is known."""
+    if not ids and not monitor_ids:
+        return []
+    return s.execute(
+        update(Incident)
+        .where(IS_OPEN, or_(Incident.id.in_(ids), Incident.monitor_id.in_(monitor_ids)))
+        .values(state="resolved", closed_at=closed_at)
+        .returning(Incident.id, Incident.monitor_id, Incident.opened_at, Incident.closed_at)
+    ).all()
+
+
+def bump_stats(s, created: list, resolved: list):
+    """Fold this batch's opens/resolves into incident_stats: one upsert, one row per monitor."""
+    delta = {}
+    blank = lambda mid: {"monitor_id": mid, "opened": 0, "resolved": 0, "downtime_ms": 0,
+                         "last_opened_at": None, "last_resolved_at": None}
+    for row in created:
+        d = delta.setdefault(row.monitor_id, blank(row.monitor_id))
+        d["opened"] += 1
+        d["last_opened_at"] = row.opened_at
+    for row in resolved:
+        d = delta.setdefault(row.monitor_id, blank(row.monitor_id))
+        d["resolved"] += 1
+        d["last_resolved_at"] = row.closed_at
+        if row.opened_at is not None:
+            d["downtime_ms"] += int((row.closed_at - row.opened_at).total_seconds() * 1000)
+    if not delta:
+        return
+    stmt = pg_insert(IncidentStats).values([delta[mid] for mid in sorted(delta)])
+    s.execute(stmt.on_conflict_do_update(index_elements=["monitor_id"], set_={
+        "opened": IncidentStats.opened + stmt.excluded.opened,
+        "resolved": IncidentStats.resolved + stmt.excluded.resolved,
+        "downtime_ms": IncidentStats.downtime_ms + stmt.excluded.downtime_ms,
+        "last_opened_at": func.coalesce(stmt.excluded.last_opened_at, IncidentStats.last_opened_at),
+        "last_resolved_at": func.coalesce(stmt.excluded.last_resolved_at, IncidentStats.last_resolved_at),
+    }))
+
+
+def reconcile(r, session_factory, shards: set, monitor_ids) -> tuple[int, int]:
+    """Make incident_open:{id} agree with Postgres for the monitors this worker owns.
+
+    Postgres is authoritative: keys missing or pointing at the wrong
+    incident are set, keys for monitors with nothing open are dropped.
+    Keys still holding PENDING belong to an open in flight and are left
+    alone. Run when shards change hands (and so at startup). Returns
+    (keys set, keys cleared).
+    """
+    if not shards:
+        return 0, 0
+    s = session_factory()
+    try:
+        # reads only the partial index of open incidents
+        open_ids = dict(s.execute(
+            select(Incident.monitor_id, Incident.id)
+            .where(IS_OPEN, (Incident.monitor_id % NUM_SHARDS).in_(shards))
+        ).all())
+    finally:
+        s.close()
+
+    ids = sorted(set(monitor_ids) | set(open_ids))
+    fixed = cleared = 0
+    pipe = r.pipeline(transaction=False)
+    for i in range(0, len(ids), RECONCILE_CHUNK):
+        chunk = ids[i:i + RECONCILE_CHUNK]
+        keys = [KEY_INCIDENT_OPEN + str(mid) for mid in chunk]
+        for mid, key, val in zip(chunk, keys, r.mget(keys)):
+            val = val.decode() if isinstance(val, bytes) else val
+            want = open_ids.get(mid)
+            if val == PENDING:
+                continue
+            if want is not None and val != str(want):
+                pipe.set(key, str(want))
+                fixed += 1
+            elif want is None and val is not None:
+                pipe.delete(key)
+                cleared += 1
+    pipe.execute()
+    return fixed, cleared
@@ -0,0 +1,58 @@
+# services/monitor/metrics.py
+import os, time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+from timing import PHASES
+
+METRICS_PORT = int(os.getenv("METRICS_PORT", 9100))
+
+# Seconds; roughly LATENCY_BUCKETS_MS plus the sub-50 ms range warm probes live in.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 2, 5, 10)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+CHECKS = Counter("monitor_checks_total", "Probes completed", ["result"])
+PROBE_LATENCY = Histogram("monitor_probe_latency_seconds", "End-to-end probe latency", buckets=LATENCY_BUCKETS)
+PROBE_PHASE = Histogram("monitor_probe_phase_seconds", "Probe latency by phase", ["phase"], buckets=LATENCY_BUCKETS)
+BATCH_SECONDS = Histogram("monitor_batch_duration_seconds", "Probe + record time of one due batch", buckets=LATENCY_BUCKETS)
+BATCH_SIZE = Histogram("monitor_batch_size", "Monitors per due batch", buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000))
+SCHEDULE_LAG = Histogram("monitor_schedule_lag_seconds", "How late a check started versus its deadline", buckets=FAST_BUCKETS)
+SCHEDULED = Gauge("monitor_scheduled_monitors", "Monitors scheduled on this worker")
+IN_FLIGHT = Gauge("monitor_in_flight_probes", "Probes currently running")
+OWNED_SHARDS = Gauge("monitor_owned_shards", "Shards leased by this worker")
+BUFFERED = Gauge("monitor_check_buffer_rows", "Check rows waiting to be flushed")
+DROPPED = Counter("monitor_checks_dropped_total", "Check rows dropped on buffer overflow")
+DB_SECONDS = Histogram("monitor_db_seconds", "Database call time", ["op"], buckets=FAST_BUCKETS)
+REDIS_SECONDS = Histogram("monitor_redis_seconds", "Redis call time", ["op"], buckets=FAST_BUCKETS)
+ADAPTIVE = Counter("monitor_adaptive_reschedules_total", "Checks rescheduled off their configured interval", ["mode"])
+CHILD_CHECKS = Counter("monitor_probe_child_checks_total", "Probes completed per probe child process", ["child"])
+CHILD_CPU = Gauge("monitor_probe_child_cpu_seconds", "CPU time used by each probe child since it started", ["child"])
+INCIDENTS = Counter("monitor_incident_transitions_total", "Incidents opened/resolved", ["action"])
+
+
+@contextmanager
+def timed(hist, *labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        (hist.labels(*labels) if labels else hist).observe(time.perf_counter() - start)
+
+
+def observe_results(results):
+    for res in results:
+        CHECKS.labels("ok" if res.ok else "fail").inc()
+        if res.latency_ms is not None:
+            PROBE_LATENCY.observe(res.latency_ms / 1000)
+        for phase in PHASES:
+            v = getattr(res, f"{phase}_ms", None)
+            if v is not None:
+                PROBE_PHASE.labels(phase).observe(v / 1000)
+
+
+def serve(port: int = METRICS_PORT):
+    """Expose /metrics on a side port (a daemon thread; the worker has no HTTP server of its own)."""
+    if port:
+        start_http_server(port)
+        print(f"[monitor] Metrics on :{port}/metrics")
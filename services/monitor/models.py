@@ -1,13 +1,17 @@
 # ✅ correct imports
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, BigInteger
-from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, BigInteger, PrimaryKeyConstraint, Index, text
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, declared_attr
 from db import Base
 
 
 class Monitor(Base):
     __tablename__ = "monitors"
+    __table_args__ = (
+        # natural key for bulk upserts (POST /monitors:batch)
+        Index("uq_monitors_name_url", "name", "url", unique=True),
+    )
     id = Column(Integer, primary_key=True)
     name = Column(String, nullable=False)
     url = Column(String, nullable=False)
@@ -17,24 +21,93 @@ class Monitor(Base):
     expected_statuses = Column(ARRAY(Integer), default=[200])
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     is_enabled = Column(Boolean, default=True)
+    latency_mode = Column(String, default="warm")  # "warm" (pooled connections) or "cold" (fresh per check)
     checks = relationship("Check", back_populates="monitor", cascade="all,delete")
 
 class Check(Base):
     __tablename__ = "checks"
-    id = Column(BigInteger, primary_key=True)
-    monitor_id = Column(Integer, ForeignKey("monitors.id"), index=True)
-    ts = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    # Range-partitioned by day on ts; the monitor worker creates and drops the
+    # daily partitions. The partition key has to be part of the primary key.
+    __table_args__ = (
+        Index("ix_checks_monitor_id_ts", "monitor_id", "ts"),
+        {"postgresql_partition_by": "RANGE (ts)"},
+    )
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    monitor_id = Column(Integer, ForeignKey("monitors.id"))
+    ts = Column(DateTime(timezone=True), server_default=func.now(), primary_key=True)
     status_code = Column(Integer)
     latency_ms = Column(Integer)
-    ok = Column(Boolean, index=True)
+    ok = Column(Boolean)
     error_reason = Column(String)
+    # per-phase breakdown of latency_ms; dns/connect/tls are NULL when a kept-alive connection was reused
+    dns_ms = Column(Integer)
+    connect_ms = Column(Integer)
+    tls_ms = Column(Integer)
+    ttfb_ms = Column(Integer)
+    transfer_ms = Column(Integer)
     monitor = relationship("Monitor", back_populates="checks")
 
+# Upper bounds (ms) of the rollup latency histogram; one extra bucket counts anything slower.
+LATENCY_BUCKETS_MS = (50, 100, 200, 300, 500, 750, 1000, 2000, 5000, 10000)
+# Rollup latency sketches: log-spaced buckets (HDR/DDSketch style) that keep any
+# quantile within SKETCH_ALPHA of the true value. Bucket i holds latencies in
+# (GAMMA^(i-1), GAMMA^i] ms, stored sparse as {"i": count}; bucket 0 takes 0-1 ms.
+SKETCH_ALPHA = 0.01
+SKETCH_GAMMA = (1 + SKETCH_ALPHA) / (1 - SKETCH_ALPHA)
+# Check phases in the order of the rollups' phase_sum / phase_n arrays.
+PHASES = ("dns", "connect", "tls", "ttfb", "transfer")
+
+class RollupMixin:
+    """Per-monitor check aggregates for one time bucket, maintained by the monitor worker."""
+    @declared_attr
+    def monitor_id(cls):
+        return Column(Integer, ForeignKey("monitors.id"), nullable=False)
+    bucket = Column(DateTime(timezone=True), nullable=False)
+    total = Column(Integer, nullable=False, default=0)
+    ok = Column(Integer, nullable=False, default=0)
+    latency_n = Column(Integer, nullable=False, default=0)
+    latency_sum = Column(BigInteger, nullable=False, default=0)
+    latency_min = Column(Integer)
+    latency_max = Column(Integer)
+    latency_hist = Column(ARRAY(Integer), nullable=False)
+    latency_sketch = Column(JSONB, nullable=False, server_default=text("'{}'::jsonb"))
+    # per-phase totals and sample counts, indexed like PHASES
+    phase_sum = Column(ARRAY(BigInteger), nullable=False, server_default="{0,0,0,0,0}")
+    phase_n = Column(ARRAY(Integer), nullable=False, server_default="{0,0,0,0,0}")
+
+    @declared_attr
+    def __table_args__(cls):
+        return (PrimaryKeyConstraint("monitor_id", "bucket"),)
+
+class CheckRollupMinute(RollupMixin, Base):
+    __tablename__ = "check_rollups_1m"
+
+class CheckRollupHour(RollupMixin, Base):
+    __tablename__ = "check_rollups_1h"
+
 class Incident(Base):
     __tablename__ = "incidents"
+    __table_args__ = (
+        # The open set: at most one open incident per monitor, and the active
+        # list reads this small index instead of scanning the whole history.
+        Index("uq_incidents_open_monitor", "monitor_id", unique=True, postgresql_where=text("state = 'open'")),
+        # keyset pagination of one monitor's history (newest first)
+        Index("ix_incidents_monitor_id_id", "monitor_id", "id"),
+    )
     id = Column(Integer, primary_key=True)
     monitor_id = Column(Integer, ForeignKey("monitors.id"), index=True)
     opened_at = Column(DateTime(timezone=True), server_default=func.now())
     closed_at = Column(DateTime(timezone=True))
     reason = Column(String)
     state = Column(String, default="open")
+
+class IncidentStats(Base):
+    """Per-monitor incident counters, updated by the worker as incidents open and resolve."""
+    __tablename__ = "incident_stats"
+    monitor_id = Column(Integer, ForeignKey("monitors.id"), primary_key=True)
+    opened = Column(Integer, nullable=False, default=0)
+    resolved = Column(Integer, nullable=False, default=0)
+    # total time from open to resolve over all resolved incidents; MTTR = downtime_ms / resolved
+    downtime_ms = Column(BigInteger, nullable=False, default=0)
+    last_opened_at = Column(DateTime(timezone=True))
+    last_resolved_at = Column(DateTime(timezone=True))
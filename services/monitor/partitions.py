@@ -0,0 +1,159 @@
+# services/monitor/partitions.py
+import os, re
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from models import CheckRollupMinute, CheckRollupHour
+
+CHECK_PARTITION_DAYS_AHEAD = int(os.getenv("CHECK_PARTITION_DAYS_AHEAD", 3))
+CHECK_RETENTION_DAYS = int(os.getenv("CHECK_RETENTION_DAYS", 30))
+ROLLUP_1M_RETENTION_DAYS = int(os.getenv("ROLLUP_1M_RETENTION_DAYS", 3))
+ROLLUP_1H_RETENTION_DAYS = int(os.getenv("ROLLUP_1H_RETENTION_DAYS", 400))
+
+PARENT = "checks"
+DEFAULT = f"{PARENT}_default"
+_DAILY = re.compile(r"^checks_p(\d{8})$")
+
+
+def partition_name(day: date) -> str:
+    return f"{PARENT}_p{day:%Y%m%d}"
+
+
+def is_partitioned(conn) -> bool:
+    kind = conn.execute(text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:t)"), {"t": PARENT}).scalar()
+    return kind == "p"
+
+
+def daily_partitions(conn) -> dict:
+    """{day: partition name} for the existing daily partitions of checks."""
+    rows = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:t)"
+    ), {"t": PARENT}).scalars()
+    out = {}
+    for name in rows:
+        m = _DAILY.match(name)
+        if m:
+            out[datetime.strptime(m.group(1), "%Y%m%d").date()] = name
+    return out
+
+
+def create_partition(conn, day: date):
+    """Create the daily partition for `day`.
+
+    Postgres won't add a range partition while the DEFAULT partition holds
+    rows in that range, so the partition is built standalone, any such rows
+    are moved into it, and only then is it attached.
+    """
+    name, lo, hi = partition_name(day), day, day + timedelta(days=1)
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {name} (LIKE {PARENT} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    moved = conn.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT} WHERE ts >= :lo AND ts < :hi RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    ), {"lo": lo, "hi": hi}).rowcount
+    if moved:
+        print(f"[monitor] Moved {moved} check(s) from {DEFAULT} into {name}.")
+    conn.execute(text(
+        f"ALTER TABLE {PARENT} ATTACH PARTITION {name} FOR VALUES FROM ('{lo.isoformat()}') TO ('{hi.isoformat()}')"
+    ))
+
+
+def ensure_partitions(conn, days_ahead: int = CHECK_PARTITION_DAYS_AHEAD) -> int:
+    """Create yesterday's, today's and the next `days_ahead` daily partitions (plus a DEFAULT catch-all).
+
+    Each partition is created in its own savepoint: one that fails is
+    reported and retried on the next run without taking the others (or the
+    caller's transaction) down with it. The composite (monitor_id, ts)
+    index is declared on the parent, so Postgres builds it on every
+    partition as it is attached.
+    """
+    # Rows outside every daily range (clock skew, a missed maintenance run)
+    # land here instead of failing the whole batch insert.
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT} PARTITION OF {PARENT} DEFAULT"))
+    existing = daily_partitions(conn)
+    today = datetime.now(timezone.utc).date()
+    created = 0
+    for d in range(-1, days_ahead + 1):
+        day = today + timedelta(days=d)
+        if day in existing:
+            continue
+        try:
+            with conn.begin_nested():
+                create_partition(conn, day)
+            created += 1
+        except DBAPIError as e:
+            print(f"[monitor] Could not create {partition_name(day)}: {e}")
+    return created
+
+
+def drop_expired_partitions(conn, retention_days: int = CHECK_RETENTION_DAYS) -> list:
+    """Drop raw daily partitions that ended more than `retention_days` ago.
+
+    Checks are folded into the rollups in the same transaction that inserts
+    them, so a partition's data normally lives on in check_rollups_1h by the
+    time it expires. That is verified per monitor: a partition with checks
+    from a monitor that has no hourly rollup that day (data written before
+    rollups existed) is kept and reported instead of lost. Expired rows in
+    the DEFAULT partition are deleted under the same rule, hour by hour.
+    """
+    cutoff = datetime.now(timezone.utc).date() - timedelta(days=retention_days)
+    rollups = CheckRollupHour.__tablename__
+    dropped = []
+    for day, name in sorted(daily_partitions(conn).items()):
+        if day + timedelta(days=1) > cutoff:
+            continue
+        folded = conn.execute(text(
+            f"SELECT NOT EXISTS (SELECT monitor_id FROM {name} WHERE monitor_id IS NOT NULL "
+            f"EXCEPT SELECT monitor_id FROM {rollups} WHERE bucket >= :lo AND bucket < :hi)"
+        ), {"lo": day, "hi": day + timedelta(days=1)}).scalar()
+        if not folded:
+            print(f"[monitor] Keeping {name}: it has checks that were never rolled up.")
+            continue
+        conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+        dropped.append(name)
+    if conn.execute(text("SELECT to_regclass(:t) IS NOT NULL"), {"t": DEFAULT}).scalar():
+        expired = conn.execute(text(
+            f"DELETE FROM {DEFAULT} d WHERE d.ts < :cutoff AND (d.monitor_id IS NULL OR EXISTS ("
+            f"SELECT 1 FROM {rollups} h WHERE h.monitor_id = d.monitor_id "
+            f"AND h.bucket = date_trunc('hour', d.ts AT TIME ZONE 'UTC') AT TIME ZONE 'UTC'))"
+        ), {"cutoff": cutoff}).rowcount
+        if expired:
+            dropped.append(f"{expired} row(s) from {DEFAULT}")
+    return dropped
+
+
+def downsample_rollups(conn) -> tuple[int, int]:
+    """Expire fine-grained rollups once the coarser table covers them.
+
+    Hourly rollups are maintained alongside the minute ones, so dropping
+    minute rows older than ROLLUP_1M_RETENTION_DAYS loses no data that
+    windows longer than a day need.
+    """
+    now = datetime.now(timezone.utc)
+    m = conn.execute(
+        CheckRollupMinute.__table__.delete().where(
+            CheckRollupMinute.bucket < now - timedelta(days=ROLLUP_1M_RETENTION_DAYS))
+    ).rowcount
+    h = conn.execute(
+        CheckRollupHour.__table__.delete().where(
+            CheckRollupHour.bucket < now - timedelta(days=ROLLUP_1H_RETENTION_DAYS))
+    ).rowcount
+    return m, h
+
+
+def run_maintenance(engine):
+    """Create upcoming partitions, drop expired ones and downsample rollups."""
+    with engine.begin() as conn:
+        if not is_partitioned(conn):
+            print("[monitor] checks is not partitioned; skipping partition maintenance "
+                  "(see scripts/partition-checks.sql).")
+            return
+        created = ensure_partitions(conn)
+    with engine.begin() as conn:
+        dropped = drop_expired_partitions(conn)
+    with engine.begin() as conn:
+        m, h = downsample_rollups(conn)
+    print(f"[monitor] Maintenance: +{created} partition(s), dropped {dropped or 'none'}, "
+          f"expired {m} minute / {h} hour rollup row(s).")
@@ -0,0 +1,146 @@
+# services/monitor/probe.py
+import os, time, asyncio
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional
+
+import httpx
+
+import timing
+
+try:  # HTTP/2 needs the optional h2 package (httpx[http2])
+    import h2  # noqa: F401
+except ImportError:
+    h2 = None
+
+TIMEOUT_MS = int(os.getenv("CHECK_TIMEOUT_MS", 5000))
+PROBE_CONCURRENCY = int(os.getenv("PROBE_CONCURRENCY", 200))
+PROBE_CONNS_PER_CLIENT = int(os.getenv("PROBE_CONNS_PER_CLIENT", 8))
+# Idle connections must outlive the check interval, or every "warm" probe
+# would pay for a new handshake anyway.
+PROBE_KEEPALIVE_SEC = float(os.getenv("PROBE_KEEPALIVE_SEC", 120))
+PROBE_HTTP2 = os.getenv("PROBE_HTTP2", "1") == "1" and h2 is not None
+
+
+@dataclass(frozen=True)
+class MonitorSpec:
+    """The fields of a Monitor row the probe loop needs, detached from any Session."""
+    id: int
+    url: str
+    method: str
+    interval_sec: int
+    expected_statuses: tuple
+    latency_mode: str = "warm"  # "warm": reuse pooled connections; "cold": fresh connection per check
+    timeout_ms: int = TIMEOUT_MS
+
+
+@dataclass
+class ProbeResult:
+    monitor_id: int
+    ts: datetime
+    status_code: Optional[int]
+    latency_ms: Optional[int]
+    ok: bool
+    error_reason: Optional[str]
+    # per-phase ms (see timing.py); dns/connect/tls stay None when a pooled connection was reused
+    dns_ms: Optional[int] = None
+    connect_ms: Optional[int] = None
+    tls_ms: Optional[int] = None
+    ttfb_ms: Optional[int] = None
+    transfer_ms: Optional[int] = None
+
+
+class ProbeClient:
+    """The probe engine's shared HTTP client.
+
+    httpcore's connection pool does O(connections) work on every request, so
+    a single AsyncClient with hundreds of connections spends most of its CPU
+    on pool bookkeeping. The concurrency budget is therefore spread over a
+    few small AsyncClients. Each keeps its connections pooled per origin
+    and long enough to outlive a check interval, and a monitor always uses
+    the same client, so "warm" checks reuse a keep-alive (or HTTP/2)
+    connection: latency excludes TCP/TLS setup and the worker skips most
+    handshakes. Monitors in "cold" mode use a client that never keeps a
+    connection, so each check measures a full connect + handshake.
+    """
+
+    def __init__(self, concurrency: int = PROBE_CONCURRENCY, per_client: int = PROBE_CONNS_PER_CLIENT,
+                 keepalive_sec: float = PROBE_KEEPALIVE_SEC, http2: bool = PROBE_HTTP2):
+        n = max(1, -(-concurrency // per_client))
+        limits = httpx.Limits(max_connections=per_client, max_keepalive_connections=per_client,
+                              keepalive_expiry=keepalive_sec)
+        self._clients = [httpx.AsyncClient(limits=limits, timeout=TIMEOUT_MS / 1000, http2=http2) for _ in range(n)]
+        self._cold = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=0),
+            timeout=TIMEOUT_MS / 1000, http2=http2,
+        )
+        for c in (self._cold, *self._clients):
+            timing.install(c)
+        self.sem = asyncio.Semaphore(concurrency)
+
+    async def probe_many(self, monitors) -> list:
+        # same interface as procpool.ProbePool
+        return await probe_many(self, monitors)
+
+    def for_monitor(self, m) -> httpx.AsyncClient:
+        if getattr(m, "latency_mode", "warm") == "cold":
+            return self._cold
+        return self._clients[m.id % len(self._clients)]
+
+    async def aclose(self):
+        await asyncio.gather(self._cold.aclose(), *(c.aclose() for c in self._clients))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+
+def make_client(concurrency: int = PROBE_CONCURRENCY) -> ProbeClient:
+    return ProbeClient(concurrency)
+
+
+async def probe(client: ProbeClient, m, timeout_ms: int = None) -> ProbeResult:
+    """Probe a single monitor. Never raises; failures become a not-ok result.
+
+    The timeout is `timeout_ms`, else the monitor's own, else CHECK_TIMEOUT_MS.
+    """
+    timeout_ms = timeout_ms or getattr(m, "timeout_ms", None) or TIMEOUT_MS
+    phases = timing.start()
+    try:
+        start = time.perf_counter()
+        resp = await client.for_monitor(m).request(m.method, m.url, timeout=timeout_ms / 1000,
+                                                   extensions={"trace": timing.trace})
+        latency = int((time.perf_counter() - start) * 1000)
+        ok = resp.status_code in (m.expected_statuses or [200])
+        status_code = resp.status_code
+        err = None
+    except Exception as e:
+        latency = None
+        ok = False
+        status_code = None
+        err = str(e)[:500] or type(e).__name__
+
+    return ProbeResult(
+        monitor_id=m.id,
+        ts=datetime.now(timezone.utc),
+        status_code=status_code,
+        latency_ms=latency,
+        ok=ok,
+        error_reason=err,
+        **{f"{p}_ms": phases.get(p) for p in timing.PHASES},
+    )
+
+
+async def probe_many(client: ProbeClient, monitors) -> list[ProbeResult]:
+    """Probe all monitors in parallel. Results keep input order.
+
+    In-flight probes are bounded by the client's semaphore, so concurrent
+    batches share one concurrency budget.
+    """
+    async def bounded(m):
+        async with client.sem:
+            return await probe(client, m)
+
+    return await asyncio.gather(*(bounded(m) for m in monitors))
@@ -0,0 +1,187 @@
+# services/monitor/procpool.py
+import os, time, queue, signal, asyncio, threading
+import multiprocessing as mp
+
+import metrics
+from probe import make_client, probe_many, PROBE_CONCURRENCY
+
+# 0 probes in the worker process itself; K > 0 fans checks out to K child processes.
+PROBE_PROCS = int(os.getenv("PROBE_PROCS", 0))
+# In-flight probes per child; each child has its own event loop and pooled client.
+PROBE_CHILD_CONCURRENCY = int(os.getenv("PROBE_CHILD_CONCURRENCY", PROBE_CONCURRENCY))
+CHILD_CHECK_SEC = 1.0
+
+
+def _route(monitor_id: int, n: int) -> int:
+    # Knuth multiplicative hash: a plain `id % n` would correlate with the
+    # child's own `id % clients` choice (probe.ProbeClient.for_monitor) and
+    # leave some of its clients idle.
+    return ((monitor_id * 2654435761) & 0xFFFFFFFF) % n
+
+
+def _child_main(idx: int, tasks, results, concurrency: int):
+    # The supervisor owns shutdown: it sends a sentinel once the worker
+    # stops, so a Ctrl-C/SIGTERM to the process group doesn't cut probes off.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    print(f"[monitor] Probe child #{idx} started (pid {os.getpid()}).")
+    asyncio.run(_child_loop(idx, tasks, results, concurrency))
+
+
+async def _child_loop(idx: int, tasks, results, concurrency: int):
+    loop = asyncio.get_running_loop()
+    running = set()
+
+    async def run(batch_id, specs):
+        res = await probe_many(client, specs)
+        results.put((batch_id, idx, res, time.process_time()))
+
+    async with make_client(concurrency) as client:
+        while True:
+            item = await loop.run_in_executor(None, tasks.get)
+            if item is None:
+                break
+            task = asyncio.create_task(run(*item))
+            running.add(task)
+            task.add_done_callback(running.discard)
+        if running:
+            await asyncio.wait(running)
+
+
+class ProbePool:
+    """Multi-process probing: the worker schedules and persists, K children probe.
+
+    A single worker process tops out at about one core of TLS and response
+    handling. Here every due batch is split across K forked children, each
+    with its own event loop and ProbeClient. Results come back over one
+    queue to the parent, which stays the only writer of checks and
+    incidents. A monitor always goes to the same child, so warm
+    connections keep being reused. Children are forked before the event
+    loop or any thread starts (see worker.py), which is why `start` is
+    separate from `__aenter__`.
+
+    If a child dies, its outstanding batches fail (the worker reschedules
+    them) and its monitors move to the survivors. `alive()` turns false
+    once none are left.
+    """
+
+    def __init__(self, procs: int = PROBE_PROCS, concurrency: int = PROBE_CHILD_CONCURRENCY):
+        ctx = mp.get_context("fork")
+        self.results = ctx.Queue()
+        self.tasks = [ctx.Queue() for _ in range(procs)]
+        self.procs = [
+            ctx.Process(target=_child_main, args=(i, self.tasks[i], self.results, concurrency),
+                        name=f"probe-{i}", daemon=True)
+            for i in range(procs)
+        ]
+        self.dead = set()
+        self._pending = {}  # batch id -> (future, {child: results or None})
+        self._next_id = 0
+        self._loop = None
+        self._closing = False
+        # per child: [checks since last report, cpu seconds at last report, latest cpu seconds]
+        self._stats = [[0, 0.0, 0.0] for _ in range(procs)]
+        self._stats_at = time.monotonic()
+
+    def start(self):
+        for p in self.procs:
+            p.start()
+        return self
+
+    def alive(self) -> bool:
+        return len(self.dead) < len(self.procs)
+
+    async def __aenter__(self):
+        self._loop = asyncio.get_running_loop()
+        threading.Thread(target=self._read, name="probe-results", daemon=True).start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await asyncio.to_thread(self.close)
+
+    def close(self, timeout: float = 30):
+        self._closing = True  # children exiting from here on are expected
+        for q in self.tasks:
+            q.put(None)
+        deadline = time.monotonic() + timeout
+        for p in self.procs:
+            p.join(max(0.1, deadline - time.monotonic()))
+            if p.is_alive():
+                p.terminate()
+
+    async def probe_many(self, specs) -> list:
+        """Probe `specs` across the children; results keep input order."""
+        if not specs:
+            return []
+        alive = [i for i in range(len(self.procs)) if i not in self.dead]
+        if not alive:
+            raise RuntimeError("all probe child processes have exited")
+        split = {}
+        for m in specs:
+            split.setdefault(alive[_route(m.id, len(alive))], []).append(m)
+        batch_id = self._next_id
+        self._next_id += 1
+        fut = self._loop.create_future()
+        self._pending[batch_id] = (fut, dict.fromkeys(split))
+        for i, part in split.items():
+            self.tasks[i].put((batch_id, part))
+        parts = await fut
+        by_id = {res.monitor_id: res for part in parts.values() for res in part}
+        return [by_id[m.id] for m in specs]
+
+    def _read(self):
+        """Result reader thread: hands results to the event loop and watches for dead children."""
+        next_check = time.monotonic() + CHILD_CHECK_SEC
+        while not self._closing:
+            try:
+                msg = self.results.get(timeout=CHILD_CHECK_SEC)
+                self._loop.call_soon_threadsafe(self._deliver, *msg)
+            except queue.Empty:
+                pass
+            if time.monotonic() >= next_check:
+                next_check = time.monotonic() + CHILD_CHECK_SEC
+                for i, p in enumerate(self.procs):
+                    if not p.is_alive() and not self._closing:
+                        self._loop.call_soon_threadsafe(self._child_died, i, p.exitcode)
+
+    def _deliver(self, batch_id: int, idx: int, results: list, cpu: float):
+        st = self._stats[idx]
+        st[0] += len(results)
+        st[2] = cpu
+        metrics.CHILD_CHECKS.labels(str(idx)).inc(len(results))
+        metrics.CHILD_CPU.labels(str(idx)).set(cpu)
+        entry = self._pending.get(batch_id)
+        if entry is None:
+            return  # failed already (a sibling child died)
+        fut, parts = entry
+        parts[idx] = results
+        if all(part is not None for part in parts.values()):
+            del self._pending[batch_id]
+            if not fut.done():
+                fut.set_result(parts)
+
+    def _child_died(self, idx: int, exitcode):
+        if idx in self.dead:
+            return
+        self.dead.add(idx)
+        print(f"[monitor] Probe child #{idx} exited ({exitcode}); "
+              f"{len(self.procs) - len(self.dead)} left, its monitors move to them.")
+        for batch_id, (fut, parts) in list(self._pending.items()):
+            if idx in parts and parts[idx] is None:
+                del self._pending[batch_id]
+                if not fut.done():
+                    fut.set_exception(RuntimeError(f"probe child #{idx} exited"))
+
+    def child_stats(self) -> list[dict]:
+        """Per-child throughput and CPU use since the last call."""
+        now = time.monotonic()
+        elapsed = max(1e-9, now - self._stats_at)
+        self._stats_at = now
+        out = []
+        for i, st in enumerate(self._stats):
+            checks, cpu_then, cpu_now = st
+            out.append({"child": i, "alive": i not in self.dead, "checks": checks,
+                        "checks_per_sec": round(checks / elapsed, 1),
+                        "cpu_percent": round((cpu_now - cpu_then) / elapsed * 100, 1)})
+            st[0], st[1] = 0, cpu_now
+        return out
@@ -0,0 +1,103 @@
+# services/monitor/rollups.py
+import math
+from bisect import bisect_left
+
+from sqlalchemy import func, literal_column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from models import CheckRollupMinute, CheckRollupHour, LATENCY_BUCKETS_MS, PHASES, SKETCH_GAMMA
+
+ROLLUPS = (
+    (CheckRollupMinute, lambda ts: ts.replace(second=0, microsecond=0)),
+    (CheckRollupHour, lambda ts: ts.replace(minute=0, second=0, microsecond=0)),
+)
+_LOG_GAMMA = math.log(SKETCH_GAMMA)
+
+
+def sketch_index(latency_ms: int) -> int:
+    """Latency sketch bucket for `latency_ms` (see models.SKETCH_ALPHA)."""
+    return math.ceil(math.log(latency_ms) / _LOG_GAMMA) if latency_ms > 1 else 0
+
+
+def fold(floor, rows) -> list[dict]:
+    """Aggregate check rows (dicts as buffered by CheckBuffer) into one row per (monitor, bucket)."""
+    acc = {}
+    for row in rows:
+        key = (row["monitor_id"], floor(row["ts"]))
+        a = acc.get(key)
+        if a is None:
+            a = acc[key] = {
+                "monitor_id": key[0], "bucket": key[1], "total": 0, "ok": 0,
+                "latency_n": 0, "latency_sum": 0, "latency_min": None, "latency_max": None,
+                "latency_hist": [0] * (len(LATENCY_BUCKETS_MS) + 1), "latency_sketch": {},
+                "phase_sum": [0] * len(PHASES), "phase_n": [0] * len(PHASES),
+            }
+        a["total"] += 1
+        a["ok"] += bool(row["ok"])
+        lat = row["latency_ms"]
+        if lat is not None:
+            a["latency_n"] += 1
+            a["latency_sum"] += lat
+            a["latency_min"] = lat if a["latency_min"] is None else min(a["latency_min"], lat)
+            a["latency_max"] = lat if a["latency_max"] is None else max(a["latency_max"], lat)
+            a["latency_hist"][bisect_left(LATENCY_BUCKETS_MS, lat)] += 1
+            b = str(sketch_index(lat))
+            a["latency_sketch"][b] = a["latency_sketch"].get(b, 0) + 1
+        for i, phase in enumerate(PHASES):
+            v = row.get(f"{phase}_ms")
+            if v is not None:
+                a["phase_sum"][i] += v
+                a["phase_n"][i] += 1
+    # stable key order keeps concurrent upserts from deadlocking on each other
+    return [acc[k] for k in sorted(acc)]
+
+
+UPSERT_CHUNK = 1000  # rows per statement; keeps bind parameters well under Postgres' 65535
+
+
+def upsert(session, model, rows: list[dict]):
+    """Add pre-folded aggregates onto existing rollup rows with INSERT ... ON CONFLICT."""
+    for i in range(0, len(rows), UPSERT_CHUNK):
+        session.execute(_upsert_stmt(model, rows[i:i + UPSERT_CHUNK]))
+
+
+def _upsert_stmt(model, rows: list[dict]):
+    t = model.__table__
+    stmt = pg_insert(model).values(rows)
+    ex = stmt.excluded
+    return stmt.on_conflict_do_update(
+        index_elements=[t.c.monitor_id, t.c.bucket],
+        set_={
+            "total": t.c.total + ex.total,
+            "ok": t.c.ok + ex.ok,
+            "latency_n": t.c.latency_n + ex.latency_n,
+            "latency_sum": t.c.latency_sum + ex.latency_sum,
+            # LEAST/GREATEST skip NULLs, so a bucket with no latency yet just takes the new value
+            "latency_min": func.least(t.c.latency_min, ex.latency_min),
+            "latency_max": func.greatest(t.c.latency_max, ex.latency_max),
+            "latency_hist": _add_arrays(t, "latency_hist"),
+            "latency_sketch": _add_sketches(t, "latency_sketch"),
+            "phase_sum": _add_arrays(t, "phase_sum"),
+            "phase_n": _add_arrays(t, "phase_n"),
+        },
+    )
+
+
+def _add_arrays(t, col: str):
+    """Element-wise existing + excluded for an array column."""
+    return literal_column(f"ARRAY(SELECT a + b FROM unnest({t.name}.{col}, excluded.{col}) AS u(a, b))")
+
+
+def _add_sketches(t, col: str):
+    """Bucket-wise existing + excluded for a {"bucket": count} jsonb column."""
+    return literal_column(
+        f"(SELECT coalesce(jsonb_object_agg(k, n), '{{}}') FROM (SELECT k, sum(v::bigint) AS n FROM "
+        f"(SELECT * FROM jsonb_each_text({t.name}.{col}) UNION ALL SELECT * FROM jsonb_each_text(excluded.{col})) "
+        f"AS u(k, v) GROUP BY k) AS s)"
+    )
+
+
+def apply(session, rows):
+    """Fold a batch of check rows into every rollup table, inside the caller's transaction."""
+    for model, floor in ROLLUPS:
+        upsert(session, model, fold(floor, rows))
@@ -0,0 +1,132 @@
+# services/monitor/scheduler.py
+import os, time, heapq, random
+
+SCHED_JITTER = float(os.getenv("SCHED_JITTER", 0.05))
+
+# Adaptive intervals: suspect monitors (failing, incident not yet open) and
+# recovering ones (passing, incident still open) are re-checked every
+# ADAPTIVE_FAST_SEC. That lasts at most FAIL_THRESHOLD / RECOVER_THRESHOLD
+# checks, so time-to-detect drops without raising the steady-state rate.
+# A monitor that stays down doubles its interval every ADAPTIVE_BACKOFF_AFTER
+# failing checks, up to ADAPTIVE_BACKOFF_MAX times the configured one.
+ADAPTIVE_INTERVALS = os.getenv("ADAPTIVE_INTERVALS", "1") == "1"
+ADAPTIVE_FAST_SEC = float(os.getenv("ADAPTIVE_FAST_SEC", 10))
+ADAPTIVE_BACKOFF_AFTER = int(os.getenv("ADAPTIVE_BACKOFF_AFTER", 10))
+ADAPTIVE_BACKOFF_MAX = int(os.getenv("ADAPTIVE_BACKOFF_MAX", 8))
+
+
+def adaptive_interval(interval: float, ok: bool, fails: int, incident_open: bool) -> float:
+    """Seconds until the next check of a monitor whose last check left it in this state."""
+    fast = min(interval, ADAPTIVE_FAST_SEC)
+    if incident_open:
+        if ok:
+            return fast  # confirming recovery
+        return interval * min(ADAPTIVE_BACKOFF_MAX, 2 ** (fails // max(1, ADAPTIVE_BACKOFF_AFTER)))
+    if not ok:
+        return fast  # confirming the failure
+    return interval
+
+
+class Scheduler:
+    """Deadline-ordered schedule of monitor checks.
+
+    A min-heap of (due, monitor_id) on the monotonic clock. Popped monitors
+    are "in flight" and stay out of the heap until `reschedule` puts them
+    back, so a slow probe is never started twice. Entries made stale by
+    `sync` are skipped lazily on pop.
+    """
+
+    def __init__(self, jitter: float = SCHED_JITTER):
+        self.jitter = jitter
+        self.specs = {}  # monitor_id -> MonitorSpec
+        self._due = {}   # monitor_id -> due time of its live heap entry
+        self._heap = []
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.lag_sum = 0.0
+        self.lag_max = 0.0
+        self.popped = 0
+
+    def _push(self, mid: int, due: float):
+        self._due[mid] = due
+        heapq.heappush(self._heap, (due, mid))
+
+    def __len__(self):
+        return len(self.specs)
+
+    def sync(self, specs: dict, only=None) -> tuple[int, int]:
+        """Reconcile with a fresh {id: MonitorSpec} set; only changed monitors are touched.
+
+        With `only` (monitor ids), `specs` is the fresh state of just those
+        monitors and the rest of the schedule is left as it is.
+        New monitors get a random first due time within their interval so a
+        cold start (or a bulk import) doesn't probe everything at once.
+        Returns (added, removed).
+        """
+        now = time.monotonic()
+        removed = [mid for mid in (self.specs if only is None else only) if mid in self.specs and mid not in specs]
+        for mid in removed:
+            del self.specs[mid]
+            self._due.pop(mid, None)
+
+        added = 0
+        for mid, spec in specs.items():
+            old = self.specs.get(mid)
+            self.specs[mid] = spec
+            if old is None:
+                added += 1
+                self._push(mid, now + random.uniform(0, spec.interval_sec))
+            elif old.interval_sec != spec.interval_sec and mid in self._due:
+                self._push(mid, min(self._due[mid], now + spec.interval_sec))
+        return added, len(removed)
+
+    def pop_due(self, now: float = None) -> list:
+        """Remove and return [(spec, due)] for every monitor due at `now`."""
+        now = time.monotonic() if now is None else now
+        out = []
+        while self._heap and self._heap[0][0] <= now:
+            due, mid = heapq.heappop(self._heap)
+            if self._due.get(mid) != due:
+                continue
+            del self._due[mid]
+            lag = now - due
+            self.lag_sum += lag
+            self.lag_max = max(self.lag_max, lag)
+            self.popped += 1
+            out.append((self.specs[mid], due))
+        return out
+
+    def reschedule(self, mid: int, due: float, now: float = None, interval: float = None):
+        """Put an in-flight monitor back, one interval after the deadline it ran for.
+
+        Keying off the old deadline rather than completion time keeps the
+        cadence from drifting by the probe's own latency; if the worker fell
+        more than an interval behind, it restarts from now instead of bursting.
+        `interval` overrides the monitor's own (see adaptive_interval).
+        """
+        spec = self.specs.get(mid)
+        if spec is None or mid in self._due:
+            return
+        now = time.monotonic() if now is None else now
+        interval = spec.interval_sec if interval is None else interval
+        nxt = max(due + interval, now)
+        nxt += random.uniform(-self.jitter, self.jitter) * interval
+        self._push(mid, max(nxt, now))
+
+    def next_due(self):
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def drift_stats(self) -> dict:
+        """Scheduling lag (how late checks started vs. their deadline) since the last call."""
+        stats = {
+            "monitors": len(self.specs),
+            "in_flight": len(self.specs) - len(self._due),
+            "checks": self.popped,
+            "lag_avg_ms": int(self.lag_sum / self.popped * 1000) if self.popped else 0,
+            "lag_max_ms": int(self.lag_max * 1000),
+        }
+        self._reset_stats()
+        return stats
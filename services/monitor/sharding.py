@@ -0,0 +1,104 @@
+# services/monitor/sharding.py
+import os, time, socket, hashlib
+
+NUM_SHARDS = int(os.getenv("NUM_SHARDS", 64))
+SHARD_HEARTBEAT_SEC = float(os.getenv("SHARD_HEARTBEAT_SEC", 5))
+SHARD_LEASE_TTL_SEC = float(os.getenv("SHARD_LEASE_TTL_SEC", 15))
+WORKER_ID = os.getenv("WORKER_ID") or f"{socket.gethostname()}:{os.getpid()}"
+
+KEY_WORKERS = "workers"   # zset: worker id -> last heartbeat (unix time)
+KEY_SHARD = "shard:"      # shard:{n} -> worker id holding the lease
+
+# Only touch a lease we still hold; a plain EXPIRE/DEL could extend or drop
+# a lease another worker took over after ours lapsed. A lease of ours that
+# lapsed (a pause longer than the TTL) but that nobody took is re-taken,
+# rather than dropping the shard until the next heartbeat claims it again.
+_RENEW = """
+local holder = redis.call('get', KEYS[1])
+if holder == ARGV[1] then
+  return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+if not holder then
+  redis.call('set', KEYS[1], ARGV[1], 'PX', ARGV[2])
+  return 1
+end
+return 0
+"""
+_RELEASE = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+  return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def shard_of(monitor_id: int, num_shards: int = NUM_SHARDS) -> int:
+    return monitor_id % num_shards
+
+
+def _weight(shard: int, worker: str) -> bytes:
+    return hashlib.blake2b(f"{shard}/{worker}".encode(), digest_size=8).digest()
+
+
+class ShardLeases:
+    """Partitions the monitor id space across worker replicas.
+
+    Monitors map to a fixed number of shards (id % NUM_SHARDS). Live workers
+    announce themselves in a heartbeat zset; each shard's preferred owner is
+    picked by rendezvous hashing over that set, so a join or a death only
+    moves the shards that must move. Ownership is confirmed by a Redis lease
+    (SET NX PX) renewed every heartbeat, which keeps owners disjoint while
+    shards change hands: a shard is only taken once its old holder released
+    it or stopped renewing.
+    """
+
+    def __init__(self, r, worker_id: str = WORKER_ID, num_shards: int = NUM_SHARDS):
+        self.r = r
+        self.worker_id = worker_id
+        self.num_shards = num_shards
+        self.owned = set()
+        self._renew = r.register_script(_RENEW)
+        self._release = r.register_script(_RELEASE)
+
+    def live_workers(self) -> list[str]:
+        now = time.time()
+        pipe = self.r.pipeline()
+        pipe.zadd(KEY_WORKERS, {self.worker_id: now})
+        pipe.zremrangebyscore(KEY_WORKERS, 0, now - SHARD_LEASE_TTL_SEC)
+        pipe.zrange(KEY_WORKERS, 0, -1)
+        return [w.decode() for w in pipe.execute()[-1]]
+
+    def wanted(self, workers: list[str]) -> set[int]:
+        return {s for s in range(self.num_shards) if max(workers, key=lambda w: _weight(s, w)) == self.worker_id}
+
+    def heartbeat(self) -> bool:
+        """Renew, release and claim leases. Returns True if the owned set changed."""
+        wanted = self.wanted(self.live_workers())
+        ttl_ms = int(SHARD_LEASE_TTL_SEC * 1000)
+        keep = sorted(self.owned & wanted)
+        drop = sorted(self.owned - wanted)
+        claim = sorted(wanted - self.owned)
+
+        pipe = self.r.pipeline()
+        for s in keep:
+            self._renew(keys=[KEY_SHARD + str(s)], args=[self.worker_id, ttl_ms], client=pipe)
+        for s in drop:
+            self._release(keys=[KEY_SHARD + str(s)], args=[self.worker_id], client=pipe)
+        for s in claim:
+            pipe.set(KEY_SHARD + str(s), self.worker_id, nx=True, px=ttl_ms)
+        res = pipe.execute()
+
+        renewed = {s for s, ok in zip(keep, res[: len(keep)]) if ok}
+        claimed = {s for s, ok in zip(claim, res[len(keep) + len(drop):]) if ok}
+        owned = renewed | claimed
+        changed = owned != self.owned
+        self.owned = owned
+        return changed
+
+    def release_all(self):
+        pipe = self.r.pipeline()
+        for s in self.owned:
+            self._release(keys=[KEY_SHARD + str(s)], args=[self.worker_id], client=pipe)
+        pipe.zrem(KEY_WORKERS, self.worker_id)
+        pipe.execute()
+        self.owned = set()
@@ -0,0 +1,77 @@
+# services/monitor/state.py
+from dataclasses import dataclass
+from typing import Optional
+
+KEY_FAILS = "fails:"
+KEY_PASSES = "passes:"
+KEY_INCIDENT_OPEN = "incident_open:"
+
+# Placeholder stored in incident_open:{id} between claiming the transition and
+# the Incident row existing; a resolve that sees it falls back to monitor_id.
+PENDING = "pending"
+
+# KEYS: fails, passes, incident_open
+# ARGV: ok (1/0), fail threshold, recover threshold, PENDING
+# Returns {action, incident ref, consecutive fails, consecutive passes}.
+_TRANSITION = """
+if ARGV[1] == '1' then
+  redis.call('del', KEYS[1])
+  local passes = redis.call('incr', KEYS[2])
+  local open = redis.call('get', KEYS[3])
+  if open and passes >= tonumber(ARGV[3]) then
+    redis.call('del', KEYS[3])
+    return {'resolve', open, 0, passes}
+  end
+  return {'', open or '', 0, passes}
+end
+redis.call('del', KEYS[2])
+local fails = redis.call('incr', KEYS[1])
+local open = redis.call('get', KEYS[3])
+if not open and fails >= tonumber(ARGV[2]) then
+  redis.call('set', KEYS[3], ARGV[4])
+  return {'open', '', fails, 0}
+end
+return {'', open or '', fails, 0}
+"""
+
+
+@dataclass
+class Transition:
+    action: str                  # "open", "resolve" or "" (no change)
+    incident_ref: Optional[str]  # incident id (or PENDING) held in incident_open:{id}
+    fails: int
+    passes: int
+
+
+class StateMachine:
+    """Fail/pass/incident counters per monitor, evaluated atomically in Redis.
+
+    Each check is one EVALSHA that updates the counters and claims the
+    open/resolve transition in a single step, so two workers can never both
+    open (or both resolve) the same incident. A whole batch of checks goes
+    out in one pipeline, i.e. one round trip.
+    """
+
+    def __init__(self, r, fail_threshold: int, recover_threshold: int):
+        self.r = r
+        self.fail_threshold = fail_threshold
+        self.recover_threshold = recover_threshold
+        self._script = r.register_script(_TRANSITION)
+
+    def apply(self, results) -> list[Transition]:
+        if not results:
+            return []
+        pipe = self.r.pipeline(transaction=False)
+        for res in results:
+            mid = str(res.monitor_id)
+            self._script(
+                keys=[KEY_FAILS + mid, KEY_PASSES + mid, KEY_INCIDENT_OPEN + mid],
+                args=[1 if res.ok else 0, self.fail_threshold, self.recover_threshold, PENDING],
+                client=pipe,
+            )
+        out = []
+        for action, ref, fails, passes in pipe.execute():
+            ref = ref.decode() if isinstance(ref, bytes) else ref
+            action = action.decode() if isinstance(action, bytes) else action
+            out.append(Transition(action=action, incident_ref=ref or None, fails=int(fails), passes=int(passes)))
+        return out
@@ -0,0 +1,59 @@
+# services/monitor/tests/conftest.py
+# The worker's modules are flat (imported as `worker`, `state`, ...) and db.py
+# connects on import, so point it at in-memory sqlite; tests needing Redis
+# or a real Postgres (MONITOR_TEST_DATABASE_URL) opt into the fixtures below.
+import os, sys, uuid
+
+import fakeredis
+import pytest
+import redis
+from sqlalchemy import create_engine, text
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("METRICS_PORT", "0")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """A fresh fakeredis server; redis.from_url hands out clients of it for the test's duration."""
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(redis, "from_url", lambda url, **kw: fakeredis.FakeRedis(server=server))
+    return fakeredis.FakeRedis(server=server)
+
+
+@pytest.fixture
+def worker(fake_redis, monkeypatch):
+    """The worker module, wired to this test's fakeredis (it connects to Redis on first import)."""
+    import worker
+    from state import StateMachine
+    monkeypatch.setattr(worker, "r", fake_redis)
+    monkeypatch.setattr(worker, "state", StateMachine(fake_redis, worker.FAIL_THRESHOLD, worker.RECOVER_THRESHOLD))
+    return worker
+
+
+@pytest.fixture
+def pg_engine():
+    """An engine on MONITOR_TEST_DATABASE_URL with the worker's tables in a throwaway schema.
+
+    Skips when the variable is unset; the schema is dropped afterwards, so any
+    database the test role can create schemas in will do.
+    """
+    url = os.getenv("MONITOR_TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("MONITOR_TEST_DATABASE_URL is not set")
+    from db import Base
+    import models  # noqa: F401  (registers the tables on Base)
+    schema = f"monitor_test_{uuid.uuid4().hex[:8]}"
+    admin = create_engine(url, future=True)
+    with admin.begin() as conn:
+        conn.execute(text(f"CREATE SCHEMA {schema}"))
+    eng = create_engine(url, future=True, connect_args={"options": f"-csearch_path={schema}"})
+    try:
+        Base.metadata.create_all(bind=eng)
+        yield eng
+    finally:
+        eng.dispose()
+        with admin.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        admin.dispose()
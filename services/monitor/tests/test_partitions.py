@@ -0,0 +1,175 @@
+# services/monitor/tests/test_partitions.py
+# Runs against a real Postgres (see the pg_engine fixture); skipped otherwise.
+import os
+from datetime import datetime, time, timedelta, timezone
+
+from sqlalchemy import text
+
+import partitions
+from db import Base
+
+SCRIPTS = os.path.join(os.path.dirname(__file__), "..", "..", "..", "scripts")
+
+
+def today():
+    return datetime.now(timezone.utc).date()
+
+
+def at(day, hour=12):
+    return datetime.combine(day, time(hour), tzinfo=timezone.utc)
+
+
+def add_monitors(conn, *ids):
+    for i in ids:
+        conn.execute(text("INSERT INTO monitors (id, name, url) VALUES (:i, :n, 'http://x')"), {"i": i, "n": f"m{i}"})
+
+
+def add_check(conn, monitor_id, ts):
+    conn.execute(text("INSERT INTO checks (monitor_id, ts, ok) VALUES (:m, :ts, true)"), {"m": monitor_id, "ts": ts})
+
+
+def add_rollup(conn, table, monitor_id, bucket):
+    conn.execute(text(f"INSERT INTO {table} (monitor_id, bucket, total, ok, latency_n, latency_sum, latency_hist) "
+                      "VALUES (:m, :b, 1, 1, 0, 0, '{}')"), {"m": monitor_id, "b": bucket})
+
+
+def count(conn, table):
+    return conn.execute(text(f"SELECT count(*) FROM {table}")).scalar()
+
+
+def run_script(engine, name):
+    raw = engine.raw_connection()
+    try:
+        raw.driver_connection.autocommit = True
+        with open(os.path.join(SCRIPTS, name)) as f:
+            raw.driver_connection.execute(f.read())
+    finally:
+        raw.driver_connection.autocommit = False
+        raw.close()
+
+
+def test_ensure_partitions_moves_default_rows_into_the_new_partition(pg_engine):
+    with pg_engine.begin() as conn:
+        assert partitions.is_partitioned(conn)
+        conn.execute(text(f"CREATE TABLE {partitions.DEFAULT} PARTITION OF checks DEFAULT"))
+        add_monitors(conn, 1)
+        add_check(conn, 1, at(today()))  # no daily partition yet: lands in DEFAULT
+        assert count(conn, partitions.DEFAULT) == 1
+
+        assert partitions.ensure_partitions(conn, days_ahead=1) == 3
+
+        assert set(partitions.daily_partitions(conn)) == {today() + timedelta(days=d) for d in (-1, 0, 1)}
+        assert count(conn, partitions.DEFAULT) == 0
+        assert count(conn, partitions.partition_name(today())) == 1
+        assert count(conn, "checks") == 1
+        add_check(conn, 1, at(today() + timedelta(days=1)))
+        assert count(conn, partitions.partition_name(today() + timedelta(days=1))) == 1
+        assert partitions.ensure_partitions(conn, days_ahead=1) == 0
+
+
+def test_one_failed_partition_does_not_abort_the_others(pg_engine):
+    broken = today() + timedelta(days=1)
+    with pg_engine.begin() as conn:
+        # A stray table of the same name can't be attached (wrong columns).
+        conn.execute(text(f"CREATE TABLE {partitions.partition_name(broken)} (x int)"))
+        assert partitions.ensure_partitions(conn, days_ahead=2) == 3
+        assert set(partitions.daily_partitions(conn)) == {today() + timedelta(days=d) for d in (-1, 0, 2)}
+        add_monitors(conn, 1)
+        add_check(conn, 1, at(today()))  # the transaction survived the failed savepoint
+    with pg_engine.connect() as conn:
+        assert count(conn, partitions.partition_name(today())) == 1
+
+
+def test_drop_expired_partitions_keeps_days_that_were_never_rolled_up(pg_engine):
+    old = today() - timedelta(days=40)
+    hourly = partitions.CheckRollupHour.__tablename__
+    with pg_engine.begin() as conn:
+        partitions.ensure_partitions(conn, days_ahead=0)
+        partitions.create_partition(conn, old)
+        add_monitors(conn, 1, 2)
+        add_check(conn, 1, at(old))
+        add_check(conn, 2, at(old))
+        add_rollup(conn, hourly, 1, at(old))  # monitor 2's checks predate the rollups
+
+        assert partitions.drop_expired_partitions(conn, retention_days=30) == []
+        assert old in partitions.daily_partitions(conn)
+
+        add_rollup(conn, hourly, 2, at(old, 0))
+        assert partitions.drop_expired_partitions(conn, retention_days=30) == [partitions.partition_name(old)]
+        assert old not in partitions.daily_partitions(conn)
+        assert today() in partitions.daily_partitions(conn)
+
+
+def test_drop_expired_partitions_deletes_only_rolled_up_rows_from_default(pg_engine):
+    old = today() - timedelta(days=40)
+    hourly = partitions.CheckRollupHour.__tablename__
+    with pg_engine.begin() as conn:
+        partitions.ensure_partitions(conn, days_ahead=0)
+        add_monitors(conn, 1, 2)
+        add_check(conn, 1, at(old, 5).replace(minute=30))
+        add_check(conn, 2, at(old, 5))
+        add_check(conn, 1, at(today()))
+        add_rollup(conn, hourly, 1, at(old, 5))
+        add_rollup(conn, hourly, 2, at(old, 6))  # a different hour: monitor 2's row is not covered
+
+        assert partitions.drop_expired_partitions(conn, retention_days=30) == [f"1 row(s) from {partitions.DEFAULT}"]
+        left = conn.execute(text(f"SELECT monitor_id FROM {partitions.DEFAULT}")).scalars().all()
+        assert left == [2]
+        assert count(conn, "checks") == 2
+
+
+def test_downsample_rollups_expires_by_table_retention(pg_engine):
+    now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    minute = partitions.CheckRollupMinute.__tablename__
+    hourly = partitions.CheckRollupHour.__tablename__
+    with pg_engine.begin() as conn:
+        add_monitors(conn, 1)
+        add_rollup(conn, minute, 1, now - timedelta(days=partitions.ROLLUP_1M_RETENTION_DAYS, hours=1))
+        add_rollup(conn, minute, 1, now)
+        add_rollup(conn, hourly, 1, now - timedelta(days=partitions.ROLLUP_1M_RETENTION_DAYS, hours=1))
+        add_rollup(conn, hourly, 1, now - timedelta(days=partitions.ROLLUP_1H_RETENTION_DAYS, hours=1))
+
+        assert partitions.downsample_rollups(conn) == (1, 1)
+        assert count(conn, minute) == 1
+        assert count(conn, hourly) == 1
+
+
+def test_run_maintenance_skips_an_unpartitioned_checks_table(pg_engine, capsys):
+    with pg_engine.begin() as conn:
+        conn.execute(text("DROP TABLE checks"))
+        conn.execute(text("CREATE TABLE checks (id bigserial PRIMARY KEY, ts timestamptz)"))
+    partitions.run_maintenance(pg_engine)
+    assert "not partitioned" in capsys.readouterr().out
+
+
+def test_migration_scripts_partition_a_legacy_table_and_backfill_recent_checks(pg_engine):
+    with pg_engine.begin() as conn:
+        conn.execute(text("DROP TABLE checks"))
+        conn.execute(text(
+            "CREATE TABLE checks (id bigserial PRIMARY KEY, monitor_id int REFERENCES monitors(id), "
+            "ts timestamptz DEFAULT now(), status_code int, latency_ms int, ok boolean, error_reason varchar, "
+            "dns_ms int, connect_ms int, tls_ms int, ttfb_ms int, transfer_ms int)"
+        ))
+        conn.execute(text("CREATE INDEX ix_checks_monitor_id ON checks (monitor_id)"))
+        add_monitors(conn, 1)
+        add_check(conn, 1, at(today() - timedelta(days=2)))
+        add_check(conn, 1, at(today() - timedelta(days=40)))  # past retention: not copied
+
+    run_script(pg_engine, "partition-checks.sql")
+    Base.metadata.create_all(bind=pg_engine)  # what the worker does on its next start
+    with pg_engine.begin() as conn:
+        assert partitions.is_partitioned(conn)
+        partitions.ensure_partitions(conn)
+        add_check(conn, 1, at(today()))  # written before the backfill runs
+    run_script(pg_engine, "partition-checks-backfill.sql")
+
+    with pg_engine.begin() as conn:
+        assert count(conn, "checks_legacy") == 2
+        assert count(conn, "checks") == 2
+        assert conn.execute(text("SELECT count(DISTINCT id) FROM checks")).scalar() == 2
+        assert count(conn, partitions.DEFAULT) == 1  # two days back has no daily partition
+        seq = conn.execute(text("SELECT pg_get_serial_sequence('checks', 'id')")).scalar()
+        assert seq.endswith(".checks_id_seq")
+        conn.execute(text("DROP TABLE checks_legacy"))
+        add_check(conn, 1, at(today()))
+        assert count(conn, "checks") == 3
@@ -0,0 +1,113 @@
+# services/monitor/tests/test_probe.py
+import asyncio, time
+from contextlib import asynccontextmanager
+
+from probe import MonitorSpec, ProbeClient, probe, probe_many
+
+
+class Target:
+    """Minimal keep-alive HTTP/1.1 server: /ok, /fail, /slow (200 ms), /hang."""
+
+    def __init__(self):
+        self.connections = 0
+        self.active = 0
+        self.peak = 0
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                path = head.split(b" ", 2)[1]
+                self.active += 1
+                self.peak = max(self.peak, self.active)
+                try:
+                    if path == b"/hang":
+                        await asyncio.sleep(3600)
+                    if path == b"/slow":
+                        await asyncio.sleep(0.2)
+                finally:
+                    self.active -= 1
+                status = b"500 Internal Server Error" if path == b"/fail" else b"200 OK"
+                writer.write(b"HTTP/1.1 " + status + b"\r\ncontent-length: 2\r\n\r\nok")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+@asynccontextmanager
+async def serve():
+    target = Target()
+    server = await asyncio.start_server(target.handle, "127.0.0.1", 0)
+    target.base = f"http://localhost:{server.sockets[0].getsockname()[1]}"
+    try:
+        yield target
+    finally:
+        server.close()
+
+
+def spec(i, url, mode="warm", expected=(200,), timeout_ms=2000):
+    return MonitorSpec(id=i, url=url, method="GET", interval_sec=60, expected_statuses=expected,
+                       latency_mode=mode, timeout_ms=timeout_ms)
+
+
+def test_probe_many_runs_in_parallel_within_the_budget_and_keeps_order():
+    async def go():
+        async with serve() as t, ProbeClient(concurrency=4, per_client=2, http2=False) as client:
+            monitors = [spec(i, f"{t.base}/slow") for i in range(8)]
+            started = time.perf_counter()
+            results = await probe_many(client, monitors)
+            return t.peak, time.perf_counter() - started, results
+
+    peak, elapsed, results = asyncio.run(go())
+    assert peak == 4  # bounded by the client's semaphore...
+    assert elapsed < 1.2  # ...but not serialised (8 x 200 ms)
+    assert [r.monitor_id for r in results] == list(range(8))
+    assert all(r.ok and r.status_code == 200 for r in results)
+
+
+def test_probe_reports_failures_instead_of_raising():
+    async def go():
+        async with serve() as t, ProbeClient(concurrency=4, http2=False) as client:
+            return await probe_many(client, [
+                spec(1, f"{t.base}/fail"),
+                spec(2, f"{t.base}/fail", expected=(500,)),
+                spec(3, f"{t.base}/hang", timeout_ms=100),
+                spec(4, "http://127.0.0.1:1/"),
+            ])
+
+    failed, expected_500, hung, refused = asyncio.run(go())
+    assert (failed.ok, failed.status_code, failed.error_reason) == (False, 500, None)
+    assert expected_500.ok
+    assert not hung.ok and hung.status_code is None and hung.error_reason
+    assert not refused.ok and refused.latency_ms is None and refused.error_reason
+
+
+def test_warm_checks_reuse_the_connection_and_cold_ones_do_not():
+    async def go():
+        async with serve() as t, ProbeClient(concurrency=4, http2=False) as client:
+            warm = [await probe(client, spec(1, f"{t.base}/ok")) for _ in range(3)]
+            warm_conns = t.connections
+            cold = [await probe(client, spec(2, f"{t.base}/ok", mode="cold")) for _ in range(3)]
+            return warm, warm_conns, cold, t.connections - warm_conns
+
+    warm, warm_conns, cold, cold_conns = asyncio.run(go())
+    assert warm_conns == 1
+    assert cold_conns == 3
+    assert all(r.ok for r in warm + cold)
+
+
+def test_phases_are_split_and_handshake_phases_are_null_on_reuse():
+    async def go():
+        async with serve() as t, ProbeClient(concurrency=4, http2=False) as client:
+            return [await probe(client, spec(1, f"{t.base}/ok")) for _ in range(2)]
+
+    fresh, reused = asyncio.run(go())
+    assert fresh.dns_ms is not None and fresh.connect_ms is not None
+    assert fresh.tls_ms is None  # plain HTTP
+    assert fresh.ttfb_ms is not None and fresh.transfer_ms is not None
+    assert (reused.dns_ms, reused.connect_ms, reused.tls_ms) == (None, None, None)
+    assert reused.ttfb_ms is not None and reused.transfer_ms is not None
+    assert fresh.dns_ms + fresh.connect_ms + fresh.ttfb_ms + fresh.transfer_ms <= fresh.latency_ms + 4
@@ -0,0 +1,70 @@
+# services/monitor/tests/test_procpool.py
+# The children are forked before the event loop starts (as in worker.py) and
+# probe the in-process target from test_probe.py over loopback.
+import os, signal, asyncio
+
+import pytest
+
+import procpool
+from probe import ProbeClient, probe_many
+from test_probe import serve, spec
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(procpool, "CHILD_CHECK_SEC", 0.1)
+    p = procpool.ProbePool(procs=3, concurrency=4).start()
+    yield p
+    p.close(timeout=5)
+
+
+def test_results_come_back_in_input_order_from_every_child(pool):
+    async def go():
+        async with serve() as t, pool:
+            monitors = [spec(i, f"{t.base}/{'fail' if i % 5 == 0 else 'ok'}") for i in range(1, 31)]
+            return monitors, await pool.probe_many(monitors), await pool.probe_many([])
+
+    monitors, results, empty = asyncio.run(go())
+    assert [r.monitor_id for r in results] == [m.id for m in monitors]
+    assert [r.ok for r in results] == [m.id % 5 != 0 for m in monitors]
+    assert empty == []
+    stats = pool.child_stats()
+    assert sum(s["checks"] for s in stats) == 30
+    assert all(s["checks"] > 0 and s["alive"] for s in stats)  # the hash spreads 30 ids over all three
+
+
+def test_results_match_the_in_process_probe(pool):
+    async def go():
+        async with serve() as t:
+            monitors = [spec(1, f"{t.base}/ok"), spec(2, f"{t.base}/fail"), spec(3, f"{t.base}/fail", expected=(500,)),
+                        spec(4, f"{t.base}/hang", timeout_ms=100), spec(5, "http://127.0.0.1:1/")]
+            async with pool:
+                forked = await pool.probe_many(monitors)
+            async with ProbeClient(concurrency=4, http2=False) as client:
+                local = await probe_many(client, monitors)
+            return forked, local
+
+    forked, local = asyncio.run(go())
+    assert [type(r) for r in forked] == [type(r) for r in local]
+    assert [(r.monitor_id, r.ok, r.status_code) for r in forked] == [(r.monitor_id, r.ok, r.status_code) for r in local]
+    assert [r.error_reason is None for r in forked] == [r.error_reason is None for r in local]
+
+
+def test_a_dead_childs_batch_fails_and_its_monitors_move_to_the_survivors(pool):
+    victim = procpool._route(1, 3)
+
+    async def go():
+        async with serve() as t, pool:
+            monitors = [spec(i, f"{t.base}/slow") for i in range(1, 31)]
+            batch = asyncio.create_task(pool.probe_many(monitors))
+            await asyncio.sleep(0.05)
+            os.kill(pool.procs[victim].pid, signal.SIGKILL)
+            with pytest.raises(RuntimeError, match="exited"):
+                await asyncio.wait_for(batch, 5)
+            assert pool.alive() and pool.dead == {victim}
+            return await pool.probe_many(monitors)
+
+    results = asyncio.run(go())
+    assert [r.monitor_id for r in results] == list(range(1, 31))
+    assert all(r.ok for r in results)
+    assert pool.child_stats()[victim]["alive"] is False
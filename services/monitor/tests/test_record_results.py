@@ -0,0 +1,77 @@
+# services/monitor/tests/test_record_results.py
+from collections import namedtuple
+from datetime import datetime, timezone
+
+import pytest
+
+Result = namedtuple("Result", "monitor_id ok status_code latency_ms error_reason ts")
+
+
+def test_failed_incident_commit_restores_resolved_keys(worker, monkeypatch):
+    def resolve_many(*a):
+        raise RuntimeError("db down")
+
+    monkeypatch.setattr(worker.state, "recover_threshold", 1)
+    monkeypatch.setattr(worker.incidents, "open_many", lambda s, rows: ([], []))
+    monkeypatch.setattr(worker.incidents, "resolve_many", resolve_many)
+    monkeypatch.setattr(worker.checks, "add", lambda res: None)
+    worker.r.set("incident_open:7", "42")
+    worker.r.set("incident_open:8", worker.PENDING)
+
+    now = datetime.now(timezone.utc)
+    with pytest.raises(RuntimeError):
+        worker.record_results([Result(7, True, 200, 5, None, now), Result(8, True, 200, 5, None, now)])
+
+    # still open in Postgres, so still open in Redis; the next passing check resolves again
+    assert worker.r.get("incident_open:7") == b"42"
+    assert worker.r.get("incident_open:8") == worker.PENDING.encode()
+
+
+def probe_result(monitor_id, ok):
+    from probe import ProbeResult
+    return ProbeResult(monitor_id, datetime.now(timezone.utc), 200 if ok else 503, 10, ok, None)
+
+
+def alerts(r, stream):
+    import json
+    return [json.loads(fields[b"data"]) for _, fields in r.xrange(stream)]
+
+
+def test_incident_opens_and_resolves_in_postgres_and_redis(worker, pg_engine, monkeypatch):
+    from sqlalchemy import text
+    from sqlalchemy.orm import sessionmaker
+    monkeypatch.setattr(worker, "Session", sessionmaker(bind=pg_engine))
+    with pg_engine.begin() as conn:
+        conn.execute(text("INSERT INTO monitors (id, name, url) VALUES (1, 'm', 'http://x')"))
+
+    ts = worker.record_results([probe_result(1, False) for _ in range(worker.FAIL_THRESHOLD)])
+    assert [t.action for t in ts][-1] == "open"
+    with pg_engine.connect() as conn:
+        (inc_id, reason), = conn.execute(text("SELECT id, reason FROM incidents WHERE state = 'open'")).all()
+    assert reason == "HTTP 503"
+    assert worker.r.get("incident_open:1") == str(inc_id).encode()
+    assert alerts(worker.r, worker.ALERTS_STREAM) == [
+        {"type": "incident", "monitor_id": 1, "incident_id": inc_id, "reason": "HTTP 503"}]
+
+    worker.record_results([probe_result(1, True) for _ in range(worker.RECOVER_THRESHOLD)])
+    with pg_engine.connect() as conn:
+        assert conn.execute(text("SELECT state FROM incidents")).scalars().all() == ["resolved"]
+        assert conn.execute(text("SELECT opened, resolved FROM incident_stats")).one() == (1, 1)
+    assert worker.r.get("incident_open:1") is None
+    assert alerts(worker.r, worker.ALERTS_STREAM)[-1] == {"type": "recovered", "monitor_id": 1, "incident_id": inc_id}
+
+
+def test_an_incident_still_open_in_postgres_is_adopted_without_a_second_alert(worker, pg_engine, monkeypatch):
+    from sqlalchemy import text
+    from sqlalchemy.orm import sessionmaker
+    monkeypatch.setattr(worker, "Session", sessionmaker(bind=pg_engine))
+    with pg_engine.begin() as conn:
+        conn.execute(text("INSERT INTO monitors (id, name, url) VALUES (1, 'm', 'http://x')"))
+        inc_id = conn.execute(text("INSERT INTO incidents (monitor_id, reason, state) "
+                                   "VALUES (1, 'old', 'open') RETURNING id")).scalar()
+    # Redis lost incident_open:1 (e.g. a flush), so the failures claim a new open
+    worker.record_results([probe_result(1, False) for _ in range(worker.FAIL_THRESHOLD)])
+    with pg_engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM incidents")).scalar() == 1
+    assert worker.r.get("incident_open:1") == str(inc_id).encode()
+    assert alerts(worker.r, worker.ALERTS_STREAM) == []
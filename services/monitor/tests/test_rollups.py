@@ -0,0 +1,66 @@
+# services/monitor/tests/test_rollups.py
+from datetime import datetime, timezone
+
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+
+import rollups
+from models import CheckRollupMinute, CheckRollupHour, LATENCY_BUCKETS_MS, PHASES, SKETCH_ALPHA, SKETCH_GAMMA
+
+
+def row(monitor_id, minute, latency_ms, ok=True, second=0, **phases):
+    return {
+        "monitor_id": monitor_id, "ts": datetime(2026, 1, 1, 10, minute, second, tzinfo=timezone.utc),
+        "latency_ms": latency_ms, "ok": ok, **{f"{p}_ms": phases.get(p) for p in PHASES},
+    }
+
+
+def minute_floor(ts):
+    return ts.replace(second=0, microsecond=0)
+
+
+def test_fold_aggregates_one_row_per_monitor_and_bucket():
+    rows = [
+        row(2, 0, 40, dns=3, ttfb=30), row(1, 0, 120, second=30, ttfb=100),
+        row(1, 0, None, ok=False), row(1, 1, 20000, ttfb=19000),
+    ]
+    folded = rollups.fold(minute_floor, rows)
+    assert [(r["monitor_id"], r["bucket"].minute) for r in folded] == [(1, 0), (1, 1), (2, 0)]  # sorted
+    a = folded[0]
+    assert (a["total"], a["ok"], a["latency_n"], a["latency_sum"]) == (2, 1, 1, 120)
+    assert (a["latency_min"], a["latency_max"]) == (120, 120)
+    assert a["latency_hist"][LATENCY_BUCKETS_MS.index(200)] == 1
+    assert folded[1]["latency_hist"][-1] == 1  # slower than the last bound
+    assert sum(a["latency_sketch"].values()) == 1
+    assert a["phase_sum"][PHASES.index("ttfb")] == 100 and a["phase_n"][PHASES.index("dns")] == 0
+    assert folded[2]["phase_n"][PHASES.index("dns")] == 1
+
+
+def test_apply_adds_batches_onto_existing_rollups(pg_engine):
+    first = [row(1, 0, 100, dns=5), row(1, 1, 300, ok=False)]
+    second = [row(1, 0, 50, second=10), row(1, 0, 900, second=20, dns=7)]
+    with Session(pg_engine) as s:
+        s.execute(text("INSERT INTO monitors (id, name, url) VALUES (1, 'm', 'http://x')"))
+        rollups.apply(s, first)
+        s.commit()
+        rollups.apply(s, second)
+        s.commit()
+
+        minute = s.scalars(select(CheckRollupMinute).order_by(CheckRollupMinute.bucket)).all()
+        assert [(m.total, m.ok) for m in minute] == [(3, 3), (1, 0)]
+        m = minute[0]
+        assert (m.latency_n, m.latency_sum, m.latency_min, m.latency_max) == (3, 1050, 50, 900)
+        assert m.latency_hist == rollups.fold(minute_floor, first[:1] + second)[0]["latency_hist"]
+        assert m.phase_sum[PHASES.index("dns")] == 12 and m.phase_n[PHASES.index("dns")] == 2
+        assert m.latency_sketch == rollups.fold(minute_floor, first[:1] + second)[0]["latency_sketch"]
+
+        (h,) = s.scalars(select(CheckRollupHour)).all()
+        assert (h.total, h.ok, h.latency_sum, h.latency_max) == (4, 3, 1350, 900)
+
+
+def test_sketch_bucket_midpoints_are_within_alpha_of_every_latency():
+    for lat in range(2, 60000, 7):
+        i = rollups.sketch_index(lat)
+        assert SKETCH_GAMMA ** (i - 1) < lat <= SKETCH_GAMMA ** i * (1 + 1e-12)
+        mid = 2 * SKETCH_GAMMA ** i / (SKETCH_GAMMA + 1)  # what the API reports for bucket i
+        assert abs(mid - lat) <= SKETCH_ALPHA * lat
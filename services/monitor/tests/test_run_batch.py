@@ -0,0 +1,33 @@
+# services/monitor/tests/test_run_batch.py
+import time, asyncio
+
+from scheduler import Scheduler
+
+
+class NoProbes:
+    async def probe_many(self, specs):
+        return []
+
+
+def test_run_batch_records_results_off_the_event_loop(worker, monkeypatch):
+    def slow_record(results):
+        time.sleep(0.3)  # a slow incident transaction
+        return []
+
+    monkeypatch.setattr(worker, "record_results", slow_record)
+
+    async def drive():
+        ticks = 0
+
+        async def other_probes():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(other_probes())
+        await worker.run_batch(NoProbes(), Scheduler(), [], asyncio.Event())
+        task.cancel()
+        return ticks
+
+    assert asyncio.run(drive()) >= 10  # the loop kept running while the batch was recorded
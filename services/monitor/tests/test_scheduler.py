@@ -0,0 +1,84 @@
+# services/monitor/tests/test_scheduler.py
+import time
+from collections import namedtuple
+
+import scheduler
+from probe import MonitorSpec
+from scheduler import Scheduler, adaptive_interval
+from state import Transition
+
+Res = namedtuple("Res", "ok")
+
+
+def spec(i, interval=60):
+    return MonitorSpec(id=i, url="http://x", method="GET", interval_sec=interval, expected_statuses=(200,))
+
+
+def test_adaptive_interval_speeds_up_while_confirming_and_backs_off_while_down(monkeypatch):
+    monkeypatch.setattr(scheduler, "ADAPTIVE_FAST_SEC", 10)
+    monkeypatch.setattr(scheduler, "ADAPTIVE_BACKOFF_AFTER", 10)
+    monkeypatch.setattr(scheduler, "ADAPTIVE_BACKOFF_MAX", 8)
+    assert adaptive_interval(60, ok=True, fails=0, incident_open=False) == 60
+    assert adaptive_interval(60, ok=False, fails=1, incident_open=False) == 10  # suspect
+    assert adaptive_interval(5, ok=False, fails=1, incident_open=False) == 5   # never slower than configured
+    assert adaptive_interval(60, ok=True, fails=0, incident_open=True) == 10   # recovering
+    down = [adaptive_interval(60, ok=False, fails=f, incident_open=True) for f in (3, 10, 20, 30, 40, 500)]
+    assert down == [60, 120, 240, 480, 480, 480]
+
+
+def test_next_intervals_only_lists_monitors_off_their_configured_interval(worker):
+    due = [(spec(1), 0), (spec(2), 0), (spec(3), 0), (spec(4), 0)]
+    results = [Res(True), Res(False), Res(False), Res(True)]
+    transitions = [
+        Transition("", None, 0, 5),           # healthy
+        Transition("", None, 1, 0),           # suspect
+        Transition("open", None, 3, 0),       # down: normal interval until the backoff starts
+        Transition("resolve", "9", 0, 2),     # just resolved: back to normal
+    ]
+    out = worker.next_intervals(due, results, transitions)
+    assert out == {2: min(60, scheduler.ADAPTIVE_FAST_SEC)}
+
+
+def test_reschedule_honours_an_interval_override():
+    sched = Scheduler(jitter=0)
+    sched.sync({1: spec(1)})
+    (popped,) = sched.pop_due(now=1e9)
+    sched.reschedule(1, popped[1], now=popped[1], interval=10)
+    assert sched.next_due() == popped[1] + 10
+
+
+def test_due_monitors_pop_in_deadline_order_and_stay_out_while_in_flight():
+    sched = Scheduler(jitter=0)
+    sched.sync({i: spec(i, interval=10 * i) for i in (1, 2, 3)})
+    first = sched.pop_due(now=1e9)
+    assert [d for _, d in first] == sorted(d for _, d in first)
+    assert sched.pop_due(now=1e9) == []  # in flight until rescheduled
+    assert sched.drift_stats()["in_flight"] == 3
+
+
+def test_reschedule_keeps_the_cadence_and_never_bursts_to_catch_up():
+    sched = Scheduler(jitter=0)
+    sched.sync({1: spec(1, interval=60)})
+    (s, due), = sched.pop_due(now=1e9)
+    sched.reschedule(1, due, now=due + 0.5)  # a probe that took 0.5 s doesn't shift the next deadline
+    assert sched.next_due() == due + 60
+    (s, due), = sched.pop_due(now=due + 60)
+    sched.reschedule(1, due, now=due + 500)  # far behind: restart from now, not a run of overdue checks
+    assert sched.next_due() == due + 500
+
+
+def test_sync_adds_spreads_updates_and_removes_lazily():
+    sched = Scheduler(jitter=0)
+    now = time.monotonic()
+    assert sched.sync({i: spec(i, interval=60) for i in range(100)}) == (100, 0)
+    dues = [sched._due[i] - now for i in range(100)]
+    assert 0 <= min(dues) and max(dues) <= 60.1 and max(dues) - min(dues) > 30  # spread, not all at once
+
+    assert sched.sync({i: spec(i, interval=60) for i in range(50)}) == (0, 50)
+    assert len(sched.pop_due(now=now + 61)) == 50  # stale heap entries are skipped
+
+    sched = Scheduler(jitter=0)
+    sched.sync({1: spec(1, interval=3600)})
+    sched.sync({1: spec(1, interval=15)}, only={1})
+    assert sched.next_due() <= time.monotonic() + 15  # a shorter interval takes effect right away
+    assert sched.sync({}, only={2}) == (0, 0) and len(sched) == 1
@@ -0,0 +1,87 @@
+# services/monitor/tests/test_sharding.py
+import time
+
+import sharding
+from sharding import ShardLeases, KEY_SHARD
+
+N = 16
+
+
+def leases(fake_redis, name):
+    return ShardLeases(fake_redis, worker_id=name, num_shards=N)
+
+
+def test_a_lone_worker_owns_every_shard(fake_redis):
+    a = leases(fake_redis, "a")
+    assert a.heartbeat()
+    assert a.owned == set(range(N))
+    assert not a.heartbeat()  # renewing changes nothing
+
+
+def test_owners_stay_disjoint_while_a_worker_joins(fake_redis):
+    a, b = leases(fake_redis, "a"), leases(fake_redis, "b")
+    a.heartbeat()
+    b.heartbeat()  # b wants some shards, but a still holds their leases
+    assert not (a.owned & b.owned)
+    a.heartbeat()  # a releases what b now prefers...
+    assert not (a.owned & b.owned)
+    b.heartbeat()  # ...and b claims it
+    assert not (a.owned & b.owned)
+    assert a.owned | b.owned == set(range(N))
+    assert a.owned and b.owned
+
+
+def test_rendezvous_only_moves_shards_to_the_new_worker():
+    ring = ShardLeases.__new__(ShardLeases)
+    ring.num_shards = 256
+    before, after = {}, {}
+    for w in ("a", "b", "c"):
+        ring.worker_id = w
+        before[w] = ring.wanted(["a", "b", "c"])
+        after[w] = ring.wanted(["a", "b", "c", "d"])
+    for w in ("a", "b", "c"):
+        assert after[w] <= before[w]  # nobody gains shards from anyone but...
+    ring.worker_id = "d"
+    moved = ring.wanted(["a", "b", "c", "d"])
+    assert moved == set().union(*before.values()) - set().union(*after.values())  # ...the newcomer
+    assert 32 < len(moved) < 96  # roughly a quarter
+
+
+def test_shards_fail_over_once_the_dead_workers_leases_lapse(fake_redis, monkeypatch):
+    monkeypatch.setattr(sharding, "SHARD_LEASE_TTL_SEC", 0.2)
+    a, b = leases(fake_redis, "a"), leases(fake_redis, "b")
+    for w in (a, b, a, b):
+        w.heartbeat()
+    assert a.owned and b.owned
+    time.sleep(0.3)  # a stops heartbeating; its zset entry and leases expire
+    b.heartbeat()
+    assert b.owned == set(range(N))
+
+
+def test_a_lease_taken_over_elsewhere_is_not_renewed(fake_redis):
+    a = leases(fake_redis, "a")
+    a.heartbeat()
+    fake_redis.set(KEY_SHARD + "3", "z")  # e.g. a's lease lapsed during a long pause
+    assert a.heartbeat()
+    assert 3 not in a.owned
+    assert fake_redis.get(KEY_SHARD + "3") == b"z"
+
+
+def test_release_all_frees_shards_for_the_others(fake_redis):
+    a, b = leases(fake_redis, "a"), leases(fake_redis, "b")
+    for w in (a, b, a, b):
+        w.heartbeat()
+    a.release_all()
+    assert a.owned == set()
+    b.heartbeat()
+    assert b.owned == set(range(N))
+
+
+def test_a_lapsed_lease_nobody_took_is_kept(fake_redis, monkeypatch):
+    monkeypatch.setattr(sharding, "SHARD_LEASE_TTL_SEC", 0.2)
+    a = leases(fake_redis, "a")
+    a.heartbeat()
+    time.sleep(0.3)  # e.g. a long GC or event-loop stall
+    assert not a.heartbeat()
+    assert a.owned == set(range(N))
+    assert fake_redis.get(KEY_SHARD + "0") == b"a"
@@ -0,0 +1,51 @@
+# services/monitor/tests/test_state.py
+from collections import namedtuple
+
+from state import StateMachine, KEY_INCIDENT_OPEN, PENDING
+
+Result = namedtuple("Result", "monitor_id ok")
+
+
+def actions(transitions):
+    return [t.action for t in transitions]
+
+
+def test_incident_opens_once_at_the_fail_threshold(fake_redis):
+    sm = StateMachine(fake_redis, fail_threshold=3, recover_threshold=2)
+    ts = sm.apply([Result(1, False)] * 5)  # one pipeline, applied in order
+    assert actions(ts) == ["", "", "open", "", ""]
+    assert [t.fails for t in ts] == [1, 2, 3, 4, 5]
+    assert ts[3].incident_ref == PENDING  # later fails see the claimed incident
+    assert fake_redis.get(KEY_INCIDENT_OPEN + "1") == PENDING.encode()
+
+
+def test_a_pass_resets_the_fail_count(fake_redis):
+    sm = StateMachine(fake_redis, fail_threshold=3, recover_threshold=2)
+    ts = sm.apply([Result(1, False), Result(1, False), Result(1, True), Result(1, False), Result(1, False)])
+    assert actions(ts) == [""] * 5
+    assert ts[-1].fails == 2
+
+
+def test_incident_resolves_at_the_recover_threshold_with_its_id(fake_redis):
+    sm = StateMachine(fake_redis, fail_threshold=1, recover_threshold=2)
+    assert actions(sm.apply([Result(1, False)])) == ["open"]
+    fake_redis.set(KEY_INCIDENT_OPEN + "1", "42")  # the worker stores the real id once the row exists
+    ts = sm.apply([Result(1, True), Result(1, False), Result(1, True), Result(1, True), Result(1, True)])
+    assert actions(ts) == ["", "", "", "resolve", ""]
+    assert ts[3].incident_ref == "42"
+    assert ts[4].incident_ref is None
+    assert fake_redis.get(KEY_INCIDENT_OPEN + "1") is None
+
+
+def test_monitors_are_counted_independently(fake_redis):
+    sm = StateMachine(fake_redis, fail_threshold=2, recover_threshold=1)
+    ts = sm.apply([Result(1, False), Result(2, False), Result(1, False), Result(2, True)])
+    assert actions(ts) == ["", "", "open", ""]
+
+
+def test_only_one_of_two_workers_claims_the_transition(fake_redis):
+    a = StateMachine(fake_redis, fail_threshold=2, recover_threshold=1)
+    b = StateMachine(fake_redis, fail_threshold=2, recover_threshold=1)
+    a.apply([Result(1, False)])
+    assert actions(b.apply([Result(1, False)]) + a.apply([Result(1, False)])) == ["open", ""]
+    assert actions(a.apply([Result(1, True)]) + b.apply([Result(1, True)])) == ["resolve", ""]
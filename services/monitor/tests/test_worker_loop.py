@@ -0,0 +1,40 @@
+# services/monitor/tests/test_worker_loop.py
+import json, asyncio
+
+
+class NullClient:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+
+def test_main_loop_reloads_changed_monitors(worker, fake_redis, monkeypatch):
+    calls = []
+
+    def load_specs(shards, ids=None):
+        calls.append(ids)
+        return {}
+
+    async def maintain():
+        pass
+
+    monkeypatch.setattr(worker, "ensure_tables_once", lambda: None)
+    monkeypatch.setattr(worker, "load_specs", load_specs)
+    monkeypatch.setattr(worker, "make_client", NullClient)
+    monkeypatch.setattr(worker, "maintain", maintain)
+    monkeypatch.setattr(worker.incidents, "reconcile", lambda *a: (0, 0))
+
+    async def drive():
+        stop = asyncio.Event()
+        task = asyncio.create_task(worker.main(stop=stop))
+        await asyncio.sleep(0.5)  # first iteration: heartbeat claims shards, full refresh
+        fake_redis.publish(worker.MONITORS_CHANNEL, json.dumps({"ids": [1, 2]}))
+        await asyncio.sleep(0.5)
+        stop.set()
+        await asyncio.wait_for(task, 5)
+
+    asyncio.run(drive())
+    assert None in calls  # full refresh
+    assert {1, 2} in calls  # just the changed monitors
@@ -0,0 +1,88 @@
+# services/monitor/tests/test_writer.py
+from collections import namedtuple
+from datetime import datetime, timezone
+
+import pytest
+
+from writer import CheckBuffer
+
+Result = namedtuple("Result", "monitor_id ts status_code latency_ms ok error_reason "
+                              "dns_ms connect_ms tls_ms ttfb_ms transfer_ms")
+
+
+def result(i: int) -> Result:
+    return Result(i, datetime.now(timezone.utc), 200, 10 + i, True, None, None, None, None, 5, 1)
+
+
+class FakeSession:
+    fail = False
+    written = []
+
+    def execute(self, stmt, rows=None):
+        if FakeSession.fail:
+            raise RuntimeError("db down")
+        if rows is not None:
+            FakeSession.written.extend(r["monitor_id"] for r in rows)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def session():
+    FakeSession.fail = False
+    FakeSession.written = []
+    return FakeSession
+
+
+def test_full_buffer_drops_oldest_rows(session):
+    buf = CheckBuffer(session, max_rows=3)
+    for i in range(5):
+        buf.add(result(i))
+    assert len(buf) == 3
+    assert buf.dropped == 2
+    assert [r["monitor_id"] for r in buf.take()] == [2, 3, 4]
+    assert buf.dropped == 0  # reported (and reset) by take
+
+
+def test_failed_flush_keeps_rows_for_retry(session):
+    buf = CheckBuffer(session, batch_size=1, flush_sec=60)
+    for i in range(3):
+        buf.add(result(i))
+    session.fail = True
+    with pytest.raises(RuntimeError):
+        buf.flush()
+    assert len(buf) == 3
+    assert not buf.due()  # backs off for one interval instead of retrying on every wakeup
+
+    buf.add(result(3))
+    buf.retry_at = 0.0
+    session.fail = False
+    assert buf.flush() == 4
+    assert session.written == [0, 1, 2, 3]  # the retried rows first, in order
+    assert len(buf) == 0
+
+
+def test_restore_respects_the_bound(session):
+    buf = CheckBuffer(session, max_rows=3)
+    buf.add(result(0))
+    buf.add(result(1))
+    batch = buf.take()
+    buf.add(result(2))
+    buf.add(result(3))
+    buf.restore(batch)
+    assert [r["monitor_id"] for r in buf.rows] == [1, 2, 3]
+    assert buf.dropped == 1
+
+
+def test_rows_added_during_a_write_stay_out_of_the_batch(session):
+    buf = CheckBuffer(session)
+    buf.add(result(0))
+    batch = buf.take()
+    buf.add(result(1))  # e.g. from another thread while `batch` is being written
+    assert [r["monitor_id"] for r in batch] == [0]
+    assert buf.write(batch) == 1
+    assert [r["monitor_id"] for r in buf.rows] == [1]
@@ -0,0 +1,108 @@
+# services/monitor/timing.py
+import time, socket, asyncio
+from contextvars import ContextVar
+
+import httpcore
+
+# Same order as models.PHASES (rollups store per-phase sums/counts as arrays);
+# repeated here so the probe engine doesn't import the DB layer.
+PHASES = ("dns", "connect", "tls", "ttfb", "transfer")
+
+# Phase durations (ms) of the request running in the current task. httpcore
+# opens connections in the requesting task, so the network backend and the
+# trace hook below both see the dict installed by `start()`.
+_current: ContextVar[dict] = ContextVar("probe_phases")
+_marks: ContextVar[dict] = ContextVar("probe_marks")
+
+
+def start() -> dict:
+    """Begin timing a request in this task; returns the dict that will hold its phases."""
+    phases = {}
+    _current.set(phases)
+    _marks.set({})
+    return phases
+
+
+def _record(phase: str, started: float):
+    phases = _current.get(None)
+    if phases is not None:
+        phases[phase] = int((time.perf_counter() - started) * 1000)
+
+
+class TimedBackend(httpcore.AsyncNetworkBackend):
+    """Wraps httpcore's backend to time DNS resolution apart from the TCP connect.
+
+    The default backend resolves inside connect_tcp, so the two can't be
+    told apart from trace events alone. Here the name is resolved first and
+    each address is tried in order.
+    """
+
+    def __init__(self, inner: httpcore.AsyncNetworkBackend):
+        self.inner = inner
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        t0 = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        try:
+            infos = await asyncio.wait_for(loop.getaddrinfo(host, port, type=socket.SOCK_STREAM), timeout)
+        except asyncio.TimeoutError:
+            raise httpcore.ConnectTimeout(f"DNS lookup for {host} timed out")
+        except socket.gaierror as e:
+            raise httpcore.ConnectError(f"DNS lookup for {host} failed: {e}")
+        _record("dns", t0)
+
+        t1 = time.perf_counter()
+        last = None
+        for *_, addr in infos:
+            try:
+                stream = await self.inner.connect_tcp(addr[0], port, timeout=timeout, local_address=local_address,
+                                                      socket_options=socket_options)
+                _record("connect", t1)
+                return stream
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                last = e
+        raise last
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return await self.inner.connect_unix_socket(path, timeout=timeout, socket_options=socket_options)
+
+    async def sleep(self, seconds):
+        await self.inner.sleep(seconds)
+
+
+# trace event prefix -> phase; http11.* and http2.* events share the suffixes
+_TRACED = {
+    "connection.start_tls": "tls",
+    "receive_response_body": "transfer",
+}
+
+
+async def trace(event: str, info: dict):
+    """httpx "trace" extension hook: TLS handshake, time to first byte and body transfer."""
+    marks = _marks.get(None)
+    if marks is None:
+        return
+    name, _, stage = event.rpartition(".")
+    if name.startswith(("http11.", "http2.")):
+        name = name.split(".", 1)[1]
+    if name == "send_request_headers" and stage == "started":
+        marks["ttfb"] = time.perf_counter()
+    elif name == "receive_response_headers" and stage == "complete" and "ttfb" in marks:
+        _record("ttfb", marks.pop("ttfb"))
+    elif name in _TRACED:
+        if stage == "started":
+            marks[name] = time.perf_counter()
+        elif stage == "complete" and name in marks:
+            _record(_TRACED[name], marks.pop(name))
+
+
+def install(client) -> None:
+    """Route `client`'s connections through TimedBackend.
+
+    httpx 0.27 doesn't expose the network backend, so this swaps it on the
+    transport's httpcore pool; a transport without one is left alone and
+    simply reports no DNS/connect split.
+    """
+    pool = getattr(client._transport, "_pool", None)
+    if pool is not None and hasattr(pool, "_network_backend"):
+        pool._network_backend = TimedBackend(pool._network_backend)
@@ -1,23 +1,43 @@
 # services/monitor/worker.py
-import os, time, json
-import httpx
+import os, time, json, asyncio, signal, threading
 import redis
 from datetime import datetime, timezone
-from sqlalchemy import select
+from sqlalchemy import select, text
 from sqlalchemy.exc import ProgrammingError, OperationalError
 
 from db import SessionLocal, engine, Base
-from models import Monitor, Check, Incident
+from models import Monitor, PHASES
+from probe import MonitorSpec, make_client, TIMEOUT_MS
+from procpool import ProbePool, PROBE_PROCS
+from scheduler import Scheduler, ADAPTIVE_INTERVALS, adaptive_interval
+from sharding import ShardLeases, NUM_SHARDS, SHARD_HEARTBEAT_SEC, WORKER_ID
+from writer import CheckBuffer
+from state import StateMachine, KEY_INCIDENT_OPEN, PENDING
+import partitions
+import incidents
+import metrics
+from metrics import timed
 
 DB = os.getenv("DATABASE_URL")
 REDIS_URL = os.getenv("REDIS_URL") or "redis://redis:6379/0"
 FAIL_THRESHOLD = int(os.getenv("FAIL_THRESHOLD", 3))
 RECOVER_THRESHOLD = int(os.getenv("RECOVER_THRESHOLD", 2))
 DEFAULT_INTERVAL = int(os.getenv("DEFAULT_INTERVAL_SEC", 60))
-TIMEOUT_MS = int(os.getenv("CHECK_TIMEOUT_MS", 5000))
+MONITOR_REFRESH_SEC = int(os.getenv("MONITOR_REFRESH_SEC", 30))
+SCHED_STATS_SEC = int(os.getenv("SCHED_STATS_SEC", 60))
+MAINTENANCE_SEC = int(os.getenv("MAINTENANCE_SEC", 3600))
 
-KEY_FAILS = "fails:"
-KEY_PASSES = "passes:"
+# Consumed by the notifier's consumer group (services/notifier/alertqueue.py).
+ALERTS_STREAM = os.getenv("ALERTS_STREAM", "alerts:stream")
+ALERTS_STREAM_MAXLEN = int(os.getenv("ALERTS_STREAM_MAXLEN", 100000))
+
+# The API's response cache (services/api/app/cache.py) drops entries when this generation changes.
+KEY_CACHE_GEN = "respcache:gen"
+CACHE_INVALIDATE_CHANNEL = "cache:invalidate"
+# Live check results and incident transitions, fanned out by the API's /public/stream.
+EVENTS_CHANNEL = os.getenv("EVENTS_CHANNEL", "events")
+# Published by the API when monitors are created or updated: {"ids": [...]}.
+MONITORS_CHANNEL = os.getenv("MONITORS_CHANNEL", "monitors:changed")
 
 def wait_for_redis(url: str, attempts=60, delay=1):
     last = None
@@ -34,107 +54,412 @@ def wait_for_redis(url: str, attempts=60, delay=1):
     raise RuntimeError(f"Redis never became ready: {last}")
 
 r = wait_for_redis(REDIS_URL)
+checks = CheckBuffer(SessionLocal)
+state = StateMachine(r, FAIL_THRESHOLD, RECOVER_THRESHOLD)
 
 def Session():
     return SessionLocal()
 
+# Columns added after the first release; create_all only creates missing tables.
+ADD_COLUMNS = (
+    "ALTER TABLE monitors ADD COLUMN IF NOT EXISTS latency_mode VARCHAR DEFAULT 'warm'",
+    *(f"ALTER TABLE checks ADD COLUMN IF NOT EXISTS {p}_ms INTEGER" for p in PHASES),
+    *(f"ALTER TABLE {t} ADD COLUMN IF NOT EXISTS {c} {typ}[] NOT NULL DEFAULT '{{0,0,0,0,0}}'"
+      for t in ("check_rollups_1m", "check_rollups_1h")
+      for c, typ in (("phase_sum", "BIGINT"), ("phase_n", "INTEGER"))),
+    *(f"ALTER TABLE {t} ADD COLUMN IF NOT EXISTS latency_sketch JSONB NOT NULL DEFAULT '{{}}'"
+      for t in ("check_rollups_1m", "check_rollups_1h")),
+)
+
+# Natural key for the API's POST /monitors:batch. Existing duplicate (name, url) pairs
+# are left for an operator to sort out; until then the index is skipped with a warning.
+UPGRADE_MONITORS = (
+    "DO $$ BEGIN "
+    "IF NOT EXISTS (SELECT 1 FROM monitors GROUP BY name, url HAVING count(*) > 1) THEN "
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_monitors_name_url ON monitors (name, url); "
+    "ELSE RAISE WARNING 'monitors has duplicate (name, url) pairs; uq_monitors_name_url not created'; "
+    "END IF; END $$",
+)
+
 def ensure_tables_once():
-    """Create tables if they don’t exist. Safe to call multiple times."""
+    """Create tables (and today's checks partitions) if they don’t exist. Safe to call multiple times.
+
+    This is the one place existing tables are upgraded; the API only creates missing ones.
+    """
     Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for stmt in (*ADD_COLUMNS, *incidents.UPGRADE_INCIDENTS, *UPGRADE_MONITORS):
+            conn.execute(text(stmt))
+        if partitions.is_partitioned(conn):
+            partitions.ensure_partitions(conn)
+
+async def maintain():
+    """Partition/retention job; the Redis lock makes one replica per period run it."""
+    if not r.set("maintenance:lock", WORKER_ID, nx=True, ex=max(1, MAINTENANCE_SEC // 2)):
+        return
+    try:
+        await asyncio.to_thread(partitions.run_maintenance, engine)
+    except Exception as e:
+        print(f"[monitor] Maintenance failed: {e!r}")
+
+def enqueue_alert(event: dict, pipe=None):
+    """Append incident/recovery events to the alerts stream (optionally on a pipeline)."""
+    (pipe or r).xadd(ALERTS_STREAM, {"data": json.dumps(event)}, maxlen=ALERTS_STREAM_MAXLEN, approximate=True)
 
-def enqueue_alert(event: dict):
-    """Push incident/recovery events to Redis queue."""
-    r.lpush("alerts", json.dumps(event))
+def publish_event(event: dict, pipe=None):
+    """Publish a live event for SSE clients (optionally on a pipeline)."""
+    (pipe or r).publish(EVENTS_CHANNEL, json.dumps(event, default=str))
 
-def tick_once():
+def load_specs(shards: set, ids=None) -> dict:
+    """Enabled monitors in `shards` (and `ids`, if given) as {id: MonitorSpec}; one narrow query, no ORM objects kept around."""
+    if not shards:
+        return {}
     s = Session()
     try:
-        mons = s.scalars(select(Monitor).where(Monitor.is_enabled == True)).all()
-        now_ts = int(time.time())
-        for m in mons:
-            last_ts_key = f"last:{m.id}"
-            last = r.get(last_ts_key)
-            if last and now_ts - int(last) < (m.interval_sec or DEFAULT_INTERVAL):
-                continue
-            r.set(last_ts_key, str(now_ts))
-
-            try:
-                start = time.perf_counter()
-                resp = httpx.request(m.method, m.url, timeout=TIMEOUT_MS/1000)
-                latency = int((time.perf_counter() - start) * 1000)
-                ok = resp.status_code in (m.expected_statuses or [200])
-                status_code = resp.status_code
-                err = None
-            except Exception as e:
-                latency = None
-                ok = False
-                status_code = None
-                err = str(e)[:500]
-
-            c = Check(
-                monitor_id=m.id,
-                ts=datetime.now(timezone.utc),
-                status_code=status_code,
-                latency_ms=latency,
-                ok=ok,
-                error_reason=err
-            )
-            s.add(c)
-            s.commit()
-
-            if ok:
-                r.delete(KEY_FAILS + str(m.id))
-                passes = r.incr(KEY_PASSES + str(m.id))
-                open_key = f"incident_open:{m.id}"
-                if r.get(open_key) and passes >= RECOVER_THRESHOLD:
-                    inc_id = int(r.get(open_key))
-                    inc = s.get(Incident, inc_id)
-                    if inc and inc.state == "open":
-                        inc.state = "resolved"
-                        inc.closed_at = datetime.now(timezone.utc)
-                        s.commit()
-                        enqueue_alert({"type": "recovered", "monitor_id": m.id, "incident_id": inc_id})
-                    r.delete(open_key)
-            else:
-                r.delete(KEY_PASSES + str(m.id))
-                fails = r.incr(KEY_FAILS + str(m.id))
-                if fails >= FAIL_THRESHOLD:
-                    open_key = f"incident_open:{m.id}"
-                    if not r.get(open_key):
-                        inc = Incident(
-                            monitor_id=m.id,
-                            reason=err or (f"HTTP {status_code}" if status_code else "network error")
-                        )
-                        s.add(inc)
-                        s.commit()
-                        s.refresh(inc)
-                        r.set(open_key, str(inc.id))
-                        enqueue_alert({
-                            "type": "incident",
-                            "monitor_id": m.id,
-                            "incident_id": inc.id,
-                            "reason": inc.reason
-                        })
+        q = (
+            select(Monitor.id, Monitor.url, Monitor.method, Monitor.interval_sec, Monitor.expected_statuses,
+                   Monitor.latency_mode, Monitor.timeout_ms)
+            .where(Monitor.is_enabled == True, (Monitor.id % NUM_SHARDS).in_(shards))
+        )
+        if ids is not None:
+            q = q.where(Monitor.id.in_(ids))
+        with timed(metrics.DB_SECONDS, "load_specs"):
+            rows = s.execute(q).all()
     finally:
         s.close()
+    return {
+        row.id: MonitorSpec(
+            id=row.id,
+            url=row.url,
+            method=row.method or "GET",
+            interval_sec=row.interval_sec or DEFAULT_INTERVAL,
+            expected_statuses=tuple(row.expected_statuses or [200]),
+            latency_mode=row.latency_mode or "warm",
+            timeout_ms=row.timeout_ms or TIMEOUT_MS,
+        )
+        for row in rows
+    }
 
+def record_results(results):
+    """Buffer probe results as Checks and apply incident transitions.
 
-if __name__ == "__main__":
+    Counters for the whole batch are updated in one Redis round trip (see
+    state.py); the resulting opens/resolves are committed together, then
+    incident ids, alerts and live events go out in a second pipeline.
+    Returns the transitions, in the order of `results`.
+    """
+    dropped = checks.dropped
+    for res in results:
+        checks.add(res)
+    metrics.DROPPED.inc(checks.dropped - dropped)
+    metrics.BUFFERED.set(len(checks))
+    metrics.observe_results(results)
+    with timed(metrics.REDIS_SECONDS, "state_apply"):
+        transitions = state.apply(results)
+
+    pipe = r.pipeline(transaction=False)
+    publish_event({"type": "checks", "checks": [
+        {"monitor_id": res.monitor_id, "ts": res.ts.isoformat(), "ok": res.ok,
+         "status_code": res.status_code, "latency_ms": res.latency_ms}
+        for res in results
+    ]}, pipe)
+
+    opened = [(res, t) for res, t in zip(results, transitions) if t.action == "open"]
+    resolving = [(res, t) for res, t in zip(results, transitions) if t.action == "resolve"]
+    if not opened and not resolving:
+        with timed(metrics.REDIS_SECONDS, "pipeline"):
+            pipe.execute()
+        return transitions
+
+    s = Session()
+    started = time.perf_counter()
+    try:
+        created, adopted = incidents.open_many(s, [
+            {"monitor_id": res.monitor_id,
+             "reason": res.error_reason or (f"HTTP {res.status_code}" if res.status_code else "network error")}
+            for res, _ in opened
+        ])
+        # the opener died before recording the id; resolve by monitor instead
+        resolved = incidents.resolve_many(
+            s,
+            [int(t.incident_ref) for _, t in resolving if t.incident_ref != PENDING],
+            [res.monitor_id for res, t in resolving if t.incident_ref == PENDING],
+            datetime.now(timezone.utc),
+        )
+        incidents.bump_stats(s, created, resolved)
+        s.commit()
+    except Exception:
+        # Undo the Redis side of the transitions so the next check retries them:
+        # give the open claims back, and put back the incident_open keys the
+        # resolves consumed (the incidents are still open in Postgres). nx: a
+        # claim made since then wins.
+        undo = r.pipeline(transaction=False)
+        if opened:
+            undo.delete(*(KEY_INCIDENT_OPEN + str(res.monitor_id) for res, _ in opened))
+        for res, t in resolving:
+            undo.set(KEY_INCIDENT_OPEN + str(res.monitor_id), t.incident_ref, nx=True)
+        undo.execute()
+        raise
+    finally:
+        s.close()
+        metrics.DB_SECONDS.labels("incidents").observe(time.perf_counter() - started)
+    metrics.INCIDENTS.labels("opened").inc(len(created))
+    metrics.INCIDENTS.labels("resolved").inc(len(resolved))
+
+    opened_events = [
+        {"type": "incident", "monitor_id": row.monitor_id, "incident_id": row.id, "reason": row.reason}
+        for row in created
+    ]
+    for ev in opened_events:
+        # xx: a resolve may already have consumed the pending claim
+        pipe.set(KEY_INCIDENT_OPEN + str(ev["monitor_id"]), str(ev["incident_id"]), xx=True)
+        enqueue_alert(ev, pipe)
+        publish_event({**ev, "type": "incident_opened"}, pipe)
+    for inc_id, mid in adopted:
+        pipe.set(KEY_INCIDENT_OPEN + str(mid), str(inc_id), xx=True)
+    for inc_id, mid, *_ in resolved:
+        enqueue_alert({"type": "recovered", "monitor_id": mid, "incident_id": inc_id}, pipe)
+        publish_event({"type": "incident_resolved", "monitor_id": mid, "incident_id": inc_id}, pipe)
+    if opened_events or resolved:
+        pipe.incr(KEY_CACHE_GEN)
+        pipe.publish(CACHE_INVALIDATE_CHANNEL, "1")
+    with timed(metrics.REDIS_SECONDS, "pipeline"):
+        pipe.execute()
+    return transitions
+
+
+def next_intervals(due: list, results, transitions) -> dict:
+    """{monitor_id: seconds} for monitors whose next check should come sooner or later than their interval."""
+    out = {}
+    for (spec, _), res, t in zip(due, results, transitions):
+        incident_open = t.action == "open" or (t.incident_ref is not None and t.action != "resolve")
+        interval = adaptive_interval(spec.interval_sec, res.ok, t.fails, incident_open)
+        if interval != spec.interval_sec:
+            out[spec.id] = interval
+            metrics.ADAPTIVE.labels("fast" if interval < spec.interval_sec else "backoff").inc()
+    return out
+
+
+async def flush_checks():
+    """Write the buffered checks from a thread, so probes in flight keep running meanwhile."""
+    batch = checks.take()
+    if batch:
+        try:
+            with timed(metrics.DB_SECONDS, "flush"):
+                await asyncio.to_thread(checks.write, batch)
+        except Exception as e:
+            checks.restore(batch)
+            print(f"[monitor] DB error while flushing {len(batch)} buffered check(s): {e}")
+    metrics.BUFFERED.set(len(checks))
+
+async def check_flusher(stop: asyncio.Event, kick: asyncio.Event):
+    """The one task that flushes the check buffer: when its deadline passes, or when `kick` says a batch filled it."""
+    while not stop.is_set():
+        deadline = checks.deadline()
+        timeout = checks.flush_sec if deadline is None else max(0.0, deadline - time.monotonic())
+        try:
+            await asyncio.wait_for(kick.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        kick.clear()
+        if checks.due():
+            await flush_checks()
+
+async def run_batch(client, sched: Scheduler, due: list, flush_kick: asyncio.Event):
+    started = time.perf_counter()
+    metrics.IN_FLIGHT.inc(len(due))
+    intervals = {}
+    try:
+        results = await client.probe_many([spec for spec, _ in due])
+        # Redis round trips and the incident transaction run off the loop, so probes in flight aren't stalled
+        transitions = await asyncio.to_thread(record_results, results)
+        if ADAPTIVE_INTERVALS:
+            intervals = next_intervals(due, results, transitions)
+        if checks.due():
+            flush_kick.set()
+    except (ProgrammingError, OperationalError) as e:
+        print(f"[monitor] DB error while recording checks: {e}")
+        await asyncio.to_thread(ensure_tables_once)
+    except Exception as e:
+        print(f"[monitor] Batch failed: {e!r}")
+    finally:
+        metrics.IN_FLIGHT.dec(len(due))
+        metrics.BATCH_SECONDS.observe(time.perf_counter() - started)
+        now = time.monotonic()
+        for spec, deadline in due:
+            sched.reschedule(spec.id, deadline, now, intervals.get(spec.id))
+
+def watch_monitor_changes(loop, on_change):
+    """Background thread: hands ids published on MONITORS_CHANNEL to `on_change` on the event loop.
+
+    `on_change(None)` asks for a full refresh: after (re)subscribing, since
+    changes may have been missed meanwhile, and for unreadable messages.
+    """
+    while True:
+        try:
+            ps = r.pubsub(ignore_subscribe_messages=True)
+            ps.subscribe(MONITORS_CHANNEL)
+            loop.call_soon_threadsafe(on_change, None)
+            for msg in ps.listen():
+                try:
+                    ids = [int(i) for i in json.loads(msg["data"])["ids"]]
+                except (ValueError, KeyError, TypeError):
+                    ids = None
+                loop.call_soon_threadsafe(on_change, ids)
+        except redis.RedisError as e:
+            print(f"[monitor] Monitor change subscription error ({e}); reconnecting...")
+            time.sleep(2)
+        except RuntimeError:
+            return  # event loop closed: shutting down
+
+async def main(pool: ProbePool = None, stop: asyncio.Event = None):
+    """Run the worker until SIGTERM/SIGINT, or until `stop` is set (for embedding and tests)."""
     # Be resilient if DB is still coming up or tables don’t exist yet
     for _ in range(30):
         try:
-            ensure_tables_once()
+            await asyncio.to_thread(ensure_tables_once)
             print("[monitor] Tables ensured.")
             break
         except (ProgrammingError, OperationalError) as e:
             print(f"[monitor] Waiting for DB tables ({e})...")
-            time.sleep(2)
+            await asyncio.sleep(2)
 
-    print("[monitor] Starting monitor loop...")
-    while True:
-        try:
-            tick_once()
-        except (ProgrammingError, OperationalError) as e:
-            print(f"[monitor] DB error during tick: {e}")
-            ensure_tables_once()
-        time.sleep(1)
+    metrics.serve()
+    print(f"[monitor] Starting monitor loop as {WORKER_ID}...")
+    if stop is None:
+        stop = asyncio.Event()
+    wakeup = asyncio.Event()  # stop, or monitors changed
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    flush_kick = asyncio.Event()
+    flusher = asyncio.create_task(check_flusher(stop, flush_kick))
+
+    async def relay_stop():
+        await stop.wait()
+        wakeup.set()
+        flush_kick.set()
+    stopper = asyncio.create_task(relay_stop())
+
+    pending_ids = set()  # monitors to reload; None in it means reload everything
+
+    def on_change(ids):
+        pending_ids.update(ids if ids is not None else (None,))
+        wakeup.set()
+
+    threading.Thread(target=watch_monitor_changes, args=(loop, on_change), name="monitor-changes", daemon=True).start()
+
+    sched = Scheduler()
+    leases = ShardLeases(r)
+    tasks = set()
+    next_refresh = next_stats = next_heartbeat = next_maintenance = time.monotonic()
+    reconcile_due = True
+    try:
+        # `client` is either the in-process ProbeClient or the multi-process pool
+        async with (pool or make_client()) as client:
+            while not stop.is_set():
+                now = time.monotonic()
+                if now >= next_heartbeat:
+                    try:
+                        with timed(metrics.REDIS_SECONDS, "heartbeat"):
+                            shards_changed = leases.heartbeat()
+                        metrics.OWNED_SHARDS.set(len(leases.owned))
+                        if shards_changed:
+                            print(f"[monitor] Now owning {len(leases.owned)}/{NUM_SHARDS} shards.")
+                            next_refresh = now
+                            reconcile_due = True
+                    except redis.RedisError as e:
+                        print(f"[monitor] Redis error during shard heartbeat: {e}")
+                    next_heartbeat = now + SHARD_HEARTBEAT_SEC
+
+                if pending_ids:
+                    ids = set(pending_ids)
+                    pending_ids.clear()
+                    if None in ids:
+                        next_refresh = now
+                    elif ours := {mid for mid in ids if mid % NUM_SHARDS in leases.owned}:
+                        try:
+                            specs = await asyncio.to_thread(load_specs, set(leases.owned), ours)
+                            added, removed = sched.sync(specs, only=ours)
+                            metrics.SCHEDULED.set(len(sched))
+                            print(f"[monitor] Reloaded {len(ours)} changed monitor(s): +{added} -{removed} ({len(sched)} scheduled)")
+                        except (ProgrammingError, OperationalError) as e:
+                            print(f"[monitor] DB error while reloading changed monitors: {e}")
+                            next_refresh = now
+
+                if now >= next_refresh:
+                    try:
+                        added, removed = sched.sync(await asyncio.to_thread(load_specs, set(leases.owned)))
+                        metrics.SCHEDULED.set(len(sched))
+                        if added or removed:
+                            print(f"[monitor] Monitors: +{added} -{removed} ({len(sched)} scheduled)")
+                    except (ProgrammingError, OperationalError) as e:
+                        print(f"[monitor] DB error while loading monitors: {e}")
+                        await asyncio.to_thread(ensure_tables_once)
+                    # Shards changed hands: Redis may disagree with the DB about what is open.
+                    if reconcile_due:
+                        try:
+                            fixed, cleared = await asyncio.to_thread(
+                                incidents.reconcile, r, Session, set(leases.owned), list(sched.specs))
+                            reconcile_due = False
+                            if fixed or cleared:
+                                print(f"[monitor] Reconciled incident state with the DB: {fixed} set, {cleared} cleared.")
+                        except (ProgrammingError, OperationalError, redis.RedisError) as e:
+                            print(f"[monitor] Could not reconcile incident state: {e}")
+                    next_refresh = now + MONITOR_REFRESH_SEC
+
+                due = sched.pop_due(now)
+                if due:
+                    metrics.BATCH_SIZE.observe(len(due))
+                    for _, deadline in due:
+                        metrics.SCHEDULE_LAG.observe(max(0.0, now - deadline))
+                    task = asyncio.create_task(run_batch(client, sched, due, flush_kick))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+
+                if now >= next_maintenance:
+                    task = asyncio.create_task(maintain())
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                    next_maintenance = now + MAINTENANCE_SEC
+
+                if now >= next_stats:
+                    print(f"[monitor] Scheduler: {sched.drift_stats()}")
+                    if pool is not None:
+                        print("[monitor] Probe children: " + ", ".join(
+                            f"#{c['child']} {c['checks_per_sec']}/s cpu {c['cpu_percent']}%" + ("" if c["alive"] else " (dead)")
+                            for c in pool.child_stats()))
+                        if not pool.alive():
+                            print("[monitor] No probe children left; stopping.")
+                            stop.set()
+                    next_stats = now + SCHED_STATS_SEC
+
+                wake = min(next_refresh, next_stats, next_heartbeat, next_maintenance)
+                t = sched.next_due()
+                if t is not None:
+                    wake = min(wake, t)
+                try:
+                    await asyncio.wait_for(wakeup.wait(), max(0.0, wake - time.monotonic()))
+                except asyncio.TimeoutError:
+                    pass
+                wakeup.clear()
+
+            print("[monitor] Stopping; waiting for in-flight checks...")
+            if tasks:
+                await asyncio.wait(tasks)
+    finally:
+        stopper.cancel()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.remove_signal_handler(sig)
+        stop.set()
+        flush_kick.set()
+        await flusher
+        await flush_checks()
+        # Hand our shards back right away instead of making survivors wait out the lease TTL.
+        leases.release_all()
+
+
+if __name__ == "__main__":
+    # Fork the probe children before the event loop and any threads exist.
+    asyncio.run(main(ProbePool(PROBE_PROCS).start() if PROBE_PROCS else None))
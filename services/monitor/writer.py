@@ -0,0 +1,128 @@
+# services/monitor/writer.py
+import os, time, threading
+from collections import deque
+
+from sqlalchemy import insert
+
+from models import Check
+import rollups
+
+CHECK_BATCH_SIZE = int(os.getenv("CHECK_BATCH_SIZE", 500))
+CHECK_FLUSH_SEC = float(os.getenv("CHECK_FLUSH_SEC", 2))
+CHECK_BUFFER_MAX = int(os.getenv("CHECK_BUFFER_MAX", 50000))
+
+
+class CheckBuffer:
+    """Write-behind buffer for Check rows.
+
+    Rows accumulate in memory and go to Postgres as one multi-row INSERT per
+    flush (SQLAlchemy's insertmanyvalues), so the checks table costs one
+    transaction per batch rather than one per check. The same transaction
+    folds the batch into the minute/hour rollups. A flush is due once
+    `batch_size` rows are waiting or the oldest has waited `flush_sec`.
+
+    Memory is bounded by `max_rows`: if Postgres is unreachable for long
+    enough to fill the buffer, the oldest rows are dropped (and counted)
+    rather than growing without limit. A failed flush keeps its rows for
+    the next attempt.
+
+    Rows are added from the worker's threads and the event loop; the write
+    itself runs in a thread too. `take` swaps in a fresh deque under the
+    lock, so the I/O never shares a container with rows still arriving.
+
+    services/notifier/audit.py keeps a copy of this for Notification rows
+    (the services share no code); change both together.
+    """
+
+    def __init__(self, session_factory, batch_size: int = CHECK_BATCH_SIZE,
+                 flush_sec: float = CHECK_FLUSH_SEC, max_rows: int = CHECK_BUFFER_MAX):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_sec = flush_sec
+        self.rows = deque(maxlen=max_rows)
+        self.oldest_at = None
+        self.retry_at = 0.0
+        self.dropped = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def add(self, res):
+        row = {
+            "monitor_id": res.monitor_id,
+            "ts": res.ts,
+            "status_code": res.status_code,
+            "latency_ms": res.latency_ms,
+            "ok": res.ok,
+            "error_reason": res.error_reason,
+            "dns_ms": res.dns_ms,
+            "connect_ms": res.connect_ms,
+            "tls_ms": res.tls_ms,
+            "ttfb_ms": res.ttfb_ms,
+            "transfer_ms": res.transfer_ms,
+        }
+        with self.lock:
+            if len(self.rows) == self.rows.maxlen:
+                self.dropped += 1
+            self.rows.append(row)
+            if self.oldest_at is None:
+                self.oldest_at = time.monotonic()
+
+    def deadline(self):
+        """Monotonic time by which the buffer should be flushed, or None when empty."""
+        if self.oldest_at is None:
+            return None
+        return max(self.oldest_at + self.flush_sec, self.retry_at)
+
+    def due(self, now: float = None) -> bool:
+        if not self.rows:
+            return False
+        now = time.monotonic() if now is None else now
+        if now < self.retry_at:
+            return False
+        return len(self.rows) >= self.batch_size or now >= self.deadline()
+
+    def take(self) -> list:
+        """Detach everything buffered, for `write`; rows added from now on go to a fresh deque."""
+        with self.lock:
+            batch = list(self.rows)
+            self.rows = deque(maxlen=self.rows.maxlen)
+            self.oldest_at = None
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            print(f"[monitor] Check buffer overflowed; dropped {dropped} check(s).")
+        return batch
+
+    def write(self, batch: list) -> int:
+        """Insert `batch` and fold it into the rollups, in one transaction. Returns the number of rows written."""
+        if not batch:
+            return 0
+        s = self.session_factory()
+        try:
+            s.execute(insert(Check), batch)
+            rollups.apply(s, batch)
+            s.commit()
+        finally:
+            s.close()
+        return len(batch)
+
+    def restore(self, batch: list):
+        """Put a batch that failed to write back in front of newer rows, and back off for one interval."""
+        with self.lock:
+            rows = batch + list(self.rows)
+            overflow = max(0, len(rows) - self.rows.maxlen)
+            self.dropped += overflow  # oldest first, as when appending to a full buffer
+            self.rows = deque(rows[overflow:], maxlen=self.rows.maxlen)
+            if self.rows:
+                self.oldest_at = time.monotonic()
+            self.retry_at = time.monotonic() + self.flush_sec
+
+    def flush(self) -> int:
+        """take + write, restoring the batch if the write fails. Returns the number of rows written."""
+        batch = self.take()
+        try:
+            return self.write(batch)
+        except Exception:
+            self.restore(batch)
+            raise
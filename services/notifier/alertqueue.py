@@ -0,0 +1,121 @@
+# services/notifier/alertqueue.py
+import os, json, socket
+
+import redis
+
+ALERTS_STREAM = os.getenv("ALERTS_STREAM", "alerts:stream")
+ALERTS_GROUP = os.getenv("ALERTS_GROUP", "notifiers")
+ALERTS_DEAD = ALERTS_STREAM + ":dead"
+ALERT_BATCH = int(os.getenv("ALERT_BATCH", 100))
+ALERT_BLOCK_MS = int(os.getenv("ALERT_BLOCK_MS", 5000))
+# An entry unacked this long belongs to a crashed (or stuck) consumer and is taken over.
+ALERT_CLAIM_IDLE_MS = int(os.getenv("ALERT_CLAIM_IDLE_MS", 60000))
+ALERT_MAX_DELIVERIES = int(os.getenv("ALERT_MAX_DELIVERIES", 5))
+CONSUMER = os.getenv("NOTIFIER_ID") or f"{socket.gethostname()}:{os.getpid()}"
+
+# Pre-stream workers LPUSHed JSON onto this list; drained into the stream at startup.
+LEGACY_LIST = "alerts"
+
+
+class AlertStream:
+    """Consumer-group reader for the alerts stream.
+
+    Each notification channel reads through its own group
+    ("notifiers:<channel>"), so channels progress, fail and retry
+    independently over the same stream. Entries stay pending until `ack`,
+    so an alert survives a notifier crash: after ALERT_CLAIM_IDLE_MS any
+    replica reclaims it with XAUTOCLAIM and delivers it again. Entries that
+    keep failing are parked on ALERTS_DEAD after ALERT_MAX_DELIVERIES
+    attempts instead of being retried forever.
+    """
+
+    def __init__(self, r, group: str = ALERTS_GROUP, consumer: str = CONSUMER):
+        self.r = r
+        self.group = group
+        self.consumer = consumer
+        self._claim_cursor = "0-0"
+
+    def ensure_group(self):
+        """Create the group if needed, starting where the shared pre-channel group left off.
+
+        Entries the old group had read but not acked are included. A group
+        added later (a newly configured channel) starts at the end of the
+        stream rather than replaying its history.
+        """
+        start = "$"
+        try:
+            for g in self.r.xinfo_groups(ALERTS_STREAM):
+                if g["name"] in (ALERTS_GROUP, ALERTS_GROUP.encode()):
+                    start = g["last-delivered-id"]
+                    if g["pending"]:
+                        start = _before(self.r.xpending(ALERTS_STREAM, ALERTS_GROUP)["min"])
+        except redis.ResponseError:
+            pass  # no stream yet
+        try:
+            self.r.xgroup_create(ALERTS_STREAM, self.group, id=start, mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def migrate_legacy(self) -> int:
+        """Move alerts left on the old list into the stream, oldest first."""
+        moved = 0
+        while True:
+            payload = self.r.rpop(LEGACY_LIST)
+            if payload is None:
+                return moved
+            self.r.xadd(ALERTS_STREAM, {"data": payload})
+            moved += 1
+
+    def read(self, count: int = ALERT_BATCH, block_ms: int = ALERT_BLOCK_MS) -> list:
+        """Up to `count` (entry id, alert dict) pairs: reclaimed entries first, then new ones."""
+        batch = self._reclaim(count)
+        if len(batch) < count:
+            # don't block while there is reclaimed work to hand back
+            resp = self.r.xreadgroup(self.group, self.consumer, {ALERTS_STREAM: ">"},
+                                     count=count - len(batch), block=None if batch else block_ms)
+            for _, entries in resp or []:
+                batch.extend(entries)
+        return [(eid, _decode(fields)) for eid, fields in batch]
+
+    def _reclaim(self, count: int) -> list:
+        cursor, entries, *_ = self.r.xautoclaim(
+            ALERTS_STREAM, self.group, self.consumer, ALERT_CLAIM_IDLE_MS,
+            start_id=self._claim_cursor, count=count,
+        )
+        self._claim_cursor = cursor
+        entries = [(eid, fields) for eid, fields in entries if fields]  # trimmed entries come back empty
+        if not entries:
+            return []
+        pending = self.r.xpending_range(ALERTS_STREAM, self.group, min=entries[0][0], max=entries[-1][0],
+                                        count=len(entries) * 2, consumername=self.consumer)
+        deliveries = {p["message_id"]: p["times_delivered"] for p in pending}
+        keep, dead = [], []
+        for eid, fields in entries:
+            (dead if deliveries.get(eid, 0) > ALERT_MAX_DELIVERIES else keep).append((eid, fields))
+        if dead:
+            pipe = self.r.pipeline()
+            for eid, fields in dead:
+                pipe.xadd(ALERTS_DEAD, {**fields, "id": eid, "group": self.group})
+            pipe.xack(ALERTS_STREAM, self.group, *(eid for eid, _ in dead))
+            pipe.execute()
+            print(f"[notifier] Parked {len(dead)} alert(s) from {self.group} on {ALERTS_DEAD} "
+                  f"after {ALERT_MAX_DELIVERIES} attempts.")
+        return keep
+
+    def ack(self, ids):
+        if ids:
+            self.r.xack(ALERTS_STREAM, self.group, *ids)
+
+
+def _before(eid) -> str:
+    """The stream id immediately preceding `eid` (group start ids are exclusive)."""
+    ms, seq = (eid.decode() if isinstance(eid, bytes) else eid).split("-")
+    return f"{ms}-{int(seq) - 1}" if int(seq) else f"{int(ms) - 1}-18446744073709551615"
+
+
+def _decode(fields: dict) -> dict:
+    try:
+        return json.loads(fields.get(b"data") or fields.get("data") or "{}")
+    except ValueError:
+        return {}
@@ -0,0 +1,111 @@
+# services/notifier/audit.py
+import os, time
+from collections import deque
+
+from sqlalchemy import insert, select
+
+from models import Notification, Incident
+
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", 200))
+AUDIT_FLUSH_SEC = float(os.getenv("AUDIT_FLUSH_SEC", 2))
+AUDIT_BUFFER_MAX = int(os.getenv("AUDIT_BUFFER_MAX", 20000))
+
+
+class AuditBuffer:
+    """Write-behind buffer for Notification rows (the same shape as the monitor's CheckBuffer).
+
+    Rows go to Postgres as one multi-row INSERT per flush, once
+    `batch_size` are waiting or the oldest has waited `flush_sec`, and on
+    shutdown. Incident ids are validated with a single IN query per flush;
+    ids that don't exist (anymore) are stored as NULL instead of failing
+    the whole batch on the foreign key.
+
+    The notifier and the monitor are built as separate images with no shared
+    package (each has its own models.py too), so this is a copy of
+    services/monitor/writer.py's CheckBuffer rather than an import of it.
+    Change the two together: the drop counting in `add`, `deadline`, `due`,
+    `take` and `restore` should behave the same, and tests/test_audit.py
+    mirrors the monitor's tests/test_writer.py. One deliberate difference:
+    rows are only added on the event loop here, so there is no lock.
+    """
+
+    def __init__(self, session_factory, batch_size: int = AUDIT_BATCH_SIZE,
+                 flush_sec: float = AUDIT_FLUSH_SEC, max_rows: int = AUDIT_BUFFER_MAX):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_sec = flush_sec
+        self.rows = deque(maxlen=max_rows)
+        self.oldest_at = None
+        self.retry_at = 0.0
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self.rows)
+
+    def add(self, incident_id, channel: str, status: str, detail: str):
+        if len(self.rows) == self.rows.maxlen:
+            self.dropped += 1
+        self.rows.append({
+            "incident_id": incident_id if isinstance(incident_id, int) else None,
+            "channel": channel,
+            "status": status,
+            "detail": detail,
+        })
+        if self.oldest_at is None:
+            self.oldest_at = time.monotonic()
+
+    def deadline(self):
+        """Monotonic time by which the buffer should be flushed, or None when empty."""
+        if self.oldest_at is None:
+            return None
+        return max(self.oldest_at + self.flush_sec, self.retry_at)
+
+    def due(self, now: float = None) -> bool:
+        if not self.rows:
+            return False
+        now = time.monotonic() if now is None else now
+        if now < self.retry_at:
+            return False
+        return len(self.rows) >= self.batch_size or now >= self.deadline()
+
+    def take(self) -> list:
+        """Detach everything buffered, for `write`. Call on the event loop.
+
+        The loop gets a fresh deque, so rows added while the batch is being
+        written (in a thread) never share a container with it.
+        """
+        batch = list(self.rows)
+        self.rows = deque(maxlen=self.rows.maxlen)
+        self.oldest_at = None
+        if self.dropped:
+            print(f"[notifier] Audit buffer overflowed; dropped {self.dropped} notification record(s).")
+            self.dropped = 0
+        return batch
+
+    def write(self, batch: list) -> int:
+        """Insert `batch` in one transaction; safe to run in a thread. Returns the number of rows written."""
+        if not batch:
+            return 0
+        s = self.session_factory()
+        try:
+            ids = {row["incident_id"] for row in batch if row["incident_id"] is not None}
+            known = set(s.scalars(select(Incident.id).where(Incident.id.in_(ids)))) if ids else set()
+            s.execute(insert(Notification), [
+                {**row, "incident_id": row["incident_id"] if row["incident_id"] in known else None}
+                for row in batch
+            ])
+            s.commit()
+        finally:
+            s.close()
+        return len(batch)
+
+    def restore(self, batch: list):
+        """Put a batch that failed to write back in front of newer rows. Call on the event loop."""
+        rows = batch + list(self.rows)
+        overflow = max(0, len(rows) - self.rows.maxlen)
+        self.dropped += overflow  # oldest first, as when appending to a full buffer
+        self.rows = deque(rows[overflow:], maxlen=self.rows.maxlen)
+        if self.rows:
+            self.oldest_at = time.monotonic()
+        # back off for one flush interval instead of retrying on every wakeup
+        self.retry_at = time.monotonic() + self.flush_sec
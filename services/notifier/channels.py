@@ -0,0 +1,246 @@
+# services/notifier/channels.py
+import os, json, asyncio, smtplib
+from abc import ABC, abstractmethod
+from email.message import EmailMessage
+
+import httpx
+
+from dispatch import TokenBucket, DISPATCH_TIMEOUT_SEC, DISPATCH_MAX_RETRIES, DISPATCH_BACKOFF_SEC
+from metrics import RETRIES
+
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org").rstrip("/")
+
+# Per-monitor routing, e.g.
+#   [{"monitors": [1, 2], "channels": ["slack"]},
+#    {"types": ["incident"], "channels": ["telegram", "email"]}]
+# The first rule whose `monitors`/`types` (both optional) match decides; an
+# alert no rule matches goes to every configured channel.
+NOTIFY_ROUTES = os.getenv("NOTIFY_ROUTES", "")
+
+
+def _env(name: str, key: str, default):
+    """Per-channel tuning, e.g. SLACK_RATE_PER_SEC; falls back to `default`."""
+    return type(default)(os.getenv(f"{name.upper()}_{key}", default))
+
+
+class Channel(ABC):
+    """A notification channel plugin.
+
+    Every channel is drained by its own worker with its own consumer group,
+    bucket and concurrency, so a slow or failing provider only delays its
+    own alerts. Subclasses must implement `send`; a plugin that doesn't
+    fails when it is constructed at startup, not on the first alert.
+    """
+
+    name = "channel"
+
+    def __init__(self, rate: float = None, burst: int = None, concurrency: int = None):
+        self.bucket = TokenBucket(rate or _env(self.name, "RATE_PER_SEC", 5.0), burst or _env(self.name, "BURST", 10))
+        self.concurrency = concurrency or _env(self.name, "CONCURRENCY", 4)
+
+    @abstractmethod
+    async def send(self, text: str, alerts: list) -> tuple[bool, str]:
+        """Deliver one message covering `alerts`. Returns (delivered, detail)."""
+
+    async def aclose(self):
+        pass
+
+
+class HttpChannel(Channel):
+    """Base for HTTP channels: pooled client, retries with backoff, 429 handling.
+
+    Subclasses implement `request` instead of `send`.
+    """
+
+    def __init__(self, **kw):
+        super().__init__(**kw)
+        self.client = httpx.AsyncClient(
+            timeout=DISPATCH_TIMEOUT_SEC,
+            limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+        )
+
+    @abstractmethod
+    def request(self, text: str, alerts: list) -> dict:
+        """Keyword arguments for `client.post`."""
+
+    async def send(self, text: str, alerts: list) -> tuple[bool, str]:
+        detail = reason = ""
+        for attempt in range(DISPATCH_MAX_RETRIES + 1):
+            if attempt:
+                RETRIES.labels(self.name, reason).inc()
+            await self.bucket.acquire()
+            try:
+                res = await self.client.post(**self.request(text, alerts))
+            except httpx.HTTPError as e:
+                detail, reason = repr(e), "error"
+            else:
+                if res.status_code < 300:
+                    return True, str(res.status_code)
+                detail, reason = f"HTTP {res.status_code}: {res.text[:120]}", str(res.status_code)
+                if res.status_code == 429:
+                    self.bucket.pause(_retry_after(res))
+                    continue
+                if res.status_code < 500:
+                    # bad request / auth: retrying won't help, and the alert shouldn't loop forever
+                    return False, detail
+            await asyncio.sleep(DISPATCH_BACKOFF_SEC * 2 ** attempt)
+        return False, detail
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+def _retry_after(res) -> float:
+    try:
+        # Telegram puts it in the body
+        return float(res.json()["parameters"]["retry_after"])
+    except (ValueError, KeyError, TypeError):
+        try:
+            return float(res.headers.get("retry-after") or 1)
+        except ValueError:
+            return 1.0
+
+
+class TelegramChannel(HttpChannel):
+    name = "telegram"
+
+    def __init__(self, token: str, chat_id: str, base_url: str = TELEGRAM_API_URL, **kw):
+        # Telegram allows roughly one message per second to a single chat, with short bursts.
+        kw.setdefault("rate", _env(self.name, "RATE_PER_SEC", 1.0))
+        kw.setdefault("burst", _env(self.name, "BURST", 5))
+        super().__init__(**kw)
+        self.url = f"{base_url}/bot{token}/sendMessage"
+        self.chat_id = chat_id
+
+    def request(self, text, alerts):
+        return {"url": self.url, "data": {"chat_id": self.chat_id, "text": text, "parse_mode": "Markdown"}}
+
+
+class WebhookChannel(HttpChannel):
+    """POSTs {"text": ..., "alerts": [...]} as JSON to any endpoint."""
+
+    name = "webhook"
+
+    def __init__(self, url: str, **kw):
+        super().__init__(**kw)
+        self.url = url
+
+    def request(self, text, alerts):
+        return {"url": self.url, "json": {"text": text, "alerts": alerts}}
+
+
+class SlackChannel(HttpChannel):
+    """Slack (or Mattermost/Rocket.Chat) incoming webhook."""
+
+    name = "slack"
+
+    def __init__(self, url: str, **kw):
+        kw.setdefault("rate", _env(self.name, "RATE_PER_SEC", 1.0))
+        super().__init__(**kw)
+        self.url = url
+
+    def request(self, text, alerts):
+        return {"url": self.url, "json": {"text": text}}
+
+
+class SmtpChannel(Channel):
+    """Email via SMTP; smtplib is blocking, so each send runs in a thread."""
+
+    name = "email"
+
+    def __init__(self, host: str, port: int, sender: str, to: list, user: str = "", password: str = "",
+                 starttls: bool = True, **kw):
+        kw.setdefault("concurrency", _env(self.name, "CONCURRENCY", 2))
+        super().__init__(**kw)
+        self.host, self.port = host, port
+        self.sender, self.to = sender, to
+        self.user, self.password = user, password
+        self.starttls = starttls
+
+    def _send_sync(self, text: str):
+        msg = EmailMessage()
+        msg["Subject"] = text.splitlines()[0].replace("*", "")
+        msg["From"] = self.sender
+        msg["To"] = ", ".join(self.to)
+        msg.set_content(text.replace("*", ""))
+        with smtplib.SMTP(self.host, self.port, timeout=DISPATCH_TIMEOUT_SEC) as smtp:
+            if self.starttls:
+                smtp.starttls()
+            if self.user:
+                smtp.login(self.user, self.password)
+            smtp.send_message(msg)
+
+    async def send(self, text, alerts):
+        detail = ""
+        for attempt in range(DISPATCH_MAX_RETRIES + 1):
+            await self.bucket.acquire()
+            try:
+                await asyncio.to_thread(self._send_sync, text)
+                return True, "sent"
+            except smtplib.SMTPResponseException as e:
+                detail = f"SMTP {e.smtp_code}: {e.smtp_error!r}"
+                if 500 <= e.smtp_code < 600:
+                    return False, detail  # permanent failure
+            except (smtplib.SMTPException, OSError) as e:
+                detail = repr(e)
+            await asyncio.sleep(DISPATCH_BACKOFF_SEC * 2 ** attempt)
+        return False, detail
+
+
+class NoopChannel(Channel):
+    """Stand-in when no channel is configured: logs and reports success so nothing is retried."""
+
+    name = "noop"
+
+    async def send(self, text, alerts):
+        print("⚠️  No notification channel configured; skipping:", text)
+        return True, "noop"
+
+
+def load_channels() -> list[Channel]:
+    """Every channel whose settings are present in the environment (NoopChannel if none)."""
+    out = []
+    token, chat = os.getenv("TELEGRAM_BOT_TOKEN", "").strip(), os.getenv("TELEGRAM_CHAT_ID", "").strip()
+    if token and chat:
+        out.append(TelegramChannel(token, chat))
+    if os.getenv("SLACK_WEBHOOK_URL"):
+        out.append(SlackChannel(os.getenv("SLACK_WEBHOOK_URL")))
+    if os.getenv("WEBHOOK_URL"):
+        out.append(WebhookChannel(os.getenv("WEBHOOK_URL")))
+    if os.getenv("SMTP_HOST") and os.getenv("SMTP_TO"):
+        out.append(SmtpChannel(
+            host=os.getenv("SMTP_HOST"),
+            port=int(os.getenv("SMTP_PORT", 587)),
+            sender=os.getenv("SMTP_FROM", "uptime@localhost"),
+            to=[a.strip() for a in os.getenv("SMTP_TO").split(",") if a.strip()],
+            user=os.getenv("SMTP_USER", ""),
+            password=os.getenv("SMTP_PASSWORD", ""),
+            starttls=os.getenv("SMTP_STARTTLS", "1") == "1",
+        ))
+    return out or [NoopChannel()]
+
+
+class Router:
+    """Decides which channels an alert goes to (see NOTIFY_ROUTES)."""
+
+    def __init__(self, rules: list, channel_names):
+        self.rules = rules
+        self.all = set(channel_names)
+
+    @classmethod
+    def from_env(cls, channel_names, raw: str = NOTIFY_ROUTES):
+        rules = json.loads(raw) if raw.strip() else []
+        for rule in rules:
+            unknown = set(rule.get("channels", [])) - set(channel_names)
+            if unknown:
+                print(f"⚠️  NOTIFY_ROUTES names unconfigured channel(s) {sorted(unknown)}; ignoring them.")
+        return cls(rules, channel_names)
+
+    def channels_for(self, alert: dict) -> set:
+        for rule in self.rules:
+            if "monitors" in rule and alert.get("monitor_id") not in rule["monitors"]:
+                continue
+            if "types" in rule and alert.get("type") not in rule["types"]:
+                continue
+            return set(rule.get("channels", [])) & self.all
+        return self.all
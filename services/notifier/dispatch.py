@@ -0,0 +1,120 @@
+# services/notifier/dispatch.py
+import os, json, time, asyncio
+from dataclasses import dataclass, field
+
+DISPATCH_TIMEOUT_SEC = float(os.getenv("DISPATCH_TIMEOUT_SEC", 10))
+DISPATCH_MAX_RETRIES = int(os.getenv("DISPATCH_MAX_RETRIES", 4))
+DISPATCH_BACKOFF_SEC = float(os.getenv("DISPATCH_BACKOFF_SEC", 0.5))
+# More alerts of one kind than this in a batch are sent as a single digest message.
+DIGEST_THRESHOLD = int(os.getenv("DIGEST_THRESHOLD", 5))
+DIGEST_MAX_LINES = int(os.getenv("DIGEST_MAX_LINES", 30))
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, holding at most `burst`."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        # the lock makes waiters queue in FIFO order instead of all waking at once
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        """Stop handing out tokens for `seconds` (the server told us to back off)."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+
+def format_alert(alert: dict) -> str:
+    t = alert.get("type")
+    if t == "incident":
+        return f"🚨 *Incident* monitor #{alert.get('monitor_id')}\nReason: {alert.get('reason','unknown')}"
+    if t == "recovered":
+        return f"✅ *Recovered* monitor #{alert.get('monitor_id')}"
+    return f"ℹ️  Alert: {json.dumps(alert)[:200]}"
+
+
+def format_digest(kind: str, alerts: list) -> str:
+    if kind == "incident":
+        title = f"🚨 *{len(alerts)} monitors down*"
+        lines = [f"#{a.get('monitor_id')}: {a.get('reason','unknown')}" for a in alerts]
+    else:
+        title = f"✅ *{len(alerts)} monitors recovered*"
+        lines = [f"#{a.get('monitor_id')}" for a in alerts]
+    if len(lines) > DIGEST_MAX_LINES:
+        lines = lines[:DIGEST_MAX_LINES] + [f"…and {len(alerts) - DIGEST_MAX_LINES} more"]
+    return "\n".join([title, *lines])
+
+
+@dataclass
+class Message:
+    text: str
+    entries: list = field(default_factory=list)  # (entry id, alert) pairs this message covers
+
+
+def plan(batch, threshold: int = DIGEST_THRESHOLD) -> list[Message]:
+    """Turn a batch of (entry id, alert) into messages, coalescing bursts into digests."""
+    by_kind = {}
+    out = []
+    for eid, alert in batch:
+        kind = alert.get("type")
+        if kind in ("incident", "recovered"):
+            by_kind.setdefault(kind, []).append((eid, alert))
+        else:
+            out.append(Message(format_alert(alert), [(eid, alert)]))
+    for kind, entries in by_kind.items():
+        if len(entries) > threshold:
+            out.append(Message(format_digest(kind, [a for _, a in entries]), entries))
+        else:
+            out.extend(Message(format_alert(a), [(eid, a)]) for eid, a in entries)
+    return out
+
+
+@dataclass
+class Outcome:
+    message: Message
+    delivered: bool
+    detail: str
+    latency_ms: int
+
+
+class Dispatcher:
+    """Send a batch's messages concurrently through one channel (see channels.py).
+
+    Concurrency is capped at the channel's pool size, so one slow request no
+    longer holds up the rest; the channel's token bucket still paces the
+    actual rate.
+    """
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.sem = asyncio.Semaphore(channel.concurrency)
+
+    async def _one(self, msg: Message) -> Outcome:
+        async with self.sem:
+            start = time.perf_counter()
+            ok, detail = await self.channel.send(msg.text, [a for _, a in msg.entries])
+            return Outcome(msg, ok, detail, int((time.perf_counter() - start) * 1000))
+
+    async def dispatch(self, batch, threshold: int = DIGEST_THRESHOLD) -> list[Outcome]:
+        return await asyncio.gather(*(self._one(m) for m in plan(batch, threshold)))
@@ -0,0 +1,45 @@
+# services/notifier/metrics.py
+import os
+
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+METRICS_PORT = int(os.getenv("METRICS_PORT", 9101))
+QUEUE_POLL_SEC = float(os.getenv("METRICS_QUEUE_POLL_SEC", 10))
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+QUEUE_LAG = Gauge("notifier_queue_lag", "Stream entries not yet read by the channel's group", ["channel"])
+QUEUE_PENDING = Gauge("notifier_queue_pending", "Entries read but not yet acked by the channel's group", ["channel"])
+DEAD_LETTERS = Gauge("notifier_dead_letters", "Entries parked on the dead-letter stream")
+DISPATCH_SECONDS = Histogram("notifier_dispatch_seconds", "Time to deliver one message, retries and rate limiting included",
+                             ["channel"], buckets=LATENCY_BUCKETS)
+MESSAGES = Counter("notifier_messages_total", "Messages sent", ["channel", "result"])
+ALERTS = Counter("notifier_alerts_total", "Alerts covered by sent messages", ["channel", "result"])
+RETRIES = Counter("notifier_retries_total", "Delivery re-attempts", ["channel", "reason"])
+AUDIT_FLUSH_SECONDS = Histogram("notifier_audit_flush_seconds", "Notification audit flush time")
+AUDIT_BUFFERED = Gauge("notifier_audit_buffer_rows", "Audit rows waiting to be flushed")
+
+
+def observe_outcomes(channel: str, outcomes):
+    for o in outcomes:
+        result = "sent" if o.delivered else "failed"
+        DISPATCH_SECONDS.labels(channel).observe(o.latency_ms / 1000)
+        MESSAGES.labels(channel, result).inc()
+        ALERTS.labels(channel, result).inc(len(o.message.entries))
+
+
+def poll_queues(r, stream: str, groups: dict, dead: str):
+    """Refresh the queue gauges from XINFO GROUPS; `groups` maps group name -> channel."""
+    for g in r.xinfo_groups(stream):
+        name = g["name"].decode() if isinstance(g["name"], bytes) else g["name"]
+        if name in groups:
+            QUEUE_PENDING.labels(groups[name]).set(g["pending"])
+            if g.get("lag") is not None:  # Redis 7+
+                QUEUE_LAG.labels(groups[name]).set(g["lag"])
+    DEAD_LETTERS.set(r.xlen(dead))
+
+
+def serve(port: int = METRICS_PORT):
+    if port:
+        start_http_server(port)
+        print(f"📈 Metrics on :{port}/metrics")
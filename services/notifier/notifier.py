@@ -1,129 +1,19 @@
-# import os, json, time
-# import redis
-# import requests
-# from db import SessionLocal
-# from models import Notification
-
-# TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
-# TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
-
-# REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
-# r = redis.from_url(REDIS_URL)
-
-# def send_telegram(msg: str):
-#     if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
-#         print("⚠️  Telegram not configured; skipping:", msg)
-#         return
-#     url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-#     data = {"chat_id": TELEGRAM_CHAT_ID, "text": msg, "parse_mode": "Markdown"}
-#     try:
-#         res = requests.post(url, data=data, timeout=10)
-#         print("✅ Telegram send:", res.status_code, res.text[:120])
-#     except Exception as e:
-#         print("❌ Telegram error:", repr(e))
-
-# def process_alert(alert: dict):
-#     s = SessionLocal()
-#     try:
-#         t = alert.get("type")
-#         if t == "incident":
-#             msg = f"🚨 *Incident* monitor #{alert.get('monitor_id')}\nReason: {alert.get('reason','unknown')}"
-#         elif t == "recovered":
-#             msg = f"✅ *Recovered* monitor #{alert.get('monitor_id')}"
-#         else:
-#             msg = f"ℹ️  Alert: {json.dumps(alert)[:200]}"
-#         send_telegram(msg)
-#         # record to notifications table (optional)
-#         n = Notification(
-#             incident_id=alert.get("incident_id") or 0,
-#             channel="telegram",
-#             status="sent",
-#             detail=msg
-#         )
-#         s.add(n); s.commit()
-#     finally:
-#         s.close()
-
-# if __name__ == "__main__":
-#     print("🔔 Notifier starting...")
-#     if TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID:
-#         print("✅ Telegram configured; chat:", TELEGRAM_CHAT_ID)
-#     else:
-#         print("⚠️  Telegram env missing; set TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID")
-
-#     print("🧰 Redis:", REDIS_URL)
-#     print("👂 Waiting for alerts on list 'alerts'...")
-#     while True:
-#         try:
-#             item = r.brpop("alerts", timeout=0)  # block until message
-#             _, payload = item
-#             alert = json.loads(payload)
-#             print("📨 Got alert:", alert)
-#             process_alert(alert)
-#         except Exception as e:
-#             print("⚠️  Loop error:", repr(e))
-#             time.sleep(1)
-
 # services/notifier/notifier.py
-import os, json, time
+import os, json, time, asyncio
 import redis
-import requests
 from sqlalchemy.exc import OperationalError
 from db import SessionLocal
-from models import Notification
-from sqlalchemy.orm import Session
-from models import Notification, Incident
+from alertqueue import AlertStream, ALERTS_STREAM, ALERTS_GROUP, ALERTS_DEAD
+from dispatch import Dispatcher
+from channels import load_channels, Router, TelegramChannel
+from audit import AuditBuffer
+import metrics
 
 
-TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "").strip()
-TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID", "").strip()
 REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0").strip()
+AUDIT_POLL_SEC = 1.0
 
 
-def process_alert(alert: dict):
-    s: Session = SessionLocal()
-    try:
-        t = alert.get("type")
-        if t == "incident":
-            msg = f"🚨 *Incident* monitor #{alert.get('monitor_id')}\nReason: {alert.get('reason','unknown')}"
-        elif t == "recovered":
-            msg = f"✅ *Recovered* monitor #{alert.get('monitor_id')}"
-        else:
-            msg = f"ℹ️  Alert: {json.dumps(alert)[:200]}"
-
-        send_telegram(msg)
-
-        # only keep incident_id if it actually exists
-        inc_id = alert.get("incident_id")
-        if isinstance(inc_id, int) and s.get(Incident, inc_id) is not None:
-            incident_id_db = inc_id
-        else:
-            incident_id_db = None
-
-        n = Notification(
-            incident_id=incident_id_db,
-            channel="telegram",
-            status="sent",
-            detail=msg
-        )
-        s.add(n); s.commit()
-    finally:
-        s.close()
-
-
-
-def send_telegram(msg: str):
-    if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
-        print("⚠️  Telegram not configured; skipping:", msg)
-        return
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-    data = {"chat_id": TELEGRAM_CHAT_ID, "text": msg, "parse_mode": "Markdown"}
-    try:
-        res = requests.post(url, data=data, timeout=10)
-        print("✅ Telegram send:", res.status_code, res.text[:120])
-    except Exception as e:
-        print("❌ Telegram error:", repr(e))
-
 def wait_for_db(max_tries=30, sleep=1.5):
     tries = 0
     while True:
@@ -155,70 +45,116 @@ def wait_for_redis(max_tries=30, sleep=1.5):
                 raise
             time.sleep(sleep)
 
-def record_notification(incident_id: int, channel: str, status: str, detail: str):
-    s = SessionLocal()
-    try:
-        n = Notification(
-            incident_id=incident_id,
-            channel=channel,
-            status=status,
-            detail=detail
-        )
-        s.add(n)
-        s.commit()
-    finally:
-        s.close()
-
-def process_alert(alert: dict):
-    t = alert.get("type")
-    if t == "incident":
-        msg = f"🚨 *Incident* monitor #{alert.get('monitor_id')}\nReason: {alert.get('reason','unknown')}"
-    elif t == "recovered":
-        msg = f"✅ *Recovered* monitor #{alert.get('monitor_id')}"
-    else:
-        msg = f"ℹ️  Alert: {json.dumps(alert)[:200]}"
-
-    send_telegram(msg)
-    record_notification(
-        incident_id=int(alert.get("incident_id") or 0),
-        channel="telegram" if TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID else "noop",
-        status="sent",
-        detail=msg
-    )
-
-def main():
+audit = AuditBuffer(SessionLocal)
+_audit_lock = asyncio.Lock()
+
+async def flush_audit():
+    # one flush at a time; channel loops keep appending meanwhile
+    async with _audit_lock:
+        started = time.perf_counter()
+        batch = audit.take()
+        try:
+            await asyncio.to_thread(audit.write, batch)
+        except Exception as e:
+            audit.restore(batch)
+            print(f"⚠️  Could not record {len(batch)} notification(s):", repr(e))
+        metrics.AUDIT_FLUSH_SECONDS.observe(time.perf_counter() - started)
+        metrics.AUDIT_BUFFERED.set(len(audit))
+
+async def audit_flusher():
+    while True:
+        deadline = audit.deadline()
+        await asyncio.sleep(AUDIT_POLL_SEC if deadline is None else max(0.0, deadline - time.monotonic()))
+        if audit.due():
+            await flush_audit()
+
+async def queue_stats(r, streams: dict):
+    """Keep the queue depth gauges current; XINFO is cheap, but not worth doing per batch."""
+    groups = {s.group: name for name, s in streams.items()}
+    while True:
+        try:
+            await asyncio.to_thread(metrics.poll_queues, r, ALERTS_STREAM, groups, ALERTS_DEAD)
+        except redis.RedisError as e:
+            print("⚠️  Could not read queue stats:", repr(e))
+        await asyncio.sleep(metrics.QUEUE_POLL_SEC)
+
+async def process_batch(dispatcher: Dispatcher, batch) -> list:
+    """Deliver a batch of (entry id, alert) on one channel; returns the entry ids to acknowledge.
+
+    Failed deliveries are left pending so they are retried (by this or
+    another replica) after the claim timeout. Audit rows are buffered and
+    written in bulk, so they never hold up the ack: the alert went out, and
+    redelivering it would page people twice.
+    """
+    name = dispatcher.channel.name
+    outcomes = await dispatcher.dispatch(batch)
+    metrics.observe_outcomes(name, outcomes)
+    sent = [o for o in outcomes if o.delivered]
+    slowest = max((o.latency_ms for o in outcomes), default=0)
+    print(f"📤 [{name}] {len(batch)} alert(s) -> {len(outcomes)} message(s), {len(sent)} delivered, slowest {slowest} ms")
+    for o in outcomes:
+        if not o.delivered:
+            print(f"❌ [{name}] Delivery failed:", o.detail)
+        for _, alert in o.message.entries:
+            audit.add(alert.get("incident_id"), name, "sent" if o.delivered else "failed",
+                      o.message.text if o.delivered else o.detail)
+    metrics.AUDIT_BUFFERED.set(len(audit))
+    if audit.due():
+        await flush_audit()
+    return [eid for o in sent for eid, _ in o.message.entries]
+
+async def run_channel(stream: AlertStream, channel, router: Router):
+    """Drain one channel's consumer group; its failures and slowness stay within this loop."""
+    dispatcher = Dispatcher(channel)
+    while True:
+        try:
+            batch = await asyncio.to_thread(stream.read)  # blocks up to ALERT_BLOCK_MS
+            if not batch:
+                continue
+            mine = [(eid, a) for eid, a in batch if channel.name in router.channels_for(a)]
+            # alerts routed elsewhere are done as far as this channel is concerned
+            skipped = [eid for eid, a in batch if channel.name not in router.channels_for(a)]
+            done = await process_batch(dispatcher, mine) if mine else []
+            stream.ack(done + skipped)
+        except Exception as e:
+            print(f"⚠️  [{channel.name}] Loop error:", repr(e))
+            await asyncio.sleep(1)
+
+async def main():
     print("🔔 Notifier starting...")
     print("🧰 Redis URL:", REDIS_URL)
-    if TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID:
-        print("✅ Telegram configured; chat:", TELEGRAM_CHAT_ID)
-    else:
-        print("⚠️  Telegram env missing or has spaces; set TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID")
+    channels = load_channels()
+    router = Router.from_env([c.name for c in channels])
+    print("✅ Channels:", ", ".join(c.name for c in channels))
 
     wait_for_db()
     r = wait_for_redis()
+    metrics.serve()
 
     # Optional one-time boot message (useful to validate token/chat quickly)
+    for c in channels:
+        if isinstance(c, TelegramChannel):
+            ok, detail = await c.send("🔔 Uptime notifier booted successfully.", [])
+            if not ok:
+                print("❌ Telegram boot message failed:", detail)
+
+    streams = {c.name: AlertStream(r, group=f"{ALERTS_GROUP}:{c.name}") for c in channels}
+    for stream in streams.values():
+        stream.ensure_group()
+    moved = AlertStream(r).migrate_legacy()
+    if moved:
+        print(f"📦 Moved {moved} alert(s) from the legacy 'alerts' list into {ALERTS_STREAM}.")
+
+    print(f"👂 Waiting for alerts on stream '{ALERTS_STREAM}' as consumer '{AlertStream(r).consumer}'...")
     try:
-        send_telegram("🔔 Uptime notifier booted successfully.")
-    except Exception as e:
-        print("❌ Telegram boot message failed:", e)
-
-    print("👂 Waiting for alerts on list 'alerts'...")
-    while True:
-        try:
-            item = r.brpop("alerts", timeout=0)  # blocks until an alert arrives
-            if not item:
-                continue
-            _, payload = item
-            alert = json.loads(payload)
-            print("📨 Got alert:", alert)
-            process_alert(alert)
-        except KeyboardInterrupt:
-            print("👋 Notifier stopping...")
-            break
-        except Exception as e:
-            print("⚠️  Loop error:", repr(e))
-            time.sleep(1)
+        await asyncio.gather(audit_flusher(), queue_stats(r, streams), *(run_channel(streams[c.name], c, router) for c in channels))
+    finally:
+        await flush_audit()
+        for c in channels:
+            await c.aclose()
 
 if __name__ == "__main__":
-    main()
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("👋 Notifier stopping...")
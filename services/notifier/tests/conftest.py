@@ -0,0 +1,7 @@
+# services/notifier/tests/conftest.py
+# The notifier's modules are flat (imported as `audit`, `channels`, ...) and
+# db.py connects on import, so point it at in-memory sqlite.
+import os, sys
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,107 @@
+# services/notifier/tests/test_alertqueue.py
+import asyncio, json
+
+import fakeredis
+import pytest
+
+import alertqueue
+from alertqueue import AlertStream, ALERTS_STREAM, ALERTS_GROUP, ALERTS_DEAD, LEGACY_LIST
+from dispatch import Dispatcher
+
+
+@pytest.fixture
+def r():
+    return fakeredis.FakeRedis()
+
+
+def push(r, *alerts):
+    return [r.xadd(ALERTS_STREAM, {"data": json.dumps(a)}) for a in alerts]
+
+
+def test_entries_stay_pending_until_acked(r):
+    s = AlertStream(r, group="g", consumer="a")
+    s.ensure_group()
+    push(r, {"type": "incident", "monitor_id": 1}, {"type": "recovered", "monitor_id": 1})
+    batch = s.read(block_ms=10)
+    assert [a for _, a in batch] == [{"type": "incident", "monitor_id": 1}, {"type": "recovered", "monitor_id": 1}]
+    assert r.xpending(ALERTS_STREAM, "g")["pending"] == 2
+    s.ack([eid for eid, _ in batch])
+    assert r.xpending(ALERTS_STREAM, "g")["pending"] == 0
+    assert s.read(block_ms=10) == []
+
+
+def test_unacked_entries_are_reclaimed_by_another_consumer(r, monkeypatch):
+    monkeypatch.setattr(alertqueue, "ALERT_CLAIM_IDLE_MS", 0)
+    crashed, other = AlertStream(r, group="g", consumer="a"), AlertStream(r, group="g", consumer="b")
+    crashed.ensure_group()
+    ids = push(r, {"type": "incident", "monitor_id": 1})
+    crashed.read(block_ms=10)  # read, never acked
+    push(r, {"type": "incident", "monitor_id": 2})
+    batch = other.read(block_ms=10)
+    assert [eid for eid, _ in batch][0] == ids[0]  # reclaimed work first, then new entries
+    assert [a["monitor_id"] for _, a in batch] == [1, 2]
+
+
+def test_entries_that_keep_failing_are_parked(r, monkeypatch, capsys):
+    monkeypatch.setattr(alertqueue, "ALERT_CLAIM_IDLE_MS", 0)
+    monkeypatch.setattr(alertqueue, "ALERT_MAX_DELIVERIES", 2)
+    s = AlertStream(r, group="g", consumer="a")
+    s.ensure_group()
+    (eid,) = push(r, {"type": "incident", "monitor_id": 1})
+    deliveries = 0
+    for _ in range(4):
+        deliveries += len(s.read(block_ms=10))  # never acked: a failing delivery
+    assert deliveries == 2
+    (dead,) = r.xrange(ALERTS_DEAD)
+    assert dead[1][b"id"] == eid and dead[1][b"group"] == b"g"
+    assert r.xpending(ALERTS_STREAM, "g")["pending"] == 0
+    assert "Parked 1 alert(s)" in capsys.readouterr().out
+
+
+def test_channel_groups_start_where_the_shared_group_left_off(r):
+    old = AlertStream(r, group=ALERTS_GROUP, consumer="old")
+    old.ensure_group()
+    push(r, {"n": 1}, {"n": 2})
+    acked, pending = old.read(count=2, block_ms=10)
+    old.ack([acked[0]])
+    push(r, {"n": 3})
+
+    per_channel = AlertStream(r, group=f"{ALERTS_GROUP}:slack", consumer="new")
+    per_channel.ensure_group()
+    assert [a["n"] for _, a in per_channel.read(block_ms=10)] == [2, 3]  # the unacked one is not lost
+
+    late = AlertStream(r, group=f"{ALERTS_GROUP}:email", consumer="new")
+    r.xgroup_destroy(ALERTS_STREAM, ALERTS_GROUP)
+    late.ensure_group()
+    assert late.read(block_ms=10) == []  # a channel added later doesn't replay history
+
+
+def test_legacy_list_is_moved_oldest_first(r):
+    r.lpush(LEGACY_LIST, json.dumps({"n": 1}))
+    r.lpush(LEGACY_LIST, json.dumps({"n": 2}))
+    s = AlertStream(r, group="g", consumer="a")
+    s.ensure_group()
+    assert s.migrate_legacy() == 2
+    assert [a["n"] for _, a in s.read(block_ms=10)] == [1, 2]
+
+
+class FlakyChannel:
+    name = "flaky"
+    concurrency = 2
+
+    async def send(self, text, alerts):
+        ok = alerts[0]["monitor_id"] != 2
+        return ok, "sent" if ok else "HTTP 502"
+
+
+def test_process_batch_acks_only_delivered_alerts(monkeypatch):
+    import notifier
+
+    async def no_flush():
+        pass
+
+    monkeypatch.setattr(notifier, "flush_audit", no_flush)
+    batch = [(b"1-0", {"type": "incident", "monitor_id": 1}), (b"2-0", {"type": "incident", "monitor_id": 2})]
+    acked = asyncio.run(notifier.process_batch(Dispatcher(FlakyChannel()), batch))
+    assert acked == [b"1-0"]  # the failed one stays pending and is retried after the claim timeout
+    assert [row["status"] for row in notifier.audit.take()] == ["sent", "failed"]
@@ -0,0 +1,80 @@
+# services/notifier/tests/test_audit.py
+# Mirrors services/monitor/tests/test_writer.py; the two buffers are kept in step.
+import pytest
+
+from audit import AuditBuffer
+
+
+class FakeSession:
+    fail = False
+    known = set()
+    written = []
+
+    def scalars(self, stmt):
+        return list(FakeSession.known)
+
+    def execute(self, stmt, rows=None):
+        if FakeSession.fail:
+            raise RuntimeError("db down")
+        FakeSession.written.extend(rows)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def session():
+    FakeSession.fail = False
+    FakeSession.known = set()
+    FakeSession.written = []
+    return FakeSession
+
+
+def test_full_buffer_drops_oldest_rows(session):
+    buf = AuditBuffer(session, max_rows=3)
+    for i in range(5):
+        buf.add(i, "telegram", "sent", f"#{i}")
+    assert len(buf) == 3
+    assert buf.dropped == 2
+    assert [r["incident_id"] for r in buf.take()] == [2, 3, 4]
+    assert buf.dropped == 0  # reported (and reset) by take
+
+
+def test_failed_write_is_restored_ahead_of_newer_rows_and_backs_off(session):
+    buf = AuditBuffer(session, batch_size=1, flush_sec=60)
+    buf.add(1, "telegram", "sent", "")
+    batch = buf.take()
+    session.fail = True
+    with pytest.raises(RuntimeError):
+        buf.write(batch)
+    buf.add(2, "telegram", "sent", "")
+    buf.restore(batch)
+    assert [r["incident_id"] for r in buf.rows] == [1, 2]
+    assert not buf.due()  # backs off for one interval instead of retrying on every wakeup
+    buf.retry_at = 0.0
+    assert buf.due()
+
+
+def test_restore_respects_the_bound(session):
+    buf = AuditBuffer(session, max_rows=3)
+    buf.add(0, "telegram", "sent", "")
+    buf.add(1, "telegram", "sent", "")
+    batch = buf.take()
+    buf.add(2, "telegram", "sent", "")
+    buf.add(3, "telegram", "sent", "")
+    buf.restore(batch)
+    assert [r["incident_id"] for r in buf.rows] == [1, 2, 3]
+    assert buf.dropped == 1
+
+
+def test_unknown_incident_ids_are_written_as_null(session):
+    session.known = {1}
+    buf = AuditBuffer(session)
+    buf.add(1, "telegram", "sent", "")
+    buf.add(2, "telegram", "failed", "gone")  # incident deleted meanwhile
+    buf.add("test", "telegram", "sent", "")   # not an incident alert at all
+    assert buf.write(buf.take()) == 3
+    assert [r["incident_id"] for r in session.written] == [1, None, None]
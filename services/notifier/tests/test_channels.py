@@ -0,0 +1,63 @@
+# services/notifier/tests/test_channels.py
+import asyncio
+
+import httpx
+import pytest
+
+from channels import Channel, HttpChannel, WebhookChannel, NoopChannel, Router
+
+
+def test_channels_missing_their_hook_fail_at_construction():
+    class NoSend(Channel):
+        name = "nosend"
+
+    class NoRequest(HttpChannel):
+        name = "norequest"
+
+    with pytest.raises(TypeError):
+        NoSend()
+    with pytest.raises(TypeError):
+        NoRequest()
+    assert NoopChannel().name == "noop"
+
+
+def test_webhook_request_carries_text_and_alerts():
+    ch = WebhookChannel("http://hook.test/x")
+    assert ch.request("down", [{"monitor_id": 1}]) == {
+        "url": "http://hook.test/x", "json": {"text": "down", "alerts": [{"monitor_id": 1}]},
+    }
+
+
+def test_router_first_matching_rule_wins_and_unmatched_alerts_go_everywhere():
+    router = Router.from_env(["slack", "telegram", "email"], raw="""[
+        {"monitors": [1, 2], "channels": ["slack"]},
+        {"types": ["incident"], "channels": ["telegram", "email", "pager"]}
+    ]""")
+    assert router.channels_for({"monitor_id": 1, "type": "incident"}) == {"slack"}
+    assert router.channels_for({"monitor_id": 3, "type": "incident"}) == {"telegram", "email"}
+    assert router.channels_for({"monitor_id": 3, "type": "recovered"}) == {"slack", "telegram", "email"}
+
+
+def mock_client(statuses: list, seen: list):
+    def handler(request):
+        seen.append(request)
+        status = statuses.pop(0)
+        return httpx.Response(status, headers={"retry-after": "0"} if status == 429 else {})
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def test_http_send_waits_out_429_and_gives_up_on_other_4xx():
+    async def go():
+        seen = []
+        ch = WebhookChannel("http://hook.test/x", rate=100.0)
+        await ch.client.aclose()
+        ch.client = mock_client([429, 200, 403], seen)
+        first = await ch.send("down", [])
+        second = await ch.send("down", [])
+        await ch.aclose()
+        return first, second, len(seen)
+
+    first, second, requests = asyncio.run(go())
+    assert first == (True, "200")
+    assert second[0] is False and second[1].startswith("HTTP 403")
+    assert requests == 3  # the 403 was not retried
@@ -0,0 +1,74 @@
+# services/notifier/tests/test_dispatch.py
+import asyncio, time
+
+from dispatch import TokenBucket, Dispatcher, plan
+
+
+def alerts(kind, *monitor_ids):
+    return [(f"{kind}-{m}", {"type": kind, "monitor_id": m, "reason": "HTTP 500"}) for m in monitor_ids]
+
+
+def test_token_bucket_allows_a_burst_then_paces_to_the_rate():
+    async def go():
+        bucket = TokenBucket(rate=20, burst=5)
+        stamps = []
+        started = time.monotonic()
+        for _ in range(10):
+            await bucket.acquire()
+            stamps.append(time.monotonic() - started)
+        return stamps
+
+    stamps = asyncio.run(go())
+    assert stamps[4] < 0.02  # the burst goes out at once
+    assert 0.2 <= stamps[9] < 0.4  # then 5 more at 20/s
+
+
+def test_token_bucket_pause_holds_every_waiter():
+    async def go():
+        bucket = TokenBucket(rate=1000, burst=10)
+        bucket.pause(0.15)
+        started = time.monotonic()
+        await asyncio.gather(*(bucket.acquire() for _ in range(3)))
+        return time.monotonic() - started
+
+    assert asyncio.run(go()) >= 0.15
+
+
+def test_plan_coalesces_bursts_into_digests():
+    batch = alerts("incident", *range(1, 8)) + alerts("recovered", 8, 9) + [("x", {"type": "custom"})]
+    messages = plan(batch, threshold=5)
+    assert len(messages) == 1 + 2 + 1  # custom alone, 2 single recoveries, 1 incident digest
+    digest = next(m for m in messages if len(m.entries) > 1)
+    assert digest.text.startswith("🚨 *7 monitors down*")
+    assert [eid for eid, _ in digest.entries] == [f"incident-{m}" for m in range(1, 8)]
+    assert sorted(eid for m in messages for eid, _ in m.entries) == sorted(eid for eid, _ in batch)
+
+
+def test_plan_sends_small_batches_one_message_per_alert():
+    messages = plan(alerts("incident", 1, 2), threshold=5)
+    assert [m.text.splitlines()[0] for m in messages] == ["🚨 *Incident* monitor #1", "🚨 *Incident* monitor #2"]
+
+
+class SlowChannel:
+    name = "slow"
+    concurrency = 3
+
+    def __init__(self):
+        self.active = self.peak = 0
+
+    async def send(self, text, alerts):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.05)
+        self.active -= 1
+        return True, "sent"
+
+
+def test_dispatcher_sends_concurrently_up_to_the_channel_pool():
+    channel = SlowChannel()
+    started = time.monotonic()
+    outcomes = asyncio.run(Dispatcher(channel).dispatch(alerts("incident", *range(9)), threshold=100))
+    elapsed = time.monotonic() - started
+    assert len(outcomes) == 9 and all(o.delivered for o in outcomes)
+    assert channel.peak == 3
+    assert elapsed < 0.3  # 3 rounds of 50 ms, not 9
@@ -13,7 +13,22 @@ type Monitor = {
   expected_statuses: number[];
 };
 
-type SummaryPoint = { ts: string; ms: number; ok: boolean };
+type LiveCheck = {
+  monitor_id: number;
+  ts: string;
+  ok: boolean;
+  status_code: number | null;
+  latency_ms: number | null;
+};
+
+type Incident = { id: number; monitor_id: number };
+
+type Summary = {
+  monitor_id: number;
+  uptime_percent: number;
+  avg_latency_ms: number;
+  checks: number;
+};
 
 export default function Dashboard() {
   const [monitors, setMonitors] = useState<Monitor[]>([]);
@@ -21,7 +36,9 @@ export default function Dashboard() {
   const [query, setQuery] = useState("");
   const [typeFilter, setTypeFilter] = useState<"ALL" | "HTTP" | "PING" | "PORT">("ALL");
   const [stateFilter, setStateFilter] = useState<"ALL" | "ENABLED" | "PAUSED">("ALL");
-  const [summaries, setSummaries] = useState<Record<number, SummaryPoint[]>>({});
+  const [summaries, setSummaries] = useState<Record<number, Summary>>({});
+  const [lastChecks, setLastChecks] = useState<Record<number, LiveCheck>>({});
+  const [openIncidents, setOpenIncidents] = useState<Record<number, number>>({}); // monitor_id -> incident id
 
   // fetch monitors
   useEffect(() => {
@@ -33,20 +50,16 @@ export default function Dashboard() {
         if (!alive) return;
         setMonitors(data);
 
-        // fetch a small sparkline window for each monitor (parallel)
+        // one bulk request for every monitor's summary instead of one per row
         const windowParam = "24h";
-        const map: Record<number, SummaryPoint[]> = {};
-        await Promise.all(
-          data.map(async (m) => {
-            try {
-              const r = await fetch(`/api/public/monitors/${m.id}/summary?window=${windowParam}`);
-              const s: SummaryPoint[] = await r.json();
-              map[m.id] = s.slice(-28); // last ~28 points
-            } catch {
-              map[m.id] = [];
-            }
-          })
-        );
+        const map: Record<number, Summary> = {};
+        try {
+          const r = await fetch(`/api/public/summary?window=${windowParam}`);
+          const body: { summaries: Summary[] } = await r.json();
+          for (const s of body.summaries) map[s.monitor_id] = s;
+        } catch {
+          // leave the map empty; rows render as "No data"
+        }
         if (!alive) return;
         setSummaries(map);
       } finally {
@@ -58,6 +71,47 @@ export default function Dashboard() {
     };
   }, []);
 
+  // live deltas from the API's event stream instead of re-polling
+  useEffect(() => {
+    const loadIncidents = async () => {
+      try {
+        const res = await fetch("/api/public/incidents/active");
+        const data: Incident[] = await res.json();
+        const map: Record<number, number> = {};
+        for (const i of data) map[i.monitor_id] = i.id;
+        setOpenIncidents(map);
+      } catch {
+        // keep whatever we had
+      }
+    };
+
+    const es = new EventSource("/api/public/stream");
+    // (re)connected, or the server lost events: re-read current state once
+    es.addEventListener("hello", loadIncidents);
+    es.addEventListener("resync", loadIncidents);
+    es.addEventListener("checks", (e) => {
+      const { checks }: { checks: LiveCheck[] } = JSON.parse((e as MessageEvent).data);
+      setLastChecks((prev) => {
+        const next = { ...prev };
+        for (const c of checks) next[c.monitor_id] = c;
+        return next;
+      });
+    });
+    es.addEventListener("incident_opened", (e) => {
+      const { monitor_id, incident_id } = JSON.parse((e as MessageEvent).data);
+      setOpenIncidents((prev) => ({ ...prev, [monitor_id]: incident_id }));
+    });
+    es.addEventListener("incident_resolved", (e) => {
+      const { monitor_id } = JSON.parse((e as MessageEvent).data);
+      setOpenIncidents((prev) => {
+        const next = { ...prev };
+        delete next[monitor_id];
+        return next;
+      });
+    });
+    return () => es.close();
+  }, []);
+
   const filtered = useMemo(() => {
     return monitors.filter((m) => {
       const q = query.trim().toLowerCase();
@@ -82,9 +136,9 @@ export default function Dashboard() {
     });
   }, [monitors, query, typeFilter, stateFilter]);
 
-  const upCount = filtered.filter((m) => m.is_enabled).length;
+  const downCount = filtered.filter((m) => m.is_enabled && m.id in openIncidents).length;
+  const upCount = filtered.filter((m) => m.is_enabled).length - downCount;
   const pausedCount = filtered.filter((m) => !m.is_enabled).length;
-  const downCount = 0; // you can compute this from incident API if needed
 
   return (
     <>
@@ -156,13 +210,17 @@ export default function Dashboard() {
           ) : (
             <ul className="divide-y divide-neutral-200/70 dark:divide-neutral-800/70">
               {filtered.map((m) => {
-                const points = summaries[m.id] ?? [];
-                const okRatio =
-                  points.length === 0
-                    ? (m.is_enabled ? 1 : 0)
-                    : points.filter((p) => p.ok).length / points.length;
-                const status =
-                  !m.is_enabled ? ("Paused" as const) : okRatio > 0.99 ? ("Up" as const) : ("Degraded" as const);
+                const summary = summaries[m.id];
+                const live = lastChecks[m.id];
+                const hasData = !!summary && summary.checks > 0;
+                const okRatio = !summary || !hasData ? (m.is_enabled ? 1 : 0) : summary.uptime_percent / 100;
+                const status = !m.is_enabled
+                  ? ("Paused" as const)
+                  : m.id in openIncidents
+                  ? ("Down" as const)
+                  : okRatio > 0.99 && (!live || live.ok)
+                  ? ("Up" as const)
+                  : ("Degraded" as const);
 
                 return (
                   <li key={m.id} className="grid items-center gap-4 px-4 py-4 md:grid-cols-[2fr,1fr,2fr,1fr,120px]">
@@ -188,6 +246,8 @@ export default function Dashboard() {
                             ? "bg-neutral-200/60 text-neutral-700 dark:bg-neutral-800 dark:text-neutral-300"
                             : status === "Up"
                             ? "bg-emerald-100 text-emerald-800 dark:bg-emerald-900/40 dark:text-emerald-300"
+                            : status === "Down"
+                            ? "bg-red-100 text-red-800 dark:bg-red-900/40 dark:text-red-300"
                             : "bg-amber-100 text-amber-800 dark:bg-amber-900/40 dark:text-amber-300")
                         }
                       >
@@ -196,19 +256,22 @@ export default function Dashboard() {
                       </span>
                     </div>
 
-                    {/* Sparkline */}
-                    <div className="flex h-10 items-end gap-0.5">
-                      {points.length === 0 ? (
+                    {/* Response time */}
+                    <div className="flex h-10 items-center gap-3">
+                      {!summary || !hasData ? (
                         <div className="text-sm text-neutral-500">No data</div>
                       ) : (
-                        points.map((p, i) => {
-                          // height by latency, color by ok
-                          const h = Math.max(2, Math.min(36, Math.round((p.ms / 1000) * 36)));
-                          const cls = p.ok
-                            ? "bg-neutral-700 dark:bg-neutral-300"
-                            : "bg-rose-500/80 dark:bg-rose-400/90";
-                          return <div key={i} className={`w-1 ${cls}`} style={{ height: h }} />;
-                        })
+                        <>
+                          <div className="h-2 w-32 overflow-hidden rounded-full bg-neutral-200 dark:bg-neutral-800">
+                            <div
+                              className="h-full bg-neutral-700 dark:bg-neutral-300"
+                              style={{ width: `${Math.max(2, Math.min(100, (summary.avg_latency_ms / 1000) * 100))}%` }}
+                            />
+                          </div>
+                          <span className="text-sm text-neutral-600 dark:text-neutral-300">
+                            {live?.latency_ms ?? summary.avg_latency_ms} ms · {summary.uptime_percent}%
+                          </span>
+                        </>
                       )}
                     </div>
 